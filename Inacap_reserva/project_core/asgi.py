@@ -3,6 +3,11 @@ ASGI config for project_core project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+El canal de notificaciones en tiempo real (/api/eventos/notificaciones/, ver
+reservas/tiempo_real.py) mantiene conexiones abiertas y solo se sirve por
+aquí, p. ej. ``gunicorn project_core.asgi:application -k uvicorn.workers.UvicornWorker``.
+Bajo WSGI responde 204 y las páginas vuelven a la consulta periódica.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 """
@@ -37,6 +37,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'rest_framework',
     'drf_yasg',
     'reservas.apps.ReservasConfig',
@@ -148,9 +149,73 @@ LOGIN_URL = '/login/'
 LOGIN_REDIRECT_URL = '/dashboard/'
 LOGOUT_REDIRECT_URL = '/login/'
 
+# Caché: 'default' es local a cada proceso. 'compartida' la ven todos los
+# procesos del servidor (workers de gunicorn); la usan las sesiones y
+# perfiles.py para invalidar el rol en caché. Con más de un servidor debe ser
+# Redis/Memcached.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'compartida': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.path.join(BASE_DIR, 'cache_compartida'),
+        'TIMEOUT': None,
+        'OPTIONS': {'MAX_ENTRIES': 100000},
+    },
+}
+
 # Configuración de sesión
 SESSION_COOKIE_AGE = 1209600  # 2 semanas en segundos
-SESSION_SAVE_EVERY_REQUEST = True
+# reservas/sesiones.py: la sesión se guarda solo si cambia o si le queda menos de
+# SESION_FRACCION_RENOVAR de su duración (y ahí se extiende el vencimiento)
+SESSION_ENGINE = 'reservas.sesiones'
+SESSION_CACHE_ALIAS = 'compartida'  # debe ser compartida: un logout vale para todos los workers
+SESSION_SAVE_EVERY_REQUEST = False
+SESION_FRACCION_RENOVAR = 0.5
+
+# Notificaciones: con True las vistas solo las dejan en la bandeja de salida y
+# las crea `python manage.py procesar_notificaciones` (correr como servicio);
+# con False se procesan al confirmar la transacción de cada solicitud
+NOTIFICACIONES_EN_SEGUNDO_PLANO = not DEBUG
+
+# Días que se conservan las notificaciones antes de que
+# `python manage.py archivar_notificaciones` las mueva al archivo.
+# Manda el tipo, luego la prioridad (solo NotificacionAdmin) y luego 'dias'.
+# Las no leídas se archivan recién pasados 'dias_no_leidas' (o su plazo, si es mayor).
+RETENCION_NOTIFICACIONES = {
+    'dias': 180,
+    'por_tipo': {
+        'sesion_iniciada': 7,
+        'sesion_cerrada': 7,
+        'reporte_generado': 30,
+    },
+    'por_prioridad': {
+        'alta': 365,
+        'urgente': 365,
+    },
+    'dias_no_leidas': 365,
+}
+
+# Límite de intentos (token bucket) de login y recuperación de contraseña, por
+# IP y por cuenta: 'capacidad' intentos seguidos y luego 'por_minuto'.
+# Ver reservas/limites_acceso.py; métricas en /api/seguridad/limites-acceso/
+LIMITES_ACCESO = {
+    'login': {
+        'ip': {'capacidad': 20, 'por_minuto': 10},
+        'cuenta': {'capacidad': 5, 'por_minuto': 1},
+    },
+    'recuperar_password': {
+        'ip': {'capacidad': 5, 'por_minuto': 1},
+        'cuenta': {'capacidad': 3, 'por_minuto': 0.2},
+    },
+    'reset_otp': {
+        'ip': {'capacidad': 10, 'por_minuto': 2},
+        'cuenta': {'capacidad': 5, 'por_minuto': 0.5},
+    },
+}
+# True solo si un proxy propio fija X-Forwarded-For; si no, cualquiera podría falsear su IP
+LIMITES_ACCESO_DETRAS_DE_PROXY = False
 
 # Email configuration
 EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'  # Para desarrollo;
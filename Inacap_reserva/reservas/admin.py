@@ -1,5 +1,14 @@
-from django.contrib import admin
-from .models import Elemento, ElementoReserva, Area, PerfilUsuario, Equipamiento, Espacio, Reserva, HistorialAprobacion, Notificacion, Mantenimiento, HorariosDisponibilidad, Incidencia
+import csv
+import io
+from django.contrib import admin, messages
+from django.core.exceptions import PermissionDenied
+from django.db import IntegrityError
+from django.http import HttpResponse
+from django.shortcuts import render
+from django.urls import path
+from .forms import ImportarHorarioForm, EspacioAdminForm, BufferTipoEspacioForm
+from .importacion import importar_horario, ErrorImportacion, COLUMNAS_RECHAZOS
+from .models import Elemento, ElementoReserva, Area, PerfilUsuario, Equipamiento, Espacio, Reserva, HistorialAprobacion, Notificacion, Mantenimiento, HorariosDisponibilidad, Incidencia, BufferTipoEspacio
 
 @admin.register(Area)
 class AreaAdmin(admin.ModelAdmin):
@@ -20,16 +29,88 @@ class EquipamientoAdmin(admin.ModelAdmin):
 
 @admin.register(Espacio)
 class EspacioAdmin(admin.ModelAdmin):
-    list_display = ['nombre', 'tipo', 'edificio', 'piso', 'capacidad', 'estado']
+    form = EspacioAdminForm
+    list_display = ['nombre', 'tipo', 'edificio', 'piso', 'capacidad', 'estado', 'minutos_antes', 'minutos_despues']
     list_filter = ['tipo', 'estado', 'edificio']
     search_fields = ['nombre', 'edificio']
 
+@admin.register(BufferTipoEspacio)
+class BufferTipoEspacioAdmin(admin.ModelAdmin):
+    form = BufferTipoEspacioForm
+    list_display = ['tipo', 'minutos_antes', 'minutos_despues']
+
+    def get_readonly_fields(self, request, obj=None):
+        # Cambiar el tipo dejaría los rangos del tipo anterior sin recalcular
+        return ['tipo'] if obj else []
+
 @admin.register(Reserva)
 class ReservaAdmin(admin.ModelAdmin):
     list_display = ['espacio', 'solicitante', 'fecha_reserva', 'hora_inicio', 'hora_fin', 'estado']
     list_filter = ['estado', 'fecha_reserva']
     search_fields = ['espacio__nombre', 'solicitante__username']
     date_hierarchy = 'fecha_reserva'
+    change_list_template = 'admin/reservas/reserva/change_list.html'
+
+    def get_urls(self):
+        urls = [
+            path(
+                'importar-horario/',
+                self.admin_site.admin_view(self.importar_horario_view),
+                name='reservas_reserva_importar_horario'
+            ),
+        ]
+        return urls + super().get_urls()
+
+    def importar_horario_view(self, request):
+        if not self.has_add_permission(request):
+            raise PermissionDenied
+
+        form = ImportarHorarioForm(request.POST or None, request.FILES or None)
+        contexto = {
+            **self.admin_site.each_context(request),
+            'opts': self.model._meta,
+            'title': 'Importar horario',
+            'form': form,
+        }
+
+        if request.method == 'POST' and form.is_valid():
+            archivo = form.cleaned_data['archivo']
+            salida = io.StringIO()
+            rechazos = csv.writer(salida)
+            rechazos.writerow(COLUMNAS_RECHAZOS)
+            try:
+                resultado = importar_horario(
+                    archivo, archivo.name,
+                    estado=form.cleaned_data['estado'],
+                    solicitante_defecto=request.user,
+                    simular=form.cleaned_data['simular'],
+                    rechazos=rechazos
+                )
+            except ErrorImportacion as e:
+                messages.error(request, str(e))
+                return render(request, 'admin/reservas/reserva/importar_horario.html', contexto)
+            except IntegrityError:
+                messages.error(request, 'Otra reserva ocupó un horario durante la importación; no se importó nada. Intenta nuevamente.')
+                return render(request, 'admin/reservas/reserva/importar_horario.html', contexto)
+
+            if form.cleaned_data['descargar_rechazos'] and resultado['rechazadas']:
+                respuesta = HttpResponse(salida.getvalue(), content_type='text/csv; charset=utf-8')
+                respuesta['Content-Disposition'] = f'attachment; filename="{archivo.name.rsplit(".", 1)[0]}.rechazos.csv"'
+                return respuesta
+
+            salida.seek(0)
+            filas_rechazadas = list(csv.reader(salida))[1:101]
+            if form.cleaned_data['simular']:
+                messages.info(request, f"Simulación: {resultado['importadas']} filas válidas de {resultado['leidas']}")
+            else:
+                messages.success(request, f"✅ {resultado['importadas']} reservas importadas de {resultado['leidas']} filas")
+            contexto.update({
+                'resultado': resultado,
+                'columnas_rechazos': COLUMNAS_RECHAZOS,
+                'filas_rechazadas': filas_rechazadas,
+            })
+
+        return render(request, 'admin/reservas/reserva/importar_horario.html', contexto)
 
 @admin.register(HistorialAprobacion)
 class HistorialAprobacionAdmin(admin.ModelAdmin):
@@ -3,4 +3,8 @@ from django.apps import AppConfig
 class ReservasConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'reservas'
-    verbose_name = 'Sistema de Reservas'
\ No newline at end of file
+    verbose_name = 'Sistema de Reservas'
+
+    def ready(self):
+        from . import signals  # noqa: F401
+        from . import checks  # noqa: F401
@@ -0,0 +1,147 @@
+"""
+Retención y archivo de notificaciones.
+
+Notificacion y NotificacionAdmin solo crecen (cada inicio y cierre de sesión
+de un administrador deja una fila). `manage.py archivar_notificaciones` mueve
+las que superan su plazo de retención (settings.RETENCION_NOTIFICACIONES, por
+tipo y prioridad) a reservas_notificacionarchivada, por lotes y sin bloquear a
+quien esté escribiendo.
+
+El archivo está particionado por mes de fecha_creacion (migración 0026); las
+particiones se crean a medida que llegan filas de un mes nuevo y los meses
+viejos se pueden desprender o borrar enteros (DETACH / DROP) sin recorrer la
+tabla. Cada fila guarda las columnas de búsqueda y el resto en un jsonb sin
+nulos, que PostgreSQL comprime (TOAST) cuando el mensaje es largo.
+"""
+from django.conf import settings
+from django.db import connection, transaction
+
+TAMANO_LOTE = 1000
+
+# Leída por todos = por debajo de la marca más baja entre los administradores activos
+SQL_MARCA_ADMIN = """
+    SELECT COALESCE(MIN(l.ultimo_leido_id), 0)
+    FROM reservas_lecturanotificacionesadmin l
+    JOIN auth_user u ON u.id = l.usuario_id AND u.is_active
+"""
+
+TABLAS = {
+    'usuario': {
+        'tabla': 'reservas_notificacion',
+        'leida': 'n.leida',
+        'dias': 'COALESCE(t.dias, %(dias)s)',
+        'prioridad': '',
+        'destinatario': 'destinatario_id',
+        'antes_de_borrar': '',
+    },
+    'admin': {
+        'tabla': 'reservas_notificacionadmin',
+        'leida': f'n.id <= ({SQL_MARCA_ADMIN})',
+        'dias': 'COALESCE(t.dias, p.dias, %(dias)s)',
+        'prioridad': (
+            'LEFT JOIN unnest(%(prioridades)s::text[], %(dias_prioridad)s::int[]) AS p(prioridad, dias) '
+            'ON p.prioridad = n.prioridad'
+        ),
+        'destinatario': 'NULL::integer',
+        # Sin ON DELETE CASCADE en la base: las lecturas se borran en la misma sentencia
+        'antes_de_borrar': (
+            'lecturas AS (DELETE FROM reservas_notificacionadminleida WHERE notificacion_id = ANY(%(ids)s)),'
+        ),
+    },
+}
+
+SQL_VENCIDAS = """
+    FROM {tabla} n
+    LEFT JOIN unnest(%(tipos)s::text[], %(dias_tipo)s::int[]) AS t(tipo, dias) ON t.tipo = n.tipo
+    {prioridad}
+    WHERE n.id > %(desde_id)s
+      AND n.fecha_creacion < NOW() - make_interval(days => CASE
+          WHEN {leida} THEN {dias}
+          ELSE GREATEST({dias}, %(dias_no_leidas)s)
+      END)
+"""
+
+SQL_LOTE = """
+    SELECT n.id, date_trunc('month', n.fecha_creacion) {vencidas}
+    ORDER BY n.id
+    LIMIT %(lote)s
+    FOR UPDATE OF n SKIP LOCKED
+"""
+
+SQL_CONTAR = "SELECT COUNT(*) {vencidas}"
+
+SQL_MOVER = """
+    WITH {antes_de_borrar}
+    borradas AS (DELETE FROM {tabla} WHERE id = ANY(%(ids)s) RETURNING *)
+    INSERT INTO reservas_notificacionarchivada (id, origen, destinatario_id, tipo, fecha_creacion, datos)
+    SELECT id, %(origen)s, {destinatario}, tipo, fecha_creacion,
+           jsonb_strip_nulls(to_jsonb(borradas) - 'id' - 'tipo' - 'fecha_creacion' - 'destinatario_id')
+    FROM borradas
+"""
+
+
+def _parametros(**extra):
+    retencion = settings.RETENCION_NOTIFICACIONES
+    por_tipo = retencion.get('por_tipo', {})
+    por_prioridad = retencion.get('por_prioridad', {})
+    return {
+        'dias': retencion['dias'],
+        'dias_no_leidas': retencion.get('dias_no_leidas', retencion['dias']),
+        'tipos': list(por_tipo),
+        'dias_tipo': list(por_tipo.values()),
+        'prioridades': list(por_prioridad),
+        'dias_prioridad': list(por_prioridad.values()),
+        **extra,
+    }
+
+
+def _sql(plantilla, origen):
+    tabla = TABLAS[origen]
+    return plantilla.format(vencidas=SQL_VENCIDAS.format(**tabla), **tabla)
+
+
+def contar_vencidas():
+    """Notificaciones que ya superaron su retención, por origen ('usuario' / 'admin')."""
+    conteos = {}
+    with connection.cursor() as cursor:
+        for origen in TABLAS:
+            cursor.execute(_sql(SQL_CONTAR, origen), _parametros(desde_id=0))
+            conteos[origen] = cursor.fetchone()[0]
+    return conteos
+
+
+def _archivar_lote(cursor, origen, desde_id, tamano):
+    """Mueve un lote al archivo. Returns: (filas movidas, id desde el que sigue o None si no queda)"""
+    cursor.execute(_sql(SQL_LOTE, origen), _parametros(desde_id=desde_id, lote=tamano))
+    filas = cursor.fetchall()
+    if not filas:
+        return 0, None
+
+    for mes in {mes for _, mes in filas}:
+        cursor.execute('SELECT reservas_particion_archivo(%s)', [mes])
+    ids = [id_ for id_, _ in filas]
+    cursor.execute(_sql(SQL_MOVER, origen), {'ids': ids, 'origen': origen})
+    return cursor.rowcount, ids[-1] if len(filas) == tamano else None
+
+
+def archivar_notificaciones(tamano_lote=TAMANO_LOTE, al_terminar_lote=None):
+    """
+    Archiva las notificaciones vencidas, un lote por transacción.
+
+    Avanza por id, así que cada fila se revisa una sola vez por ejecución.
+    al_terminar_lote(origen, movidas) se llama después de cada lote.
+
+    Returns:
+        dict: filas archivadas por origen
+    """
+    archivadas = {}
+    for origen in TABLAS:
+        archivadas[origen] = 0
+        desde_id = 0
+        while desde_id is not None:
+            with transaction.atomic(), connection.cursor() as cursor:
+                movidas, desde_id = _archivar_lote(cursor, origen, desde_id, tamano_lote)
+            archivadas[origen] += movidas
+            if movidas and al_terminar_lote:
+                al_terminar_lote(origen, movidas)
+    return archivadas
@@ -0,0 +1,333 @@
+"""
+Asignación automática de salas para lotes de reservas pendientes.
+
+Las solicitudes de un mismo día forman un grafo de intervalos: se recorren
+por hora de inicio (coloreo de grafos de intervalos) y cada una se asigna a
+la sala compatible más pequeña que esté libre (best-fit), de modo que las
+salas grandes quedan para las solicitudes grandes. Reservas aprobadas,
+mantenimientos y horarios de disponibilidad se tratan como bloqueos fijos.
+
+La vista previa y la aplicación usan el mismo cálculo; el plan lleva una
+firma y al aplicarlo se recalcula dentro de la transacción, así que si algo
+cambió entre medio no se aplica un plan desactualizado.
+"""
+import hashlib
+from bisect import bisect_left
+from django.db import connection, transaction
+from django.utils import timezone
+from .models import Espacio, Reserva, Mantenimiento, HistorialAprobacion, Notificacion
+from .ocupacion import reconstruir_ocupacion, incrementar_versiones, ESTADOS_MANTENIMIENTO_ACTIVOS
+from .ocupacion_horaria import actualizar_ocupacion_horas
+from .utils import cargar_horarios, horario_vigente
+from .buffers import margenes_de_espacios, recalcular_rangos_horarios
+
+MINUTOS_POR_DIA = 24 * 60
+
+
+class PlanDesactualizado(Exception):
+    """El plan enviado ya no coincide con el estado actual de las reservas."""
+
+    def __init__(self, plan):
+        super().__init__('Las reservas cambiaron desde la vista previa; revisa el nuevo plan')
+        self.plan = plan
+
+
+def _minutos(hora):
+    return hora.hour * 60 + hora.minute
+
+
+def _choca(bloqueo, inicio, fin):
+    """True si [inicio, fin) se cruza con algún intervalo de bloqueo (inicios, fines) disjuntos y ordenados."""
+    if bloqueo is None:
+        return False
+    inicios, fines = bloqueo
+    i = bisect_left(fines, inicio + 1)
+    return i < len(inicios) and inicios[i] < fin
+
+
+def resolver_asignacion(solicitudes, salas, bloqueos, mismo_tipo=True, margenes=None):
+    """
+    Núcleo del algoritmo, sin acceso a la base de datos.
+
+    Args:
+        solicitudes: [(reserva_id, fecha, inicio, fin, asistentes, tipo, espacio_original)]
+            con inicio/fin en minutos del día
+        salas: [(espacio_id, capacidad, tipo)]
+        bloqueos: {(espacio_id, fecha): (inicios, fines)} intervalos ocupados disjuntos
+            (las reservas fijas ya ampliadas con el tiempo entre reservas de la sala)
+        mismo_tipo: solo asignar salas del mismo tipo que la solicitada
+        margenes: {espacio_id: minutos mínimos entre dos reservas de la sala}
+
+    Returns:
+        tuple: ({reserva_id: espacio_id}, [reserva_id sin asignar])
+    """
+    # Salas por tipo ordenadas por capacidad para buscar la más ajustada con bisect
+    por_tipo = {}
+    for espacio_id, capacidad, tipo in sorted(salas, key=lambda s: (s[1], s[0])):
+        clave = tipo if mismo_tipo else None
+        grupo = por_tipo.setdefault(clave, ([], []))
+        grupo[0].append(capacidad)
+        grupo[1].append(espacio_id)
+    info_salas = {s[0]: (s[1], s[2]) for s in salas}
+    margenes = margenes or {}
+
+    asignadas = {}
+    sin_asignar = []
+    ultimo_fin = {}  # (espacio_id, fecha) -> fin de la última solicitud asignada
+
+    # Por inicio; a igual inicio primero las más grandes, que tienen menos salas posibles
+    for reserva_id, fecha, inicio, fin, asistentes, tipo, original in sorted(
+        solicitudes, key=lambda s: (s[1], s[2], -s[4], s[3], s[0])
+    ):
+        capacidades_grupo, espacios_grupo = por_tipo.get(tipo if mismo_tipo else None, ((), ()))
+
+        def libre(espacio_id):
+            anterior = ultimo_fin.get((espacio_id, fecha))
+            return (
+                (anterior is None or anterior + margenes.get(espacio_id, 0) <= inicio)
+                and not _choca(bloqueos.get((espacio_id, fecha)), inicio, fin)
+            )
+
+        elegida = None
+        for i in range(bisect_left(capacidades_grupo, asistentes), len(espacios_grupo)):
+            if libre(espacios_grupo[i]):
+                elegida = espacios_grupo[i]
+                break
+
+        # A igual capacidad se respeta la sala que pidió el usuario
+        if (
+            elegida is not None and original != elegida and original in info_salas
+            and info_salas[original][0] == info_salas[elegida][0]
+            and (not mismo_tipo or info_salas[original][1] == tipo)
+            and libre(original)
+        ):
+            elegida = original
+
+        if elegida is None:
+            sin_asignar.append(reserva_id)
+        else:
+            asignadas[reserva_id] = elegida
+            ultimo_fin[(elegida, fecha)] = fin
+
+    return asignadas, sin_asignar
+
+
+def _unir_intervalos(intervalos):
+    inicios, fines = [], []
+    for inicio, fin in sorted(intervalos):
+        if fines and inicio <= fines[-1]:
+            fines[-1] = max(fines[-1], fin)
+        else:
+            inicios.append(inicio)
+            fines.append(fin)
+    return inicios, fines
+
+
+def planificar_asignacion(desde, hasta, tipo=None, mismo_tipo=True, bloquear=False):
+    """
+    Calcula el plan de asignación para las reservas pendientes entre dos fechas.
+
+    Args:
+        desde, hasta: rango de fechas (inclusive)
+        tipo: limitar a solicitudes de espacios de este tipo
+        mismo_tipo: solo asignar salas del mismo tipo que la solicitada
+        bloquear: tomar SELECT FOR UPDATE sobre las solicitudes (al aplicar)
+
+    Returns:
+        dict: asignaciones, sin_asignar, resumen y firma
+    """
+    pendientes = Reserva.objects.filter(
+        estado='Pendiente',
+        fecha_reserva__gte=desde,
+        fecha_reserva__lte=hasta
+    )
+    if tipo:
+        pendientes = pendientes.filter(espacio__tipo=tipo)
+    if bloquear:
+        pendientes = pendientes.select_for_update(of=('self',))
+
+    solicitudes = [
+        (reserva_id, fecha, _minutos(hora_inicio), _minutos(hora_fin), asistentes, tipo_espacio, espacio_id)
+        for reserva_id, fecha, hora_inicio, hora_fin, asistentes, tipo_espacio, espacio_id in pendientes.order_by('id').values_list(
+            'id', 'fecha_reserva', 'hora_inicio', 'hora_fin', 'num_asistentes', 'espacio__tipo', 'espacio_id'
+        )
+    ]
+    ids_lote = {s[0] for s in solicitudes}
+    fechas = {s[1] for s in solicitudes}
+
+    espacios = Espacio.objects.filter(estado='Disponible')
+    if tipo:
+        espacios = espacios.filter(tipo=tipo)
+    salas = list(espacios.values_list('id', 'capacidad', 'tipo'))
+    sala_ids = [s[0] for s in salas]
+
+    intervalos = {}
+    margenes = margenes_de_espacios(sala_ids) if solicitudes else {}
+    if solicitudes:
+        # Reservas activas que no son del lote: quedan fijas, con el tiempo entre
+        # reservas de la sala a ambos lados
+        for espacio_id, fecha, hora_inicio, hora_fin, reserva_id in Reserva.objects.filter(
+            espacio_id__in=sala_ids,
+            fecha_reserva__gte=desde,
+            fecha_reserva__lte=hasta,
+            estado__in=Reserva.ESTADOS_ACTIVOS
+        ).values_list('espacio_id', 'fecha_reserva', 'hora_inicio', 'hora_fin', 'id').iterator(chunk_size=5000):
+            if reserva_id not in ids_lote:
+                margen = margenes.get(espacio_id, 0)
+                intervalos.setdefault((espacio_id, fecha), []).append(
+                    (_minutos(hora_inicio) - margen, _minutos(hora_fin) + margen)
+                )
+
+        for espacio_id, fecha_inicio, fecha_fin in Mantenimiento.objects.filter(
+            id_espacio_id__in=sala_ids,
+            fecha_inicio__lte=hasta,
+            fecha_fin__gte=desde,
+            estado__in=ESTADOS_MANTENIMIENTO_ACTIVOS
+        ).values_list('id_espacio_id', 'fecha_inicio', 'fecha_fin'):
+            for fecha in fechas:
+                if fecha_inicio <= fecha <= fecha_fin:
+                    intervalos.setdefault((espacio_id, fecha), []).append((0, MINUTOS_POR_DIA))
+
+        # Fuera del horario de disponibilidad la sala también está bloqueada
+        horarios = cargar_horarios(sala_ids, hasta)
+        for espacio_id in {clave[0] for clave in horarios}:
+            for fecha in fechas:
+                vigente = horario_vigente(horarios, espacio_id, fecha)
+                if vigente:
+                    dia = intervalos.setdefault((espacio_id, fecha), [])
+                    dia.append((0, _minutos(vigente[0])))
+                    dia.append((_minutos(vigente[1]), MINUTOS_POR_DIA))
+
+    bloqueos = {clave: _unir_intervalos(lista) for clave, lista in intervalos.items()}
+    asignadas, sin_asignar = resolver_asignacion(solicitudes, salas, bloqueos, mismo_tipo, margenes)
+
+    capacidades = {s[0]: s[1] for s in salas}
+    capacidades_originales = dict(
+        Espacio.objects.filter(id__in={s[6] for s in solicitudes} - set(capacidades)).values_list('id', 'capacidad')
+    )
+    capacidades_originales.update(capacidades)
+
+    asignaciones = []
+    desperdicio_original = desperdicio = cambios = 0
+    for reserva_id, fecha, inicio, fin, asistentes, _, original in solicitudes:
+        espacio_id = asignadas.get(reserva_id)
+        if espacio_id is None:
+            continue
+        desperdicio_original += max(capacidades_originales.get(original, 0) - asistentes, 0)
+        desperdicio += capacidades[espacio_id] - asistentes
+        cambios += espacio_id != original
+        asignaciones.append({
+            'reserva_id': reserva_id,
+            'fecha': fecha.isoformat(),
+            'hora_inicio': f'{inicio // 60:02d}:{inicio % 60:02d}',
+            'hora_fin': f'{fin // 60:02d}:{fin % 60:02d}',
+            'num_asistentes': asistentes,
+            'espacio_original_id': original,
+            'espacio_asignado_id': espacio_id,
+            'desperdicio': capacidades[espacio_id] - asistentes,
+        })
+
+    firma = hashlib.md5(
+        ';'.join(f"{a['reserva_id']}:{a['espacio_asignado_id']}" for a in asignaciones).encode()
+        + b'|' + ','.join(map(str, sorted(sin_asignar))).encode()
+    ).hexdigest()
+
+    return {
+        'asignaciones': asignaciones,
+        'sin_asignar': sorted(sin_asignar),
+        'resumen': {
+            'solicitudes': len(solicitudes),
+            'asignadas': len(asignaciones),
+            'sin_asignar': len(sin_asignar),
+            'cambios_de_sala': cambios,
+            'desperdicio_capacidad': desperdicio,
+            'desperdicio_capacidad_original': desperdicio_original,
+        },
+        'firma': firma,
+    }
+
+
+def aplicar_asignacion(desde, hasta, firma, usuario_admin, tipo=None, mismo_tipo=True, comentario=None):
+    """
+    Aprueba en una transacción las reservas del plan con la sala asignada.
+
+    El plan se recalcula con las solicitudes bloqueadas; si la firma no coincide
+    con la de la vista previa se lanza PlanDesactualizado con el plan nuevo.
+    La restricción de solapamiento se verifica al confirmar, después de que
+    todas las reservas se movieron (así se pueden intercambiar salas).
+
+    Returns:
+        dict: el plan aplicado
+    """
+    with transaction.atomic():
+        plan = planificar_asignacion(desde, hasta, tipo, mismo_tipo, bloquear=True)
+        if plan['firma'] != firma:
+            raise PlanDesactualizado(plan)
+        if not plan['asignaciones']:
+            return plan
+
+        with connection.cursor() as cursor:
+            cursor.execute('SET CONSTRAINTS reserva_sin_solapamiento_activo DEFERRED')
+
+        por_sala = {}
+        for asignacion in plan['asignaciones']:
+            por_sala.setdefault(asignacion['espacio_asignado_id'], []).append(asignacion['reserva_id'])
+
+        ahora = timezone.now()
+        for espacio_id, reserva_ids in por_sala.items():
+            Reserva.objects.filter(id__in=reserva_ids).update(
+                espacio_id=espacio_id,
+                estado='Aprobada',
+                id_aprobador=usuario_admin,
+                comentario_admin=comentario,
+                fecha_aprobacion=ahora
+            )
+
+        reserva_ids = [a['reserva_id'] for a in plan['asignaciones']]
+        # El rango guardado lleva los buffers de la sala original
+        recalcular_rangos_horarios(Reserva.objects.filter(id__in=reserva_ids))
+
+        HistorialAprobacion.objects.bulk_create([
+            HistorialAprobacion(
+                reserva_id=reserva_id,
+                usuario_admin=usuario_admin,
+                tipo_accion='Aprobada',
+                motivo=comentario
+            )
+            for reserva_id in reserva_ids
+        ], batch_size=1000)
+
+        nombres = dict(Espacio.objects.filter(id__in=por_sala).values_list('id', 'nombre'))
+        solicitantes = dict(Reserva.objects.filter(id__in=reserva_ids).values_list('id', 'solicitante_id'))
+        notificaciones = []
+        for asignacion in plan['asignaciones']:
+            mensaje = (
+                f"✅ Tu reserva para {nombres[asignacion['espacio_asignado_id']]} el "
+                f"{asignacion['fecha']} de {asignacion['hora_inicio']} a {asignacion['hora_fin']} ha sido APROBADA."
+            )
+            if asignacion['espacio_asignado_id'] != asignacion['espacio_original_id']:
+                mensaje += " La sala fue reasignada para ajustarse al número de asistentes."
+            if comentario:
+                mensaje += f"\n\nComentario del administrador: {comentario}"
+            notificaciones.append(Notificacion(
+                destinatario_id=solicitantes[asignacion['reserva_id']],
+                tipo='reserva_aprobada',
+                titulo='✅ Reserva Aprobada',
+                mensaje=mensaje,
+                reserva_id=asignacion['reserva_id']
+            ))
+        Notificacion.objects.bulk_create(notificaciones, batch_size=1000)
+
+        # update() no dispara las señales del índice de ocupación
+        espacios_tocados = set(por_sala) | {a['espacio_original_id'] for a in plan['asignaciones']}
+        reconstruir_ocupacion(desde=desde, hasta=hasta, espacio_ids=espacios_tocados)
+        # Las aprobadas en su misma sala no mueven bloques, pero sí cambian el calendario
+        dias = [
+            (espacio_id, asignacion['fecha'])
+            for asignacion in plan['asignaciones']
+            for espacio_id in (asignacion['espacio_asignado_id'], asignacion['espacio_original_id'])
+        ]
+        incrementar_versiones(dias)
+        actualizar_ocupacion_horas(dias)
+
+    return plan
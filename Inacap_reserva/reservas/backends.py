@@ -1,31 +1,110 @@
+import copy
+import threading
+import time
+import uuid
+from collections import OrderedDict
 from django.contrib.auth.backends import ModelBackend
 from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.db import transaction
 from django.db.models import Q
+from django.db.models.functions import Lower
 
 UserModel = get_user_model()
 
+# get_user corre en cada solicitud autenticada: los usuarios se guardan por
+# proceso (LRU) junto a la versión del usuario en la caché compartida.
+# signals.py pone una versión nueva al guardar User o PerfilUsuario, así un
+# cambio de contraseña o una desactivación se ve de inmediato en todos los
+# workers. VIGENCIA_USUARIO solo acota lo que dure una copia si la caché
+# compartida falla.
+MAX_USUARIOS_CACHE = 1024
+VIGENCIA_USUARIO = 60  # segundos
+
+# Debe verse desde todos los procesos: si no, olvidar_usuario no llega a los demás workers
+CACHE_USUARIOS = 'compartida'
+
+_usuarios = OrderedDict()
+_candado = threading.Lock()
+
+
+def _clave_version(user_id):
+    return f'reservas:usuario_version:{user_id}'
+
+
+def _version(user_id):
+    cache = caches[CACHE_USUARIOS]
+    clave = _clave_version(user_id)
+    version = cache.get(clave)
+    if version is None:
+        cache.add(clave, uuid.uuid4().hex, None)
+        version = cache.get(clave)
+    return version
+
+
+def _usuario_en_cache(user_id, version):
+    with _candado:
+        guardado = _usuarios.get(user_id)
+        if guardado is None:
+            return None
+        usuario, guardada, hasta = guardado
+        if guardada != version or hasta < time.monotonic():
+            del _usuarios[user_id]
+            return None
+        _usuarios.move_to_end(user_id)
+        return usuario
+
+
+def _guardar_usuario(usuario, version):
+    with _candado:
+        _usuarios[usuario.pk] = (usuario, version, time.monotonic() + VIGENCIA_USUARIO)
+        _usuarios.move_to_end(usuario.pk)
+        while len(_usuarios) > MAX_USUARIOS_CACHE:
+            _usuarios.popitem(last=False)
+
+
+def olvidar_usuario(user_id):
+    """Descarta el usuario guardado en todos los procesos (al confirmar la transacción)."""
+    with _candado:
+        _usuarios.pop(user_id, None)
+    # Antes del COMMIT otro worker podría releer los datos viejos con la versión nueva
+    transaction.on_commit(
+        lambda: caches[CACHE_USUARIOS].set(_clave_version(user_id), uuid.uuid4().hex, None)
+    )
+
+
+def limpiar_cache_usuarios():
+    with _candado:
+        _usuarios.clear()
+
+
+def buscar_usuario_login(valor):
+    """
+    Usuario por email o username sin distinguir mayúsculas, en una consulta.
+
+    Compara con LOWER() para usar los índices lower(email) / lower(username)
+    de la migración 0027 (__iexact usa UPPER() y recorre toda la tabla).
+    Si hay varios, prefiere el que coincide por email y luego el de menor id.
+    """
+    valor = valor.lower()
+    usuarios = list(UserModel.objects.alias(
+        email_lower=Lower('email'), username_lower=Lower('username')
+    ).filter(Q(email_lower=valor) | Q(username_lower=valor)).order_by('pk'))
+    if len(usuarios) > 1:
+        print(f"⚠️ Múltiples usuarios encontrados para: {valor}")
+    return next((u for u in usuarios if u.email.lower() == valor), usuarios[0] if usuarios else None)
+
+
 class EmailBackend(ModelBackend):
     def authenticate(self, request, username=None, password=None, **kwargs):
         try:
             print(f"🔐 Intentando autenticar: {username}")
             
             # Buscar por email o username (case insensitive)
-            # CORREGIDO: Usar get() para evitar múltiples resultados
-            try:
-                user = UserModel.objects.get(
-                    Q(email__iexact=username) | 
-                    Q(username__iexact=username)
-                )
-            except UserModel.MultipleObjectsReturned:
-                # Si hay múltiples, tomar el primero que coincida con email exacto
-                user = UserModel.objects.filter(email__iexact=username).first()
-                if not user:
-                    # Si no hay email exacto, tomar el primero
-                    user = UserModel.objects.filter(
-                        Q(email__iexact=username) | 
-                        Q(username__iexact=username)
-                    ).first()
-                print(f"⚠️ Múltiples usuarios encontrados, usando: {user.username}")
+            user = buscar_usuario_login(username or '')
+            if user is None:
+                print(f"❌ Usuario no encontrado: {username}")
+                return None
             
             print(f"✅ Usuario encontrado: {user.username}")
             
@@ -41,15 +120,19 @@ class EmailBackend(ModelBackend):
                 print(f"❌ Contraseña incorrecta para: {username}")
                 return None
                 
-        except UserModel.DoesNotExist:
-            print(f"❌ Usuario no encontrado: {username}")
-            return None
         except Exception as e:
             print(f"❌ Error en autenticación: {e}")
             return None
 
     def get_user(self, user_id):
-        try:
-            return UserModel.objects.get(pk=user_id)
-        except UserModel.DoesNotExist:
-            return None
\ No newline at end of file
+        # La versión se lee antes que el usuario: un cambio confirmado entre ambos la deja vieja
+        version = _version(user_id)
+        usuario = _usuario_en_cache(user_id, version)
+        if usuario is None:
+            try:
+                usuario = UserModel.objects.get(pk=user_id)
+            except UserModel.DoesNotExist:
+                return None
+            _guardar_usuario(usuario, version)
+        # Una copia por solicitud: lo que la vista cambie o cargue (p. ej. el perfil) no queda en la caché
+        return copy.copy(usuario)
\ No newline at end of file
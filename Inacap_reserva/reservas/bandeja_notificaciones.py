@@ -0,0 +1,148 @@
+"""
+Bandeja de salida (outbox) de notificaciones.
+
+notificar_accion_admin y NotificacionService ya no crean las notificaciones
+dentro de la solicitud: insertan un EventoNotificacion en la misma
+transacción que el cambio que las origina (si la transacción se deshace, el
+aviso también) y el worker `manage.py procesar_notificaciones` los convierte
+después en Notificacion / NotificacionAdmin con bulk_create por lotes.
+
+Los duplicados (misma aprobación o rechazo avisado dos veces en pocos minutos)
+se descartan en el worker, en memoria y con una consulta por lote, en vez de
+consultar en cada solicitud.
+
+Sin worker (NOTIFICACIONES_EN_SEGUNDO_PLANO = False, p. ej. en desarrollo)
+los eventos se procesan al confirmarse la transacción de la solicitud.
+"""
+from datetime import timedelta
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from .models import EventoNotificacion, Notificacion, NotificacionAdmin
+
+CANAL_POSTGRES = 'reservas_bandeja_notificaciones'
+TAMANO_LOTE = 500
+VENTANA_DUPLICADOS = timedelta(minutes=5)
+
+
+def _encolar(**campos):
+    evento = EventoNotificacion.objects.create(**campos)
+    if not settings.NOTIFICACIONES_EN_SEGUNDO_PLANO:
+        # robust: un error al procesar no afecta la respuesta (el evento queda pendiente)
+        transaction.on_commit(procesar_pendientes, robust=True)
+    return evento
+
+
+def encolar_notificacion(destinatario, tipo, titulo, mensaje, reserva=None, evitar_duplicado=False):
+    """Deja pendiente una Notificacion para un usuario (un INSERT)."""
+    return _encolar(
+        destinatario=destinatario,
+        tipo=tipo,
+        titulo=titulo,
+        mensaje=mensaje,
+        reserva=reserva,
+        evitar_duplicado=evitar_duplicado
+    )
+
+
+def encolar_notificacion_admin(tipo, titulo, mensaje, prioridad='media', usuario_relacionado=None,
+                               reserva=None, espacio=None, ip_address=None, user_agent=None,
+                               evitar_duplicado=False):
+    """Deja pendiente una NotificacionAdmin (un INSERT)."""
+    return _encolar(
+        para_admin=True,
+        tipo=tipo,
+        titulo=titulo,
+        mensaje=mensaje,
+        prioridad=prioridad,
+        usuario_relacionado=usuario_relacionado,
+        reserva=reserva,
+        espacio=espacio,
+        ip_address=ip_address,
+        user_agent=user_agent,
+        evitar_duplicado=evitar_duplicado
+    )
+
+
+def _clave(evento):
+    return (evento.para_admin, evento.destinatario_id, evento.tipo, evento.reserva_id)
+
+
+def _ya_notificados(eventos):
+    """Claves de los eventos con evitar_duplicado que ya tienen notificación reciente (una consulta por tabla)."""
+    claves = set()
+    desde = timezone.now() - VENTANA_DUPLICADOS
+    for para_admin, modelo in ((True, NotificacionAdmin), (False, Notificacion)):
+        candidatos = [e for e in eventos if e.evitar_duplicado and e.para_admin == para_admin and e.reserva_id]
+        if not candidatos:
+            continue
+        existentes = modelo.objects.filter(
+            tipo__in={e.tipo for e in candidatos},
+            reserva_id__in={e.reserva_id for e in candidatos},
+            fecha_creacion__gte=desde
+        )
+        if para_admin:
+            claves.update((True, None, tipo, reserva_id) for tipo, reserva_id in existentes.values_list('tipo', 'reserva_id'))
+        else:
+            claves.update(
+                (False, destinatario_id, tipo, reserva_id)
+                for destinatario_id, tipo, reserva_id in existentes.values_list('destinatario_id', 'tipo', 'reserva_id')
+            )
+    return claves
+
+
+def _procesar_lote(tamano):
+    with transaction.atomic():
+        # SKIP LOCKED: varios workers (o solicitudes sin worker) no toman el mismo evento
+        eventos = list(EventoNotificacion.objects.select_for_update(skip_locked=True).order_by('id')[:tamano])
+        if not eventos:
+            return 0, 0
+
+        vistos = _ya_notificados(eventos)
+        usuarios, admins = [], []
+        for evento in eventos:
+            if evento.evitar_duplicado:
+                if _clave(evento) in vistos:
+                    continue
+                vistos.add(_clave(evento))
+            if evento.para_admin:
+                admins.append(NotificacionAdmin(
+                    tipo=evento.tipo,
+                    titulo=evento.titulo,
+                    mensaje=evento.mensaje,
+                    prioridad=evento.prioridad or 'media',
+                    usuario_relacionado_id=evento.usuario_relacionado_id,
+                    reserva_id=evento.reserva_id,
+                    espacio_id=evento.espacio_id,
+                    ip_address=evento.ip_address,
+                    user_agent=evento.user_agent
+                ))
+            else:
+                usuarios.append(Notificacion(
+                    destinatario_id=evento.destinatario_id,
+                    tipo=evento.tipo,
+                    titulo=evento.titulo,
+                    mensaje=evento.mensaje,
+                    reserva_id=evento.reserva_id
+                ))
+
+        Notificacion.objects.bulk_create(usuarios)
+        NotificacionAdmin.objects.bulk_create(admins)
+        EventoNotificacion.objects.filter(id__in=[evento.id for evento in eventos]).delete()
+        return len(eventos), len(usuarios) + len(admins)
+
+
+def procesar_pendientes(tamano_lote=TAMANO_LOTE):
+    """
+    Procesa todos los eventos pendientes, un lote por transacción.
+
+    Returns:
+        tuple: (eventos procesados, notificaciones creadas)
+    """
+    procesados = creadas = 0
+    while True:
+        eventos, notificaciones = _procesar_lote(tamano_lote)
+        procesados += eventos
+        creadas += notificaciones
+        if eventos < tamano_lote:
+            return procesados, creadas
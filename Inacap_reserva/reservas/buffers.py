@@ -0,0 +1,167 @@
+"""
+Tiempo de preparación y limpieza entre reservas.
+
+Cada espacio tiene minutos_antes y minutos_despues (o los de su tipo en
+BufferTipoEspacio). Reserva.rango_horario se guarda ya ampliado con ellos,
+así la restricción de exclusión y la búsqueda de choques siguen siendo una
+sola comparación de rangos sobre el índice GiST: dos reservas del mismo
+espacio quedan separadas por al menos minutos_despues + minutos_antes.
+
+Cuando cambian los buffers de un espacio o de un tipo, las reservas desde
+hoy se recalculan en una sentencia (ver signals.py); las pasadas conservan
+el rango con el que se aprobaron.
+"""
+from django.conf import settings
+from django.db import connection
+from django.utils import timezone
+from .models import Espacio, Reserva
+
+# (id, antes, despues) efectivos de cada espacio
+SQL_BUFFERS_ESPACIOS = """
+    SELECT e.id,
+           COALESCE(e.minutos_antes, t.minutos_antes, 0) AS antes,
+           COALESCE(e.minutos_despues, t.minutos_despues, 0) AS despues
+    FROM reservas_espacio e
+    LEFT JOIN reservas_buffertipoespacio t ON t.tipo = e.tipo
+"""
+
+# Mismo cálculo que Reserva.calcular_rango_horario: hora local a timestamptz y
+# después los buffers como minutos reales
+SQL_RECALCULAR_RANGOS = f"""
+    UPDATE reservas_reserva r
+    SET rango_horario = tstzrange(
+        ((r.fecha_reserva + r.hora_inicio) AT TIME ZONE %s) - make_interval(mins => b.antes),
+        ((r.fecha_reserva + r.hora_fin) AT TIME ZONE %s) + make_interval(mins => b.despues),
+        '[)'
+    )
+    FROM ({SQL_BUFFERS_ESPACIOS}) b
+    WHERE b.id = r.espacio_id
+      AND r.rango_horario IS NOT NULL
+      AND r.id IN ({{reservas}})
+"""
+
+# Reservas activas que quedarían a menos del margen (antes + despues) de la anterior
+SQL_RESERVAS_MUY_JUNTAS = """
+    SELECT espacio_id, fecha_reserva, hora_inicio, hora_fin, fin_anterior, margen
+    FROM (
+        SELECT r.espacio_id, r.fecha_reserva, r.hora_inicio, r.hora_fin, m.margen,
+               LAG(r.fecha_reserva + r.hora_fin) OVER (
+                   PARTITION BY r.espacio_id ORDER BY r.fecha_reserva, r.hora_inicio
+               ) AS fin_anterior
+        FROM reservas_reserva r
+        JOIN unnest(%(espacio_ids)s::bigint[], %(margenes)s::int[]) AS m(espacio_id, margen)
+          ON m.espacio_id = r.espacio_id
+        WHERE r.estado = ANY(%(estados)s)
+          AND r.fecha_reserva >= %(desde)s
+          AND r.rango_horario IS NOT NULL
+    ) x
+    WHERE fin_anterior IS NOT NULL
+      AND fecha_reserva + hora_inicio < fin_anterior + make_interval(mins => margen)
+    ORDER BY fecha_reserva, hora_inicio
+    LIMIT 1
+"""
+
+
+def buffers_de_espacios(espacio_ids):
+    """
+    Buffers efectivos de varios espacios en una consulta.
+
+    Returns:
+        dict: {espacio_id: (minutos_antes, minutos_despues)}
+    """
+    espacio_ids = list(espacio_ids)
+    if not espacio_ids:
+        return {}
+    with connection.cursor() as cursor:
+        cursor.execute(f'{SQL_BUFFERS_ESPACIOS} WHERE e.id = ANY(%s)', [espacio_ids])
+        return {espacio_id: (antes, despues) for espacio_id, antes, despues in cursor.fetchall()}
+
+
+def margenes_de_espacios(espacio_ids):
+    """Minutos mínimos entre dos reservas de cada espacio (antes + despues)."""
+    return {espacio_id: antes + despues for espacio_id, (antes, despues) in buffers_de_espacios(espacio_ids).items()}
+
+
+def recalcular_rangos_horarios(reservas):
+    """
+    Vuelve a calcular rango_horario con los buffers actuales en un solo UPDATE.
+
+    reservas: QuerySet de Reserva (p. ej. las futuras de un espacio o las que
+    update() movió de sala). Si el nuevo margen hace chocar reservas activas,
+    la restricción de exclusión lanza IntegrityError (a menos que esté diferida).
+
+    Returns:
+        int: reservas actualizadas
+    """
+    subconsulta, parametros = reservas.values('id').query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(
+            SQL_RECALCULAR_RANGOS.format(reservas=subconsulta),
+            [settings.TIME_ZONE, settings.TIME_ZONE, *parametros]
+        )
+        return cursor.rowcount
+
+
+def recalcular_rangos_espacios(espacio_ids):
+    """Recalcula las reservas de hoy en adelante de los espacios indicados."""
+    return recalcular_rangos_horarios(Reserva.objects.filter(
+        espacio_id__in=list(espacio_ids),
+        fecha_reserva__gte=timezone.localdate()
+    ))
+
+
+def verificar_margenes(margenes):
+    """
+    Revisa si nuevos márgenes dejarían reservas activas demasiado juntas.
+
+    Args:
+        margenes: {espacio_id: minutos_antes + minutos_despues propuestos}
+
+    Returns:
+        str o None: mensaje con el primer par de reservas en conflicto
+    """
+    margenes = {espacio_id: margen for espacio_id, margen in margenes.items() if margen}
+    if not margenes:
+        return None
+
+    with connection.cursor() as cursor:
+        cursor.execute(SQL_RESERVAS_MUY_JUNTAS, {
+            'espacio_ids': list(margenes),
+            'margenes': list(margenes.values()),
+            'estados': list(Reserva.ESTADOS_ACTIVOS),
+            'desde': timezone.localdate(),
+        })
+        fila = cursor.fetchone()
+    if fila is None:
+        return None
+
+    espacio_id, fecha, hora_inicio, hora_fin, fin_anterior, margen = fila
+    nombre = Espacio.objects.filter(id=espacio_id).values_list('nombre', flat=True).first()
+    return (
+        f"La reserva de {nombre} del {fecha.strftime('%d/%m/%Y')} de {hora_inicio.strftime('%H:%M')} "
+        f"a {hora_fin.strftime('%H:%M')} empieza a menos de {margen} minutos de la anterior "
+        f"(termina a las {fin_anterior.strftime('%H:%M')}); muévala o cancélela antes de cambiar el tiempo entre reservas"
+    )
+
+
+def verificar_buffers_espacio(espacio_id, tipo, minutos_antes, minutos_despues):
+    """
+    verificar_margenes para un espacio con los valores que se van a guardar
+    (None = usar los del tipo).
+    """
+    antes, despues = Espacio(tipo=tipo, minutos_antes=minutos_antes, minutos_despues=minutos_despues).buffers
+    return verificar_margenes({espacio_id: antes + despues})
+
+
+def verificar_buffers_tipo(tipo, minutos_antes, minutos_despues):
+    """verificar_margenes para los espacios del tipo que usan los buffers del tipo."""
+    margenes = {}
+    for espacio_id, antes, despues in Espacio.objects.filter(tipo=tipo).values_list(
+        'id', 'minutos_antes', 'minutos_despues'
+    ):
+        if antes is None or despues is None:
+            margenes[espacio_id] = (
+                (minutos_antes if antes is None else antes)
+                + (minutos_despues if despues is None else despues)
+            )
+    return verificar_margenes(margenes)
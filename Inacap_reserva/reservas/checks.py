@@ -0,0 +1,46 @@
+"""
+Verificaciones de configuración (python manage.py check y al arrancar).
+"""
+from django.conf import settings
+from django.core.checks import Error, register
+
+# Cachés cuyo contenido no ven los demás procesos
+CACHES_LOCALES = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+def _verificar_cache_compartida(alias, uso):
+    if alias not in settings.CACHES:
+        return [Error(
+            f"No existe la caché '{alias}' que usa {uso}.",
+            hint="Definirla en settings.CACHES con un backend compartido entre procesos.",
+            id='reservas.E001',
+        )]
+    if settings.CACHES[alias].get('BACKEND') in CACHES_LOCALES:
+        return [Error(
+            f"La caché '{alias}' que usa {uso} es local a cada proceso: los demás workers no verían sus cambios.",
+            hint="Usar un backend compartido (FileBasedCache en un servidor, Redis o Memcached en varios).",
+            id='reservas.E002',
+        )]
+    return []
+
+
+@register()
+def verificar_cache_roles(app_configs, **kwargs):
+    from .perfiles import CACHE_ROLES
+    return _verificar_cache_compartida(CACHE_ROLES, 'perfiles.py para invalidar el rol en sesión')
+
+
+@register()
+def verificar_cache_usuarios(app_configs, **kwargs):
+    from .backends import CACHE_USUARIOS
+    return _verificar_cache_compartida(CACHE_USUARIOS, 'backends.EmailBackend para olvidar usuarios cambiados')
+
+
+@register()
+def verificar_cache_sesiones(app_configs, **kwargs):
+    if settings.SESSION_ENGINE != 'reservas.sesiones':
+        return []
+    return _verificar_cache_compartida(settings.SESSION_CACHE_ALIAS, 'reservas.sesiones (SESSION_CACHE_ALIAS)')
@@ -0,0 +1,70 @@
+"""
+Contadores de notificaciones no leídas.
+
+ContadorNotificaciones guarda cuántas notificaciones sin leer tiene cada
+usuario ('usuario:<id>', la misma clave que su canal en tiempo_real.py). Los
+triggers de la migración 0023 suman y restan en la misma transacción que
+inserta, marca como leída o borra la notificación, así que leer el total es
+una consulta por clave única en vez de un COUNT(*).
+
+Las NotificacionAdmin no usan contador: lo leído es por administrador
+(ver lecturas_admin.py).
+"""
+from django.db import connection, transaction
+from .models import ContadorNotificaciones
+from .tiempo_real import canal_usuario
+
+# Conteo real de todas las claves (las que ya no tienen pendientes quedan en 0)
+SQL_CONTEOS_REALES = """
+    SELECT 'usuario:' || destinatario_id AS clave, COUNT(*) AS no_leidas
+    FROM reservas_notificacion WHERE NOT leida GROUP BY 1
+"""
+
+# Claves cuyo contador no coincide con el conteo real
+SQL_DESVIADOS = f"""
+    SELECT COALESCE(r.clave, c.clave) AS clave, c.no_leidas AS antes, COALESCE(r.no_leidas, 0) AS despues
+    FROM ({SQL_CONTEOS_REALES}) r
+    FULL JOIN reservas_contadornotificaciones c ON c.clave = r.clave
+    WHERE c.no_leidas IS DISTINCT FROM COALESCE(r.no_leidas, 0)
+"""
+
+SQL_RECONCILIAR = f"""
+    WITH desviados AS ({SQL_DESVIADOS}),
+    corregidos AS (
+        INSERT INTO reservas_contadornotificaciones (clave, no_leidas)
+        SELECT clave, despues FROM desviados
+        ON CONFLICT (clave) DO UPDATE SET no_leidas = EXCLUDED.no_leidas
+    )
+    SELECT clave, antes, despues FROM desviados ORDER BY clave
+"""
+
+
+def no_leidas(clave):
+    return ContadorNotificaciones.objects.filter(clave=clave).values_list('no_leidas', flat=True).first() or 0
+
+
+def no_leidas_usuario(usuario):
+    """Notificaciones sin leer de un usuario."""
+    return no_leidas(canal_usuario(usuario.id))
+
+
+def reconciliar_contadores(corregir=True):
+    """
+    Compara los contadores con el conteo real y, si corregir, los reemplaza.
+
+    Al corregir bloquea las escrituras en la tabla de notificaciones mientras
+    cuenta, para que ningún trigger mueva el contador entre el conteo y la corrección.
+
+    Returns:
+        list: (clave, contador anterior o None, conteo real) de las claves desviadas
+    """
+    if not corregir:
+        with connection.cursor() as cursor:
+            cursor.execute(f'{SQL_DESVIADOS} ORDER BY 1')
+            return cursor.fetchall()
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(
+            'LOCK TABLE reservas_notificacion IN SHARE ROW EXCLUSIVE MODE'
+        )
+        cursor.execute(SQL_RECONCILIAR)
+        return cursor.fetchall()
@@ -3,7 +3,9 @@ from django.http import JsonResponse
 from django.shortcuts import redirect
 from django.contrib import messages
 from django.core.exceptions import PermissionDenied
-from .models import PerfilUsuario
+from .perfiles import rol_de, ROLES_ADMIN
+from .limites_acceso import consumir, ip_de, LimiteExcedido
+import json
 
 def rol_requerido(*roles_permisos):
     """
@@ -15,29 +17,28 @@ def rol_requerido(*roles_permisos):
             if not request.user.is_authenticated:
                 return redirect('login')
             
-            try:
-                perfil = PerfilUsuario.objects.get(user=request.user)
-                
-                # Verificar si el rol del usuario está en los roles permitidos
-                if perfil.rol not in roles_permisos:
-                    # Si es solicitud AJAX, retornar JSON
-                    if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
-                        return JsonResponse({
-                            'success': False,
-                            'error': f'Acceso denegado. Rol requerido: {", ".join(roles_permisos)}'
-                        }, status=403)
-                    
-                    # Redirigir según el rol del usuario
-                    if perfil.rol in ['Administrativo', 'Investigacion', 'Aprobador', 'SuperAdmin']:
-                        messages.error(request, 'Acceso denegado. Esta área es solo para usuarios normales.')
-                        return redirect('admin_dashboard')
-                    else:
-                        messages.error(request, 'Acceso denegado. Esta área es solo para administradores.')
-                        return redirect('dashboard')
-                
-            except PerfilUsuario.DoesNotExist:
+            # Rol desde la sesión (perfiles.rol_de); None si no tiene perfil
+            rol = rol_de(request)
+            if rol is None:
                 return redirect('login')
             
+            # Verificar si el rol del usuario está en los roles permitidos
+            if rol not in roles_permisos:
+                # Si es solicitud AJAX, retornar JSON
+                if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
+                    return JsonResponse({
+                        'success': False,
+                        'error': f'Acceso denegado. Rol requerido: {", ".join(roles_permisos)}'
+                    }, status=403)
+                
+                # Redirigir según el rol del usuario
+                if rol in ROLES_ADMIN:
+                    messages.error(request, 'Acceso denegado. Esta área es solo para usuarios normales.')
+                    return redirect('admin_dashboard')
+                else:
+                    messages.error(request, 'Acceso denegado. Esta área es solo para administradores.')
+                    return redirect('dashboard')
+            
             return view_func(request, *args, **kwargs)
         return _wrapped_view
     return decorator
@@ -49,12 +50,8 @@ def es_admin():
             if not request.user.is_authenticated:
                 return redirect('login')
             
-            try:
-                perfil = PerfilUsuario.objects.get(user=request.user)
-                if perfil.rol in ['Administrativo', 'Investigacion', 'Aprobador', 'SuperAdmin']:
-                    return view_func(request, *args, **kwargs)
-            except PerfilUsuario.DoesNotExist:
-                pass
+            if rol_de(request) in ROLES_ADMIN:
+                return view_func(request, *args, **kwargs)
             
             raise PermissionDenied("No tienes permisos de administrador")
         return _wrapped_view
@@ -70,16 +67,53 @@ def es_usuario_normal():
             if not request.user.is_authenticated:
                 return redirect('login')
             
-            try:
-                perfil = PerfilUsuario.objects.get(user=request.user)
-                # Usuarios normales: cualquier rol que NO sea administrador
-                if perfil.rol not in ['Administrativo', 'Investigacion', 'Aprobador', 'SuperAdmin']:
-                    return view_func(request, *args, **kwargs)
-            except PerfilUsuario.DoesNotExist:
-                # Si no tiene perfil, permitir acceso (podrías ajustar esto)
+            # Usuarios normales: cualquier rol que NO sea administrador
+            # (sin perfil, rol None, también se permite el acceso)
+            if rol_de(request) not in ROLES_ADMIN:
                 return view_func(request, *args, **kwargs)
             
             # Si es administrador, redirigir al dashboard admin
             return redirect('admin_dashboard')
         return _wrapped_view
-    return decorator
\ No newline at end of file
+    return decorator
+
+def limitar_intentos(endpoint):
+    """
+    Decorador para vistas de login/recuperación: rechaza con 429 los POST que
+    superan settings.LIMITES_ACCESO[endpoint] por IP o por cuenta ('email'),
+    antes de que la vista verifique contraseñas. Los POST sin 'email' se
+    rechazan con 400.
+    """
+    def decorator(view_func):
+        @wraps(view_func)
+        def _wrapped_view(request, *args, **kwargs):
+            if request.method != 'POST':
+                return view_func(request, *args, **kwargs)
+            
+            # Igual que las vistas: el cuerpo se intenta leer como JSON sin importar el
+            # Content-Type, y si no, como formulario
+            try:
+                datos = json.loads(request.body or b'{}')
+            except ValueError:
+                datos = request.POST
+            cuenta = datos.get('email') if hasattr(datos, 'get') else None
+            if not isinstance(cuenta, str) or not cuenta.strip():
+                # Sin cuenta no hay balde por cuenta: la vista tampoco puede autenticar
+                return JsonResponse({
+                    'success': False,
+                    'message': 'Correo electrónico requerido.'
+                }, status=400)
+            
+            try:
+                consumir(endpoint, ip_de(request), cuenta)
+            except LimiteExcedido as e:
+                print(f"🛑 Límite de intentos en {endpoint} ({ip_de(request)}, {cuenta})")
+                respuesta = JsonResponse({
+                    'success': False,
+                    'message': f'Demasiados intentos. Espera {e.espera} segundos e inténtalo de nuevo.'
+                }, status=429)
+                respuesta['Retry-After'] = str(e.espera)
+                return respuesta
+            return view_func(request, *args, **kwargs)
+        return _wrapped_view
+    return decorator
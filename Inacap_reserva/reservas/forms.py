@@ -1,7 +1,8 @@
 # reservas/forms.py - VERSIÓN CORREGIDA
 from django import forms
 from django.core.exceptions import ValidationError
-from .models import Reserva, Elemento, ElementoReserva
+from .models import Reserva, Elemento, ElementoReserva, Espacio, BufferTipoEspacio
+from .buffers import verificar_buffers_espacio, verificar_buffers_tipo
 from django.utils import timezone
 
 class ElementoForm(forms.ModelForm):
@@ -73,4 +74,61 @@ class ElementoDevolucionForm(forms.ModelForm):
                 'type': 'datetime-local',
                 'class': 'form-control'
             }),
-        }
\ No newline at end of file
+        }
+class ImportarHorarioForm(forms.Form):
+    archivo = forms.FileField(help_text='CSV o XLSX con las columnas: espacio, fecha, hora_inicio, hora_fin, solicitante, proposito, num_asistentes')
+    estado = forms.ChoiceField(choices=Reserva.ESTADO_CHOICES, initial='Aprobada')
+    simular = forms.BooleanField(required=False, help_text='Solo validar, sin crear reservas')
+    descargar_rechazos = forms.BooleanField(required=False, help_text='Descargar las filas rechazadas como CSV en vez de verlas en pantalla')
+
+    def clean_archivo(self):
+        archivo = self.cleaned_data['archivo']
+        if not archivo.name.lower().endswith(('.csv', '.xlsx')):
+            raise ValidationError('El archivo debe ser .csv o .xlsx')
+        return archivo
+
+
+class EspacioAdminForm(forms.ModelForm):
+    minutos_antes = forms.IntegerField(
+        required=False, min_value=0, max_value=Espacio.MAX_MINUTOS_BUFFER,
+        help_text='Preparación antes de cada reserva; vacío = la del tipo de espacio'
+    )
+    minutos_despues = forms.IntegerField(
+        required=False, min_value=0, max_value=Espacio.MAX_MINUTOS_BUFFER,
+        help_text='Limpieza después de cada reserva; vacío = la del tipo de espacio'
+    )
+
+    class Meta:
+        model = Espacio
+        fields = '__all__'
+
+    def clean(self):
+        cleaned_data = super().clean()
+        if self.instance.pk and not self.errors:
+            conflicto = verificar_buffers_espacio(
+                self.instance.pk, cleaned_data.get('tipo'),
+                cleaned_data.get('minutos_antes'), cleaned_data.get('minutos_despues')
+            )
+            if conflicto:
+                raise ValidationError(conflicto)
+        return cleaned_data
+
+
+class BufferTipoEspacioForm(forms.ModelForm):
+    minutos_antes = forms.IntegerField(min_value=0, max_value=Espacio.MAX_MINUTOS_BUFFER, initial=0)
+    minutos_despues = forms.IntegerField(min_value=0, max_value=Espacio.MAX_MINUTOS_BUFFER, initial=0)
+
+    class Meta:
+        model = BufferTipoEspacio
+        fields = '__all__'
+
+    def clean(self):
+        cleaned_data = super().clean()
+        if not self.errors:
+            conflicto = verificar_buffers_tipo(
+                cleaned_data.get('tipo') or self.instance.tipo,
+                cleaned_data.get('minutos_antes'), cleaned_data.get('minutos_despues')
+            )
+            if conflicto:
+                raise ValidationError(conflicto)
+        return cleaned_data
@@ -0,0 +1,204 @@
+"""
+Suscripciones iCalendar (RFC 5545) para Outlook, Google Calendar, etc.
+
+/ics/espacio/<id>.ics entrega las reservas aprobadas de un espacio y
+/ics/usuario/<token>.ics las reservas vigentes de un usuario (las pendientes
+como TENTATIVE). Ambas se autorizan con PerfilUsuario.token_calendario, porque
+los clientes de calendario no envían la sesión.
+
+El feed se genera por partes sobre iterator() y el texto completo queda en la
+caché con la versión de los días que cubre (ocupacion.resumen_rango): mientras
+no cambie ninguna reserva o mantenimiento de esos días, las consultas
+periódicas de los clientes se responden con 304 o desde la caché sin leer
+reservas.
+"""
+import hashlib
+from datetime import datetime, timedelta, timezone as dt_timezone
+from django.core.cache import cache
+from django.db import connection
+from django.utils import timezone
+from .models import PerfilUsuario, Reserva
+from .ocupacion import resumen_rango
+
+DIAS_PASADOS = 30
+DIAS_FUTUROS = 365
+CACHE_SEGUNDOS = 24 * 60 * 60
+CACHE_MAX_CARACTERES = 5 * 1024 * 1024  # feeds más grandes se generan siempre
+TAMANO_LOTE = 500
+
+ESTADOS_FEED_ESPACIO = ('Aprobada',)
+ESTADOS_FEED_USUARIO = ('Aprobada', 'Pendiente')
+
+# Versión de los días en que el usuario tiene reservas; los conjuntos son
+# pequeños, así que se resume la lista completa y no solo suma y cantidad
+SQL_VERSION_USUARIO = """
+    SELECT md5(COALESCE(string_agg(o.espacio_id || ':' || o.fecha || ':' || o.version, ','
+                                   ORDER BY o.espacio_id, o.fecha), '')),
+           max(o.actualizado)
+    FROM reservas_ocupacionespaciodia o
+    JOIN (
+        SELECT DISTINCT espacio_id, fecha_reserva
+        FROM reservas_reserva
+        WHERE solicitante_id = %s AND fecha_reserva BETWEEN %s AND %s
+    ) d ON d.espacio_id = o.espacio_id AND d.fecha_reserva = o.fecha
+"""
+
+
+def ventana_feed():
+    """Días (desde, hasta) que cubren los feeds, ambos inclusive."""
+    hoy = timezone.localdate()
+    return hoy - timedelta(days=DIAS_PASADOS), hoy + timedelta(days=DIAS_FUTUROS)
+
+
+def usuario_por_token(token):
+    """Usuario activo dueño del token de calendario, o None."""
+    if not token:
+        return None
+    perfil = PerfilUsuario.objects.select_related('user').filter(
+        token_calendario=token,
+        estado='activo',
+        user__is_active=True
+    ).first()
+    return perfil.user if perfil else None
+
+
+def version_feed_espacio(espacio, desde, hasta):
+    """(ETag, último cambio) del feed de un espacio; incluye el nombre, que va en cada evento."""
+    etag, ultimo = resumen_rango(desde, hasta, [espacio.id])
+    etag = '"%s"' % hashlib.md5(f'espacio:{espacio.id}:{espacio.nombre}:{etag}'.encode()).hexdigest()
+    return etag, ultimo
+
+
+def version_feed_usuario(usuario, desde, hasta):
+    """(ETag, último cambio) del feed de un usuario."""
+    with connection.cursor() as cursor:
+        cursor.execute(SQL_VERSION_USUARIO, [usuario.id, desde, hasta])
+        resumen, ultimo = cursor.fetchone()
+    etag = '"%s"' % hashlib.md5(f'usuario:{usuario.id}:{desde}:{hasta}:{resumen}'.encode()).hexdigest()
+    return etag, ultimo
+
+
+def reservas_feed_espacio(espacio, desde, hasta):
+    return Reserva.objects.filter(
+        espacio=espacio,
+        estado__in=ESTADOS_FEED_ESPACIO,
+        fecha_reserva__gte=desde,
+        fecha_reserva__lte=hasta
+    )
+
+
+def reservas_feed_usuario(usuario, desde, hasta):
+    return Reserva.objects.filter(
+        solicitante=usuario,
+        estado__in=ESTADOS_FEED_USUARIO,
+        fecha_reserva__gte=desde,
+        fecha_reserva__lte=hasta
+    )
+
+
+def _texto(valor):
+    """Escapa un valor TEXT de iCalendar."""
+    return (
+        str(valor or '')
+        .replace('\\', '\\\\')
+        .replace(';', '\\;')
+        .replace(',', '\\,')
+        .replace('\r\n', '\\n')
+        .replace('\n', '\\n')
+        .replace('\r', '')
+    )
+
+
+def _linea(contenido):
+    """Línea terminada en CRLF y plegada a 75 bytes como exige el RFC."""
+    if len(contenido.encode()) <= 75:
+        return contenido + '\r\n'
+    partes, actual, largo, limite = [], '', 0, 75
+    for caracter in contenido:
+        bytes_caracter = len(caracter.encode())
+        if largo + bytes_caracter > limite:
+            partes.append(actual)
+            # las líneas de continuación empiezan con un espacio
+            actual, largo, limite = '', 0, 74
+        actual += caracter
+        largo += bytes_caracter
+    partes.append(actual)
+    return '\r\n '.join(partes) + '\r\n'
+
+
+def _utc(fecha, hora):
+    local = timezone.make_aware(datetime.combine(fecha, hora))
+    return local.astimezone(dt_timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+
+
+def _marca_utc(momento):
+    return momento.astimezone(dt_timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+
+
+def generar_ics(reservas, nombre, dominio):
+    """
+    Genera el VCALENDAR por partes (una por evento).
+
+    Args:
+        reservas: QuerySet de Reserva (se lee con iterator)
+        nombre: nombre del calendario que muestra el cliente
+        dominio: host para los UID de los eventos
+    """
+    yield (
+        _linea('BEGIN:VCALENDAR')
+        + _linea('VERSION:2.0')
+        + _linea('PRODID:-//INACAP//Reserva de Espacios//ES')
+        + _linea('CALSCALE:GREGORIAN')
+        + _linea('METHOD:PUBLISH')
+        + _linea(f'X-WR-CALNAME:{_texto(nombre)}')
+        + _linea('X-PUBLISHED-TTL:PT15M')
+    )
+
+    reservas = reservas.select_related('espacio', 'solicitante').only(
+        'fecha_reserva', 'hora_inicio', 'hora_fin', 'proposito', 'estado', 'num_asistentes',
+        'fecha_solicitud', 'fecha_aprobacion',
+        'espacio__nombre', 'espacio__edificio', 'espacio__piso', 'solicitante__username'
+    ).order_by('fecha_reserva', 'hora_inicio', 'id')
+
+    for reserva in reservas.iterator(chunk_size=TAMANO_LOTE):
+        espacio = reserva.espacio
+        ubicacion = ', '.join(
+            parte for parte in (
+                espacio.nombre,
+                espacio.edificio,
+                f'Piso {espacio.piso}' if espacio.piso is not None else None
+            ) if parte
+        )
+        descripcion = (
+            f"{reserva.proposito}\n\nSolicitante: {reserva.solicitante.username}\n"
+            f"Asistentes: {reserva.num_asistentes}\nEstado: {reserva.estado}"
+        )
+        resumen = reserva.proposito.strip().splitlines()[0][:80] if reserva.proposito.strip() else espacio.nombre
+        yield (
+            _linea('BEGIN:VEVENT')
+            + _linea(f'UID:reserva-{reserva.id}@{dominio}')
+            + _linea(f'DTSTAMP:{_marca_utc(reserva.fecha_aprobacion or reserva.fecha_solicitud)}')
+            + _linea(f'DTSTART:{_utc(reserva.fecha_reserva, reserva.hora_inicio)}')
+            + _linea(f'DTEND:{_utc(reserva.fecha_reserva, reserva.hora_fin)}')
+            + _linea(f'SUMMARY:{_texto(f"{espacio.nombre}: {resumen}")}')
+            + _linea(f'LOCATION:{_texto(ubicacion)}')
+            + _linea(f'DESCRIPTION:{_texto(descripcion)}')
+            + _linea('STATUS:CONFIRMED' if reserva.estado == 'Aprobada' else 'STATUS:TENTATIVE')
+            + _linea('END:VEVENT')
+        )
+
+    yield _linea('END:VCALENDAR')
+
+
+def generar_y_guardar(partes, clave):
+    """Entrega las partes a medida que se generan y guarda el feed completo al terminar."""
+    generado, largo = [], 0
+    for parte in partes:
+        if generado is not None:
+            generado.append(parte)
+            largo += len(parte)
+            if largo > CACHE_MAX_CARACTERES:
+                generado = None
+        yield parte
+    if generado is not None:
+        cache.set(clave, ''.join(generado), CACHE_SEGUNDOS)
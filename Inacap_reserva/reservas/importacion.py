@@ -0,0 +1,308 @@
+"""
+Importación masiva de horarios académicos (CSV/XLSX) como reservas.
+
+El archivo se lee fila a fila y cada fila válida se guarda como una tupla
+compacta. Después se ordena por espacio, fecha y hora, y un barrido detecta
+en una sola pasada los choques internos del archivo y con las reservas
+activas existentes. Las filas válidas se insertan con bulk_create por lotes.
+
+Columnas: espacio (id o nombre), fecha (YYYY-MM-DD o DD/MM/YYYY), hora_inicio,
+hora_fin (HH:MM), solicitante (username o email), proposito y num_asistentes.
+"""
+import csv
+import io
+import time as reloj
+from bisect import bisect_left
+from datetime import datetime, date, time
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import Q
+from django.db.models.functions import Lower
+from .models import Espacio, Reserva, Mantenimiento
+from .ocupacion import reconstruir_ocupacion, incrementar_versiones, ESTADOS_MANTENIMIENTO_ACTIVOS
+from .ocupacion_horaria import actualizar_ocupacion_horas
+from .utils import validar_duracion_reserva, cargar_horarios, horario_vigente
+from .buffers import buffers_de_espacios
+
+COLUMNAS = ['espacio', 'fecha', 'hora_inicio', 'hora_fin', 'solicitante', 'proposito', 'num_asistentes']
+COLUMNAS_RECHAZOS = ['fila'] + COLUMNAS + ['motivo']
+TAMANO_LOTE = 2000
+
+
+class ErrorImportacion(Exception):
+    pass
+
+
+def leer_filas(archivo, nombre):
+    """
+    Itera las filas del archivo como dicts sin cargarlo completo en memoria.
+
+    archivo puede ser una ruta o un archivo binario abierto (p. ej. un UploadedFile).
+    """
+    if nombre.lower().endswith('.xlsx'):
+        try:
+            from openpyxl import load_workbook
+        except ImportError:
+            raise ErrorImportacion('Para importar archivos .xlsx instala openpyxl (pip install openpyxl)')
+
+        libro = load_workbook(archivo, read_only=True, data_only=True)
+        try:
+            filas = libro.active.iter_rows(values_only=True)
+            encabezado = [str(c or '').strip().lower() for c in next(filas, [])]
+            for valores in filas:
+                if any(v not in (None, '') for v in valores):
+                    yield dict(zip(encabezado, valores))
+        finally:
+            libro.close()
+        return
+
+    if isinstance(archivo, str):
+        texto = open(archivo, newline='', encoding='utf-8-sig')
+    else:
+        texto = io.TextIOWrapper(archivo, encoding='utf-8-sig', newline='')
+    try:
+        muestra = texto.read(4096)
+        texto.seek(0)
+        try:
+            dialecto = csv.Sniffer().sniff(muestra, delimiters=',;\t')
+        except csv.Error:
+            dialecto = csv.excel
+        lector = csv.DictReader(texto, dialect=dialecto)
+        lector.fieldnames = [c.strip().lower() for c in lector.fieldnames or []]
+        yield from lector
+    finally:
+        if isinstance(archivo, str):
+            texto.close()
+        else:
+            texto.detach()
+
+
+def _fecha(valor):
+    if isinstance(valor, datetime):
+        return valor.date()
+    if isinstance(valor, date):
+        return valor
+    valor = str(valor).strip()
+    try:
+        return date.fromisoformat(valor)
+    except ValueError:
+        pass
+    for formato in ('%d/%m/%Y', '%d-%m-%Y'):
+        try:
+            return datetime.strptime(valor, formato).date()
+        except ValueError:
+            pass
+    raise ValueError(f'fecha inválida: {valor}')
+
+
+def _hora(valor):
+    if isinstance(valor, datetime):
+        return valor.time()
+    if hasattr(valor, 'hour'):
+        return valor
+    valor = str(valor).strip()
+    try:
+        return time.fromisoformat(valor.zfill(5) if len(valor) == 4 else valor)
+    except ValueError:
+        pass
+    raise ValueError(f'hora inválida: {valor}')
+
+
+def _minutos(hora):
+    return hora.hour * 60 + hora.minute
+
+
+def importar_horario(archivo, nombre, estado='Aprobada', solicitante_defecto=None,
+                     simular=False, rechazos=None):
+    """
+    Importa un horario completo.
+
+    Args:
+        archivo: ruta o archivo binario abierto
+        nombre: nombre del archivo (define el formato por la extensión)
+        estado: estado de las reservas creadas
+        solicitante_defecto: User para filas sin columna solicitante
+        simular: validar y reportar sin insertar
+        rechazos: csv.writer donde escribir las filas rechazadas (COLUMNAS_RECHAZOS)
+
+    Returns:
+        dict: leidas, importadas, rechazadas y segundos
+    """
+    inicio = reloj.monotonic()
+    resultado = {'leidas': 0, 'importadas': 0, 'rechazadas': 0}
+
+    def rechazar(fila, datos, motivo):
+        resultado['rechazadas'] += 1
+        if rechazos is not None:
+            rechazos.writerow([fila] + [datos.get(c, '') for c in COLUMNAS] + [motivo])
+
+    espacios = {}
+    capacidades = {}
+    for espacio_id, nombre_espacio, capacidad in Espacio.objects.values_list('id', 'nombre', 'capacidad'):
+        espacios[str(espacio_id)] = espacio_id
+        espacios.setdefault(nombre_espacio.strip().lower(), espacio_id)
+        capacidades[espacio_id] = capacidad
+
+    # Tuplas compactas; los textos repetidos (propósito, solicitante) se comparten
+    textos = {}
+    filas = []
+    for numero, datos in enumerate(leer_filas(archivo, nombre), start=2):
+        resultado['leidas'] += 1
+        datos = {c: ('' if datos.get(c) is None else datos.get(c)) for c in COLUMNAS}
+        try:
+            espacio_id = espacios.get(str(datos['espacio']).strip().lower())
+            if espacio_id is None:
+                raise ValueError('espacio no existe')
+            fecha = _fecha(datos['fecha'])
+            hora_inicio = _hora(datos['hora_inicio'])
+            hora_fin = _hora(datos['hora_fin'])
+            asistentes = int(datos['num_asistentes'] or 1)
+        except (ValueError, TypeError) as e:
+            rechazar(numero, datos, str(e))
+            continue
+
+        valido, mensaje = validar_duracion_reserva(hora_inicio, hora_fin)
+        if not valido:
+            rechazar(numero, datos, mensaje)
+            continue
+        if asistentes > capacidades[espacio_id]:
+            rechazar(numero, datos, f'capacidad del espacio: {capacidades[espacio_id]}')
+            continue
+
+        solicitante = str(datos['solicitante']).strip().lower()
+        proposito = str(datos['proposito']).strip() or 'Clase'
+        filas.append((
+            espacio_id, fecha, _minutos(hora_inicio), _minutos(hora_fin),
+            textos.setdefault(solicitante, solicitante),
+            textos.setdefault(proposito, proposito),
+            asistentes, numero
+        ))
+
+    if not filas:
+        resultado['segundos'] = reloj.monotonic() - inicio
+        return resultado
+
+    # Solicitantes: una consulta por username/email distintos del archivo
+    claves = {f[4] for f in filas if f[4]}
+    usuarios = {}
+    for usuario_id, username, email in User.objects.annotate(
+        username_min=Lower('username'),
+        email_min=Lower('email')
+    ).filter(
+        Q(username_min__in=claves) | Q(email_min__in=claves)
+    ).values_list('id', 'username', 'email'):
+        usuarios[username.lower()] = usuario_id
+        if email:
+            usuarios.setdefault(email.lower(), usuario_id)
+    if solicitante_defecto is not None:
+        usuarios[''] = solicitante_defecto.id
+
+    filas.sort()
+    espacio_ids = {f[0] for f in filas}
+    desde, hasta = min(f[1] for f in filas), max(f[1] for f in filas)
+
+    # Reservas activas existentes del rango, unidas en intervalos disjuntos por (espacio, fecha)
+    ocupado = {}
+    for espacio_id, fecha, r_inicio, r_fin in Reserva.objects.filter(
+        espacio_id__in=espacio_ids,
+        fecha_reserva__gte=desde,
+        fecha_reserva__lte=hasta,
+        estado__in=Reserva.ESTADOS_ACTIVOS
+    ).order_by('espacio_id', 'fecha_reserva', 'hora_inicio').values_list(
+        'espacio_id', 'fecha_reserva', 'hora_inicio', 'hora_fin'
+    ).iterator(chunk_size=5000):
+        inicios, fines = ocupado.setdefault((espacio_id, fecha), ([], []))
+        r_inicio, r_fin = _minutos(r_inicio), _minutos(r_fin)
+        if fines and r_inicio <= fines[-1]:
+            fines[-1] = max(fines[-1], r_fin)
+        else:
+            inicios.append(r_inicio)
+            fines.append(r_fin)
+
+    en_mantenimiento = {}
+    for espacio_id, m_inicio, m_fin in Mantenimiento.objects.filter(
+        id_espacio_id__in=espacio_ids,
+        fecha_inicio__lte=hasta,
+        fecha_fin__gte=desde,
+        estado__in=ESTADOS_MANTENIMIENTO_ACTIVOS
+    ).values_list('id_espacio_id', 'fecha_inicio', 'fecha_fin'):
+        en_mantenimiento.setdefault(espacio_id, []).append((m_inicio, m_fin))
+
+    horarios = cargar_horarios(espacio_ids, hasta)
+    buffers = buffers_de_espacios(espacio_ids)
+
+    # Barrido: filas ordenadas por inicio dentro de cada (espacio, fecha); una fila
+    # choca si empieza antes del fin de la última aceptada del archivo más el
+    # tiempo entre reservas, o si ampliada con ese margen se cruza con un
+    # intervalo existente
+    aceptadas = []
+    grupo, fin_aceptado = None, 0
+    for fila in filas:
+        espacio_id, fecha, f_inicio, f_fin, solicitante, proposito, asistentes, numero = fila
+        if (espacio_id, fecha) != grupo:
+            grupo, fin_aceptado = (espacio_id, fecha), None
+            margen = sum(buffers.get(espacio_id, (0, 0)))
+
+        motivo = None
+        if solicitante not in usuarios:
+            motivo = 'solicitante no existe'
+        elif any(m_inicio <= fecha <= m_fin for m_inicio, m_fin in en_mantenimiento.get(espacio_id, ())):
+            motivo = 'El espacio está en mantenimiento en la fecha seleccionada'
+        elif fin_aceptado is not None and f_inicio < fin_aceptado + margen:
+            motivo = 'Conflicto con otra fila del archivo'
+        else:
+            inicios, fines = ocupado.get(grupo, ((), ()))
+            i = bisect_left(fines, f_inicio - margen + 1)
+            if i < len(inicios) and inicios[i] < f_fin + margen:
+                motivo = f'Conflicto con reserva existente de {inicios[i] // 60:02d}:{inicios[i] % 60:02d} a {fines[i] // 60:02d}:{fines[i] % 60:02d}'
+                if not (inicios[i] < f_fin and f_inicio < fines[i]):
+                    motivo += f' (el espacio requiere {margen} minutos entre reservas)'
+            else:
+                vigente = horario_vigente(horarios, espacio_id, fecha)
+                if vigente and (f_inicio < _minutos(vigente[0]) or f_fin > _minutos(vigente[1])):
+                    motivo = f"Fuera del horario del espacio ({vigente[0].strftime('%H:%M')} - {vigente[1].strftime('%H:%M')})"
+
+        if motivo:
+            rechazar(numero, {
+                'espacio': espacio_id, 'fecha': fecha.isoformat(),
+                'hora_inicio': f'{f_inicio // 60:02d}:{f_inicio % 60:02d}',
+                'hora_fin': f'{f_fin // 60:02d}:{f_fin % 60:02d}',
+                'solicitante': solicitante, 'proposito': proposito, 'num_asistentes': asistentes
+            }, motivo)
+            continue
+
+        fin_aceptado = f_fin
+        aceptadas.append(fila)
+
+    del filas
+    resultado['importadas'] = len(aceptadas)
+
+    if not simular and aceptadas:
+        with transaction.atomic():
+            for i in range(0, len(aceptadas), TAMANO_LOTE):
+                lote = []
+                for espacio_id, fecha, f_inicio, f_fin, solicitante, proposito, asistentes, _ in aceptadas[i:i + TAMANO_LOTE]:
+                    reserva = Reserva(
+                        espacio_id=espacio_id,
+                        solicitante_id=usuarios[solicitante],
+                        fecha_reserva=fecha,
+                        hora_inicio=time(f_inicio // 60, f_inicio % 60),
+                        hora_fin=time(f_fin // 60, f_fin % 60),
+                        proposito=proposito,
+                        num_asistentes=asistentes,
+                        estado=estado
+                    )
+                    # bulk_create no llama a save() ni a las señales
+                    reserva.rango_horario = reserva.calcular_rango_horario(buffers.get(espacio_id, (0, 0)))
+                    lote.append(reserva)
+                Reserva.objects.bulk_create(lote)
+
+            # Solo los espacios importados: el resto del campus no cambió en el rango
+            reconstruir_ocupacion(desde=desde, hasta=hasta, espacio_ids={fila[0] for fila in aceptadas})
+            # Una fila que cae en bloques ya marcados no los cambia
+            incrementar_versiones((fila[0], fila[1]) for fila in aceptadas)
+            if estado == 'Aprobada':
+                actualizar_ocupacion_horas((fila[0], fila[1]) for fila in aceptadas)
+
+    resultado['segundos'] = reloj.monotonic() - inicio
+    return resultado
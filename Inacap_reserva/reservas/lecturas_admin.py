@@ -0,0 +1,97 @@
+"""
+Estado de lectura de NotificacionAdmin por administrador.
+
+Cada administrador tiene una marca (LecturaNotificacionesAdmin.ultimo_leido_id):
+todo lo que tenga id menor o igual está leído. Lo leído una por una por encima
+de la marca queda en NotificacionAdminLeida. Así:
+
+- "marcar todas como leídas" es una sola escritura (mover la marca al último id)
+  y no toca las notificaciones, que son compartidas entre administradores;
+- las no leídas son el rango id > marca menos las excepciones en ese rango,
+  ambos conteos sobre índices.
+"""
+from django.db import connection, transaction
+from django.db.models import Exists, OuterRef
+from .models import NotificacionAdminLeida
+
+SQL_NO_LEIDAS = """
+    WITH marca AS (
+        SELECT COALESCE(
+            (SELECT ultimo_leido_id FROM reservas_lecturanotificacionesadmin WHERE usuario_id = %(usuario)s), 0
+        ) AS id
+    )
+    SELECT marca.id,
+           (SELECT COUNT(*) FROM reservas_notificacionadmin n WHERE n.id > marca.id)
+           - (SELECT COUNT(*) FROM reservas_notificacionadminleida l
+              WHERE l.usuario_id = %(usuario)s AND l.notificacion_id > marca.id)
+    FROM marca
+"""
+
+SQL_BLOQUEAR_NOTIFICACIONES = "LOCK TABLE reservas_notificacionadmin IN SHARE MODE"
+
+# Mueve la marca al último id (nunca hacia atrás) y borra las excepciones que quedaron debajo
+SQL_MARCAR_TODAS = """
+    WITH marca AS (
+        INSERT INTO reservas_lecturanotificacionesadmin (usuario_id, ultimo_leido_id, fecha_lectura)
+        SELECT %(usuario)s, COALESCE(MAX(id), 0), NOW() FROM reservas_notificacionadmin
+        ON CONFLICT (usuario_id) DO UPDATE
+        SET ultimo_leido_id = GREATEST(reservas_lecturanotificacionesadmin.ultimo_leido_id, EXCLUDED.ultimo_leido_id),
+            fecha_lectura = EXCLUDED.fecha_lectura
+        RETURNING ultimo_leido_id
+    )
+    DELETE FROM reservas_notificacionadminleida l USING marca
+    WHERE l.usuario_id = %(usuario)s AND l.notificacion_id <= marca.ultimo_leido_id
+"""
+
+
+def estado_lectura(usuario):
+    """
+    Returns:
+        tuple: (marca del administrador, notificaciones admin sin leer)
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(SQL_NO_LEIDAS, {'usuario': usuario.id})
+        return cursor.fetchone()
+
+
+def no_leidas_admin(usuario):
+    """Notificaciones administrativas que el administrador no ha leído."""
+    return estado_lectura(usuario)[1]
+
+
+def filtrar_no_leidas(notificaciones, usuario, marca):
+    """Restringe un QuerySet de NotificacionAdmin a las no leídas por el administrador."""
+    return notificaciones.filter(
+        ~Exists(NotificacionAdminLeida.objects.filter(usuario=usuario, notificacion=OuterRef('pk'))),
+        id__gt=marca
+    )
+
+
+def ids_leidos(usuario, marca, ids):
+    """De los ids dados, los que el administrador ya leyó."""
+    leidos = {id_ for id_ in ids if id_ <= marca}
+    pendientes = [id_ for id_ in ids if id_ > marca]
+    if pendientes:
+        leidos.update(NotificacionAdminLeida.objects.filter(
+            usuario=usuario, notificacion_id__in=pendientes
+        ).values_list('notificacion_id', flat=True))
+    return leidos
+
+
+def marcar_todas_leidas_admin(usuario):
+    """
+    Marca como leídas todas las notificaciones admin para un administrador.
+
+    Returns:
+        int: cuántas tenía sin leer
+    """
+    if not no_leidas_admin(usuario):
+        return 0
+    with transaction.atomic(), connection.cursor() as cursor:
+        # Un INSERT en curso pudo tomar un id menor que el MAX visible y confirmarse
+        # después: el bloqueo espera a que terminen y frena los nuevos hasta el COMMIT
+        cursor.execute(SQL_BLOQUEAR_NOTIFICACIONES)
+        no_leidas = no_leidas_admin(usuario)
+        if no_leidas:
+            cursor.execute(SQL_MARCAR_TODAS, {'usuario': usuario.id})
+    return no_leidas
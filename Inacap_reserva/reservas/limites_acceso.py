@@ -0,0 +1,172 @@
+"""
+Límite de intentos (token bucket) para login y recuperación de contraseña.
+
+Cada endpoint tiene un balde por IP y otro por cuenta (el email enviado),
+configurados en settings.LIMITES_ACCESO. Se revisa antes de autenticar, así
+que una solicitud rechazada no llega a calcular ningún hash de contraseña.
+
+- El balde vive en la tabla UNLOGGED reservas_limiteacceso: un solo INSERT ...
+  ON CONFLICT recarga y descuenta todos los baldes de la solicitud de forma
+  atómica, aunque haya varios procesos (la caché local no es compartida).
+- Cuando un balde se vacía, el tiempo de espera queda en la caché: mientras
+  dure, los rechazos siguientes no tocan la BD. Si la caché falla se sigue
+  solo con la BD; si falla la BD se deja pasar la solicitud.
+"""
+import math
+import threading
+import time
+from collections import Counter
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, DatabaseError
+
+# Recarga y descuenta en una sola sentencia; solo devuelve los baldes que tenían un token
+SQL_CONSUMIR = """
+    INSERT INTO reservas_limiteacceso AS l (clave, tokens, capacidad, recarga, actualizado)
+    SELECT v.clave, v.capacidad - 1, v.capacidad, v.recarga, clock_timestamp()
+    FROM (VALUES {valores}) AS v (clave, capacidad, recarga)
+    ON CONFLICT (clave) DO UPDATE SET
+        tokens = LEAST(EXCLUDED.capacidad,
+                       l.tokens + EXTRACT(EPOCH FROM EXCLUDED.actualizado - l.actualizado) * EXCLUDED.recarga) - 1,
+        capacidad = EXCLUDED.capacidad,
+        recarga = EXCLUDED.recarga,
+        actualizado = EXCLUDED.actualizado
+    WHERE LEAST(EXCLUDED.capacidad,
+                l.tokens + EXTRACT(EPOCH FROM EXCLUDED.actualizado - l.actualizado) * EXCLUDED.recarga) >= 1
+    RETURNING l.clave
+"""
+
+# Segundos hasta que cada balde vacío vuelva a tener un token
+SQL_ESPERA = """
+    SELECT clave,
+           (1 - LEAST(capacidad, tokens + EXTRACT(EPOCH FROM clock_timestamp() - actualizado) * recarga)) / recarga
+    FROM reservas_limiteacceso
+    WHERE clave = ANY(%s)
+"""
+
+SQL_VACIOS = """
+    SELECT split_part(clave, ':', 1), COUNT(*)
+    FROM reservas_limiteacceso
+    WHERE tokens + EXTRACT(EPOCH FROM clock_timestamp() - actualizado) * recarga < 1
+    GROUP BY 1
+"""
+
+# Un balde que ya se llenó de nuevo es igual a uno que no existe
+SQL_PURGAR = """
+    DELETE FROM reservas_limiteacceso
+    WHERE tokens + EXTRACT(EPOCH FROM clock_timestamp() - actualizado) * recarga >= capacidad
+"""
+
+PREFIJO_CACHE = 'reservas:limite:'
+
+# Contadores del proceso: (endpoint, resultado) -> cantidad
+_metricas = Counter()
+_bloqueo_metricas = threading.Lock()
+
+
+class LimiteExcedido(Exception):
+    def __init__(self, espera):
+        super().__init__(f'Límite de intentos excedido, reintentar en {espera} s')
+        self.espera = espera
+
+
+def _contar(endpoint, resultado):
+    with _bloqueo_metricas:
+        _metricas[(endpoint, resultado)] += 1
+
+
+def metricas():
+    """Permitidas/rechazadas por endpoint en este proceso, más los baldes vacíos en la BD."""
+    with _bloqueo_metricas:
+        por_endpoint = {}
+        for (endpoint, resultado), cantidad in _metricas.items():
+            por_endpoint.setdefault(endpoint, {})[resultado] = cantidad
+    with connection.cursor() as cursor:
+        cursor.execute(SQL_VACIOS)
+        for endpoint, vacios in cursor.fetchall():
+            por_endpoint.setdefault(endpoint, {})['baldes_vacios'] = vacios
+    return por_endpoint
+
+
+def limpiar_metricas():
+    with _bloqueo_metricas:
+        _metricas.clear()
+
+
+def ip_de(request):
+    if getattr(settings, 'LIMITES_ACCESO_DETRAS_DE_PROXY', False):
+        reenviada = request.META.get('HTTP_X_FORWARDED_FOR')
+        if reenviada:
+            return reenviada.split(',')[0].strip()
+    return request.META.get('REMOTE_ADDR') or 'desconocida'
+
+
+def _baldes(endpoint, ip, cuenta):
+    config = getattr(settings, 'LIMITES_ACCESO', {}).get(endpoint)
+    if not config:
+        return []
+    baldes = []
+    for dimension, valor in (('ip', ip), ('cuenta', cuenta)):
+        if valor and dimension in config:
+            capacidad, por_minuto = config[dimension]['capacidad'], config[dimension]['por_minuto']
+            baldes.append((f'{endpoint}:{dimension}:{valor}'[:200], capacidad, por_minuto / 60))
+    return baldes
+
+
+def _espera_en_cache(claves):
+    try:
+        hasta = cache.get_many([PREFIJO_CACHE + clave for clave in claves])
+    except Exception:
+        return 0
+    return max((h - time.time() for h in hasta.values()), default=0)
+
+
+def consumir(endpoint, ip, cuenta=None):
+    """
+    Descuenta un intento de los baldes de la IP y de la cuenta.
+
+    Raises:
+        LimiteExcedido: si alguno está vacío (con los segundos que faltan)
+    """
+    baldes = _baldes(endpoint, ip, (cuenta or '').strip().lower())
+    if not baldes:
+        return
+
+    espera = _espera_en_cache([clave for clave, _, _ in baldes])
+    if espera > 0:
+        _contar(endpoint, 'rechazadas_cache')
+        raise LimiteExcedido(math.ceil(espera))
+
+    try:
+        with connection.cursor() as cursor:
+            valores = ', '.join(['(%s, %s::float8, %s::float8)'] * len(baldes))
+            cursor.execute(SQL_CONSUMIR.format(valores=valores), [p for balde in baldes for p in balde])
+            con_token = {fila[0] for fila in cursor.fetchall()}
+            vacios = [clave for clave, _, _ in baldes if clave not in con_token]
+            if not vacios:
+                _contar(endpoint, 'permitidas')
+                return
+            cursor.execute(SQL_ESPERA, [vacios])
+            esperas = dict(cursor.fetchall())
+    except DatabaseError as e:
+        print(f"⚠️ Límite de acceso sin BD, se deja pasar: {e}")
+        _contar(endpoint, 'errores')
+        return
+
+    ahora = time.time()
+    try:
+        cache.set_many(
+            {PREFIJO_CACHE + clave: ahora + segundos for clave, segundos in esperas.items() if segundos > 0},
+            timeout=math.ceil(max(esperas.values(), default=1)),
+        )
+    except Exception:
+        pass
+    _contar(endpoint, 'rechazadas')
+    raise LimiteExcedido(max(1, math.ceil(max(esperas.values(), default=1))))
+
+
+def purgar():
+    """Elimina los baldes que ya se recargaron por completo. Devuelve cuántos."""
+    with connection.cursor() as cursor:
+        cursor.execute(SQL_PURGAR)
+        return cursor.rowcount
@@ -0,0 +1,33 @@
+import time
+from django.core.management.base import BaseCommand
+from reservas.archivo_notificaciones import archivar_notificaciones, contar_vencidas, TAMANO_LOTE
+
+
+class Command(BaseCommand):
+    help = (
+        'Mueve al archivo (particionado por mes) las notificaciones que superaron su retención '
+        '(settings.RETENCION_NOTIFICACIONES). Pensado para correr a diario.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=TAMANO_LOTE, help='Filas por transacción')
+        parser.add_argument('--pausa', type=float, default=0, help='Segundos de espera entre lotes')
+        parser.add_argument('--simular', action='store_true', help='Solo informa cuántas se archivarían')
+
+    def handle(self, *args, **options):
+        if options['simular']:
+            for origen, cantidad in contar_vencidas().items():
+                self.stdout.write(f"📦 {origen}: {cantidad} notificaciones para archivar")
+            return
+
+        def al_terminar_lote(origen, movidas):
+            self.stdout.write(f"   {origen}: {movidas} archivadas")
+            if options['pausa']:
+                time.sleep(options['pausa'])
+
+        inicio = time.perf_counter()
+        archivadas = archivar_notificaciones(options['lote'], al_terminar_lote)
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ {archivadas['usuario']} notificaciones de usuario y {archivadas['admin']} de administrador "
+            f"archivadas en {time.perf_counter() - inicio:.1f} s"
+        ))
@@ -0,0 +1,123 @@
+import json
+import threading
+import time as reloj
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.test import Client, override_settings
+from reservas.limites_acceso import PREFIJO_CACHE, limpiar_metricas, metricas
+from reservas.models import PerfilUsuario
+
+CUENTA = 'estres_login@inacap.cl'
+
+
+class Command(BaseCommand):
+    help = (
+        'Prueba de carga: varios hilos envían logins con contraseña incorrecta (una cuenta '
+        'y cuentas al azar desde pocas IP), sin y con límite de intentos, y compara el CPU usado.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hilos', type=int, default=8, help='Hilos atacantes')
+        parser.add_argument('--segundos', type=float, default=10, help='Duración de cada fase')
+        parser.add_argument('--ips', type=int, default=4, help='IPs distintas que usan los atacantes')
+        parser.add_argument('--tasa', type=float, default=40, help='Solicitudes por segundo del ataque (todas las IPs)')
+
+    def handle(self, *args, **options):
+        if not settings.LIMITES_ACCESO.get('login'):
+            raise CommandError('settings.LIMITES_ACCESO no define límites para login')
+        if User.objects.filter(username='estres_login').exists():
+            raise CommandError('Ya existe el usuario estres_login; bórralo antes de correr la prueba')
+
+        usuario = User.objects.create_user('estres_login', CUENTA, 'clave-correcta-estres')
+        PerfilUsuario.objects.create(user=usuario, rol='Usuario')
+        ips = [f'203.0.113.{n + 1}' for n in range(options['ips'])]
+        try:
+            with override_settings(LIMITES_ACCESO={}):
+                sin_limite = self._atacar(options['hilos'], options['segundos'], ips, options['tasa'])
+            # Primero se gasta la capacidad inicial de los baldes; se mide el estado estable
+            vaciado = self._atacar(options['hilos'], 120, ips, None, hasta_rechazo=True)
+            limpiar_metricas()
+            con_limite = self._atacar(options['hilos'], options['segundos'], ips, options['tasa'])
+            resumen = metricas().get('login', {})
+        finally:
+            usuario.delete()
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    "DELETE FROM reservas_limiteacceso WHERE clave LIKE 'login:%%' AND "
+                    "(split_part(clave, ':', 3) = ANY(%s) OR clave LIKE 'login:cuenta:estres_login%%')",
+                    [ips]
+                )
+            cache.delete_many([PREFIJO_CACHE + f'login:ip:{ip}' for ip in ips] + [PREFIJO_CACHE + f'login:cuenta:{CUENTA}'])
+
+        self.stdout.write(
+            f"Ataque de {options['tasa']:.0f} solicitudes/s, {options['hilos']} hilos x {options['segundos']:.0f} s desde {len(ips)} IPs "
+            f"(baldes vaciados en {vaciado['segundos']:.1f} s con {vaciado['solicitudes']} solicitudes):"
+        )
+        for nombre, fase in (('sin límite', sin_limite), ('con límite', con_limite)):
+            self.stdout.write(
+                f"  {nombre:<11} {fase['solicitudes'] / fase['segundos']:8.1f} solicitudes/s, "
+                f"{fase['rechazadas']:6d} rechazadas (429), "
+                f"CPU {fase['cpu'] / fase['segundos'] * 100:5.0f} % de un núcleo"
+            )
+        self.stdout.write(f"  métricas con límite: {json.dumps(resumen, ensure_ascii=False)}")
+
+        if sin_limite['cpu'] and con_limite['cpu'] / con_limite['segundos'] > sin_limite['cpu'] / sin_limite['segundos'] / 2:
+            raise CommandError('El límite de intentos no redujo el CPU usado a menos de la mitad')
+        self.stdout.write(self.style.SUCCESS('✅ Bajo ataque el login ya no consume CPU en hashes'))
+
+    def _atacar(self, hilos, segundos, ips, tasa, hasta_rechazo=False):
+        """
+        Ataca durante `segundos` a `tasa` solicitudes/s (None: lo más rápido posible) o,
+        con hasta_rechazo, hasta vaciar el balde de todas las IPs.
+        """
+        intervalo = hilos / tasa if tasa else 0
+        resultados = {'solicitudes': 0, 'rechazadas': 0}
+        ips_rechazadas = set()
+        bloqueo = threading.Lock()
+        barrera = threading.Barrier(hilos + 1)
+
+        def trabajador(numero):
+            cliente = Client(HTTP_HOST='localhost', REMOTE_ADDR=ips[numero % len(ips)])
+            solicitudes = rechazadas = intento = 0
+            barrera.wait()
+            try:
+                siguiente = reloj.monotonic()
+                while reloj.monotonic() < fin and not (hasta_rechazo and len(ips_rechazadas) == len(ips)):
+                    # Con el servidor saturado no se acumulan solicitudes atrasadas
+                    siguiente = max(siguiente + intervalo, reloj.monotonic())
+                    # La mitad apunta a una cuenta real; el resto rota cuentas inexistentes
+                    cuenta = CUENTA if intento % 2 == 0 else f'estres_login_{numero}_{intento}@inacap.cl'
+                    respuesta = cliente.post(
+                        '/login/',
+                        json.dumps({'email': cuenta, 'password': f'incorrecta-{intento}'}),
+                        content_type='application/json'
+                    )
+                    solicitudes += 1
+                    if respuesta.status_code == 429:
+                        rechazadas += 1
+                        if cuenta != CUENTA:
+                            # Con una cuenta nueva el rechazo solo puede venir del balde de la IP
+                            ips_rechazadas.add(ips[numero % len(ips)])
+                    intento += 1
+                    reloj.sleep(max(0, siguiente - reloj.monotonic()))
+            finally:
+                connections.close_all()
+                with bloqueo:
+                    resultados['solicitudes'] += solicitudes
+                    resultados['rechazadas'] += rechazadas
+
+        trabajadores = [threading.Thread(target=trabajador, args=(n,)) for n in range(hilos)]
+        for hilo in trabajadores:
+            hilo.start()
+        fin = reloj.monotonic() + segundos
+        barrera.wait()
+        cpu = reloj.process_time()
+        inicio = reloj.monotonic()
+        for hilo in trabajadores:
+            hilo.join()
+        resultados['segundos'] = reloj.monotonic() - inicio
+        resultados['cpu'] = reloj.process_time() - cpu
+        return resultados
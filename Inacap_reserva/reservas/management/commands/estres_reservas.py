@@ -0,0 +1,128 @@
+import random
+import threading
+from datetime import datetime, date, time, timedelta
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections, transaction, IntegrityError, OperationalError
+from reservas.models import Espacio, Reserva
+from reservas.utils import validar_disponibilidad_espacio, es_error_solapamiento
+
+
+class Command(BaseCommand):
+    help = (
+        'Prueba de carga: varios hilos intentan reservar en paralelo los mismos horarios '
+        'y se verifica que no quede ninguna reserva activa solapada'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--espacio', type=int, help='Espacio a usar (por defecto el primero)')
+        parser.add_argument('--fecha', help='Fecha de las reservas (YYYY-MM-DD, por defecto en 90 días)')
+        parser.add_argument('--hilos', type=int, default=16, help='Hilos concurrentes')
+        parser.add_argument('--intentos', type=int, default=25, help='Reservas que intenta cada hilo')
+        parser.add_argument('--conservar', action='store_true', help='No eliminar las reservas creadas')
+
+    def handle(self, *args, **options):
+        espacio = Espacio.objects.filter(id=options['espacio']).first() if options['espacio'] else Espacio.objects.order_by('id').first()
+        usuario = User.objects.order_by('id').first()
+        if espacio is None or usuario is None:
+            raise CommandError('Se necesita al menos un espacio y un usuario')
+
+        try:
+            fecha = datetime.strptime(options['fecha'], '%Y-%m-%d').date() if options['fecha'] else date.today() + timedelta(days=90)
+        except ValueError:
+            raise CommandError('Formato de fecha inválido. Use YYYY-MM-DD')
+
+        # Pocos horarios posibles para forzar la mayor cantidad de choques
+        horarios = [
+            (time(h, m), (datetime.combine(fecha, time(h, m)) + timedelta(minutes=duracion)).time())
+            for h in range(8, 18) for m in (0, 30) for duracion in (30, 60, 90)
+        ]
+        proposito = f'Prueba de estrés {datetime.now().isoformat()}'
+        resultados = {'creadas': 0, 'rechazadas_validacion': 0, 'rechazadas_bd': 0, 'errores': 0}
+        bloqueo = threading.Lock()
+        barrera = threading.Barrier(options['hilos'])
+
+        def trabajador():
+            barrera.wait()
+            try:
+                for _ in range(options['intentos']):
+                    hora_inicio, hora_fin = random.choice(horarios)
+                    resultado = self._reservar(espacio, usuario, fecha, hora_inicio, hora_fin, proposito)
+                    with bloqueo:
+                        resultados[resultado] += 1
+            finally:
+                connections.close_all()
+
+        hilos = [threading.Thread(target=trabajador) for _ in range(options['hilos'])]
+        inicio = datetime.now()
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+        segundos = (datetime.now() - inicio).total_seconds()
+
+        solapadas = self._contar_solapadas(espacio.id, fecha)
+
+        if not options['conservar']:
+            Reserva.objects.filter(espacio=espacio, fecha_reserva=fecha, proposito=proposito).delete()
+
+        self.stdout.write(
+            f"Espacio {espacio.id} {fecha}: {options['hilos']} hilos x {options['intentos']} intentos en {segundos:.2f}s\n"
+            f"  creadas: {resultados['creadas']}\n"
+            f"  rechazadas por validación: {resultados['rechazadas_validacion']}\n"
+            f"  rechazadas por la restricción de la BD: {resultados['rechazadas_bd']}\n"
+            f"  errores: {resultados['errores']}"
+        )
+        if solapadas:
+            raise CommandError(f'{solapadas} pares de reservas activas solapadas')
+        if resultados['errores']:
+            raise CommandError(f"{resultados['errores']} intentos terminaron con errores inesperados")
+        self.stdout.write(self.style.SUCCESS('✅ Sin reservas dobles'))
+
+    def _reservar(self, espacio, usuario, fecha, hora_inicio, hora_fin, proposito):
+        """Mismo flujo que crear_reserva_api: validar y luego insertar."""
+        try:
+            with transaction.atomic():
+                disponible, _ = validar_disponibilidad_espacio(espacio.id, fecha, hora_inicio, hora_fin)
+                if not disponible:
+                    return 'rechazadas_validacion'
+                try:
+                    with transaction.atomic():
+                        Reserva.objects.create(
+                            espacio=espacio,
+                            solicitante=usuario,
+                            fecha_reserva=fecha,
+                            hora_inicio=hora_inicio,
+                            hora_fin=hora_fin,
+                            proposito=proposito,
+                            num_asistentes=1,
+                            estado='Pendiente'
+                        )
+                except (IntegrityError, OperationalError) as e:
+                    if not es_error_solapamiento(e):
+                        raise
+                    return 'rechazadas_bd'
+            return 'creadas'
+        except Exception as e:
+            self.stderr.write(f'❌ {e}')
+            return 'errores'
+
+    def _contar_solapadas(self, espacio_id, fecha):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                """
+                SELECT COUNT(*)
+                FROM reservas_reserva a
+                JOIN reservas_reserva b
+                  ON a.espacio_id = b.espacio_id
+                 AND a.fecha_reserva = b.fecha_reserva
+                 AND a.id < b.id
+                 AND a.hora_inicio < b.hora_fin
+                 AND b.hora_inicio < a.hora_fin
+                WHERE a.espacio_id = %s AND a.fecha_reserva = %s
+                  AND a.estado IN ('Pendiente', 'Aprobada')
+                  AND b.estado IN ('Pendiente', 'Aprobada')
+                """,
+                [espacio_id, fecha]
+            )
+            return cursor.fetchone()[0]
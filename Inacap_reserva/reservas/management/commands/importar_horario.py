@@ -0,0 +1,59 @@
+import csv
+import os
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import IntegrityError
+from reservas.models import Reserva
+from reservas.importacion import importar_horario, ErrorImportacion, COLUMNAS_RECHAZOS
+
+
+class Command(BaseCommand):
+    help = 'Importa un horario académico (CSV o XLSX) como reservas, rechazando las filas con conflictos'
+
+    def add_arguments(self, parser):
+        parser.add_argument('archivo', help='Archivo .csv o .xlsx')
+        parser.add_argument(
+            '--estado', default='Aprobada', choices=[e[0] for e in Reserva.ESTADO_CHOICES],
+            help='Estado de las reservas importadas (por defecto Aprobada)'
+        )
+        parser.add_argument('--solicitante', help='Username para las filas sin columna solicitante')
+        parser.add_argument('--rechazos', help='Archivo CSV de filas rechazadas (por defecto <archivo>.rechazos.csv)')
+        parser.add_argument('--simular', action='store_true', help='Validar sin insertar')
+
+    def handle(self, *args, **options):
+        archivo = options['archivo']
+        if not os.path.exists(archivo):
+            raise CommandError(f'No existe el archivo {archivo}')
+
+        solicitante = None
+        if options['solicitante']:
+            solicitante = User.objects.filter(username=options['solicitante']).first()
+            if solicitante is None:
+                raise CommandError(f"No existe el usuario {options['solicitante']}")
+
+        ruta_rechazos = options['rechazos'] or f'{os.path.splitext(archivo)[0]}.rechazos.csv'
+        with open(ruta_rechazos, 'w', newline='', encoding='utf-8') as salida:
+            rechazos = csv.writer(salida)
+            rechazos.writerow(COLUMNAS_RECHAZOS)
+            try:
+                resultado = importar_horario(
+                    archivo, archivo,
+                    estado=options['estado'],
+                    solicitante_defecto=solicitante,
+                    simular=options['simular'],
+                    rechazos=rechazos
+                )
+            except ErrorImportacion as e:
+                raise CommandError(str(e))
+            except IntegrityError as e:
+                raise CommandError(f'Otra reserva ocupó un horario durante la importación, no se importó nada: {e}')
+
+        accion = 'válidas (simulación)' if options['simular'] else 'importadas'
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ {resultado['leidas']} filas leídas, {resultado['importadas']} {accion}, "
+            f"{resultado['rechazadas']} rechazadas en {resultado['segundos']:.1f}s"
+        ))
+        if resultado['rechazadas']:
+            self.stdout.write(f'Filas rechazadas: {ruta_rechazos}')
+        else:
+            os.remove(ruta_rechazos)
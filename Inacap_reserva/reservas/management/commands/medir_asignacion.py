@@ -0,0 +1,113 @@
+import random
+import time as reloj
+from datetime import date, datetime, timedelta
+from django.core.management.base import BaseCommand, CommandError
+from reservas.models import Espacio
+from reservas.asignacion import resolver_asignacion, planificar_asignacion, _choca, _unir_intervalos
+
+
+class Command(BaseCommand):
+    help = (
+        'Mide el algoritmo de asignación de salas con datos sintéticos (por defecto 5000 '
+        'solicitudes y 500 salas) y lo compara con aprobar cada solicitud en la sala pedida'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--solicitudes', type=int, default=5000)
+        parser.add_argument('--salas', type=int, default=500)
+        parser.add_argument('--dias', type=int, default=5, help='Días que cubren las solicitudes')
+        parser.add_argument('--ocupacion', type=float, default=0.3, help='Fracción de salas-día con reservas ya aprobadas')
+        parser.add_argument('--semilla', type=int, default=1)
+        parser.add_argument(
+            '--bd', nargs=2, metavar=('DESDE', 'HASTA'),
+            help='Además medir planificar_asignacion sobre las pendientes reales del rango (sin aplicar nada)'
+        )
+
+    def handle(self, *args, **options):
+        aleatorio = random.Random(options['semilla'])
+        tipos = [t[0] for t in Espacio.TIPO_CHOICES]
+        capacidades_posibles = [8, 12, 20, 30, 40, 60, 100, 200]
+
+        salas = [
+            (espacio_id, aleatorio.choice(capacidades_posibles), aleatorio.choice(tipos))
+            for espacio_id in range(1, options['salas'] + 1)
+        ]
+        por_tipo = {}
+        for sala in salas:
+            por_tipo.setdefault(sala[2], []).append(sala)
+
+        fechas = [date.today() + timedelta(days=n) for n in range(options['dias'])]
+
+        # Reservas ya aprobadas: bloques fijos en una parte de las salas
+        bloqueos = {}
+        for espacio_id, _, _ in salas:
+            for fecha in fechas:
+                if aleatorio.random() < options['ocupacion']:
+                    inicio = aleatorio.randrange(8 * 60, 18 * 60, 30)
+                    bloqueos[(espacio_id, fecha)] = _unir_intervalos([(inicio, inicio + aleatorio.choice([60, 90, 120]))])
+
+        solicitudes = []
+        for reserva_id in range(1, options['solicitudes'] + 1):
+            asistentes = max(1, int(aleatorio.expovariate(1 / 15)))
+            tipo = aleatorio.choice(tipos)
+            # Como hoy: el usuario elige cualquier sala de su tipo donde quepa, no la más ajustada
+            posibles = [s for s in por_tipo.get(tipo, []) if s[1] >= asistentes] or por_tipo.get(tipo, salas)
+            original = aleatorio.choice(posibles)[0]
+            inicio = aleatorio.randrange(8 * 60, 20 * 60, 30)
+            fin = min(inicio + aleatorio.choice([60, 90, 120, 180]), 22 * 60)
+            solicitudes.append((reserva_id, aleatorio.choice(fechas), inicio, fin, asistentes, tipo, original))
+
+        capacidades = {s[0]: s[1] for s in salas}
+
+        # Referencia: aprobar en orden de llegada cada solicitud en la sala pedida si está libre
+        inicio_medicion = reloj.perf_counter()
+        ocupadas = {}
+        aceptadas_base = desperdicio_base = 0
+        for reserva_id, fecha, inicio, fin, asistentes, tipo, original in solicitudes:
+            clave = (original, fecha)
+            if asistentes > capacidades[original] or _choca(bloqueos.get(clave), inicio, fin):
+                continue
+            if any(i < fin and inicio < f for i, f in ocupadas.get(clave, ())):
+                continue
+            ocupadas.setdefault(clave, []).append((inicio, fin))
+            aceptadas_base += 1
+            desperdicio_base += capacidades[original] - asistentes
+        segundos_base = reloj.perf_counter() - inicio_medicion
+
+        inicio_medicion = reloj.perf_counter()
+        asignadas, sin_asignar = resolver_asignacion(solicitudes, salas, bloqueos)
+        segundos = reloj.perf_counter() - inicio_medicion
+
+        # Verificación: ninguna sala queda con dos solicitudes solapadas ni sobre un bloqueo
+        por_sala = {}
+        for reserva_id, fecha, inicio, fin, asistentes, tipo, original in solicitudes:
+            espacio_id = asignadas.get(reserva_id)
+            if espacio_id is None:
+                continue
+            if asistentes > capacidades[espacio_id] or _choca(bloqueos.get((espacio_id, fecha)), inicio, fin):
+                raise CommandError(f'Asignación inválida para la solicitud {reserva_id}')
+            por_sala.setdefault((espacio_id, fecha), []).append((inicio, fin))
+        for intervalos in por_sala.values():
+            intervalos.sort()
+            if any(intervalos[i][1] > intervalos[i + 1][0] for i in range(len(intervalos) - 1)):
+                raise CommandError('Dos solicitudes quedaron solapadas en la misma sala')
+
+        desperdicio = sum(capacidades[asignadas[s[0]]] - s[4] for s in solicitudes if s[0] in asignadas)
+        self.stdout.write(
+            f"{len(solicitudes)} solicitudes, {len(salas)} salas, {len(fechas)} días\n"
+            f"  sala pedida:       {aceptadas_base} aceptadas, capacidad sin usar {desperdicio_base} ({segundos_base * 1000:.0f} ms)\n"
+            f"  asignación:        {len(asignadas)} aceptadas, capacidad sin usar {desperdicio} ({segundos * 1000:.0f} ms)\n"
+            f"  sin asignar:       {len(sin_asignar)}"
+        )
+
+        if options['bd']:
+            try:
+                desde, hasta = (datetime.strptime(f, '%Y-%m-%d').date() for f in options['bd'])
+            except ValueError:
+                raise CommandError('Formato de fecha inválido. Use YYYY-MM-DD')
+            inicio_medicion = reloj.perf_counter()
+            plan = planificar_asignacion(desde, hasta)
+            segundos = reloj.perf_counter() - inicio_medicion
+            self.stdout.write(f"  base de datos {desde} - {hasta}: {plan['resumen']} ({segundos:.2f}s)")
+
+        self.stdout.write(self.style.SUCCESS('✅ Asignación válida'))
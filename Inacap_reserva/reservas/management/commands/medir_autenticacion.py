@@ -0,0 +1,112 @@
+import random
+import time as reloj
+from django.contrib.auth import authenticate, get_user, get_user_model, HASH_SESSION_KEY, SESSION_KEY, BACKEND_SESSION_KEY
+from django.contrib.sessions.backends.db import SessionStore
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Q
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+from reservas.backends import buscar_usuario_login, limpiar_cache_usuarios
+
+UserModel = get_user_model()
+BACKEND = 'reservas.backends.EmailBackend'
+
+
+class _Deshacer(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        'Mide el login (búsqueda por email/username) y el costo de autenticar cada solicitud '
+        '(EmailBackend.get_user) con usuarios sintéticos. No deja datos.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--usuarios', type=int, default=50000, help='Usuarios sintéticos a crear')
+        parser.add_argument('--repeticiones', type=int, default=500)
+        parser.add_argument('--semilla', type=int, default=1)
+
+    def handle(self, *args, **options):
+        aleatorio = random.Random(options['semilla'])
+        repeticiones = options['repeticiones']
+        try:
+            with transaction.atomic():
+                UserModel.objects.bulk_create([
+                    UserModel(username=f'medicion_{n}', email=f'Medicion.{n}@Inacap.cl', password='!')
+                    for n in range(options['usuarios'])
+                ], batch_size=5000)
+                usuario = UserModel.objects.create_user('medicion_login', 'medicion_login@inacap.cl', 'clave-medicion')
+                with connection.cursor() as cursor:
+                    cursor.execute('ANALYZE auth_user')
+
+                valores = [
+                    aleatorio.choice([f'medicion.{n}@inacap.cl', f'MEDICION_{n}'])
+                    for n in (aleatorio.randrange(options['usuarios']) for _ in range(repeticiones))
+                ]
+                self._medir_busqueda(valores)
+                self._medir_login()
+                self._medir_solicitud(usuario, repeticiones)
+                raise _Deshacer
+        except _Deshacer:
+            pass
+        finally:
+            limpiar_cache_usuarios()
+
+        self.stdout.write(self.style.SUCCESS('✅ Medición terminada'))
+
+    def _medir_busqueda(self, valores):
+        def anterior(valor):
+            # Búsqueda previa: __iexact compila a UPPER() y no usa índices
+            return UserModel.objects.filter(Q(email__iexact=valor) | Q(username__iexact=valor)).first()
+
+        self.stdout.write(f"Búsqueda de usuario en el login ({len(valores)} búsquedas):")
+        for nombre, buscar in (('__iexact (antes)', anterior), ('lower() + índice', buscar_usuario_login)):
+            inicio = reloj.perf_counter()
+            for valor in valores:
+                buscar(valor)
+            milisegundos = (reloj.perf_counter() - inicio) * 1000 / len(valores)
+            self.stdout.write(f"  {nombre:<18} {milisegundos:7.3f} ms por búsqueda  [{self._plan(buscar, valores[0])}]")
+
+    def _plan(self, buscar, valor):
+        """Nodos de lectura del plan de la consulta que hace buscar(valor)."""
+        with CaptureQueriesContext(connection) as consultas:
+            buscar(valor)
+        with connection.cursor() as cursor:
+            cursor.execute(f"EXPLAIN {consultas.captured_queries[-1]['sql']}")
+            nodos = [fila[0].strip().lstrip('-> ').split('  ')[0] for fila in cursor.fetchall()]
+        return ', '.join(nodo for nodo in nodos if 'Scan' in nodo)
+
+    def _medir_login(self):
+        # El hash de la contraseña (PBKDF2) domina el login; se mide aparte de la búsqueda
+        veces = 5
+        inicio = reloj.perf_counter()
+        for _ in range(veces):
+            assert authenticate(None, username='MEDICION_LOGIN@inacap.cl', password='clave-medicion') is not None
+        milisegundos = (reloj.perf_counter() - inicio) * 1000 / veces
+        self.stdout.write(f"Login completo (authenticate con verificación de contraseña): {milisegundos:.1f} ms")
+
+    def _medir_solicitud(self, usuario, repeticiones):
+        sesion = SessionStore()
+        sesion[SESSION_KEY] = str(usuario.pk)
+        sesion[BACKEND_SESSION_KEY] = BACKEND
+        sesion[HASH_SESSION_KEY] = usuario.get_session_auth_hash()
+        request = RequestFactory().get('/')
+        request.session = sesion
+
+        self.stdout.write(f"Autenticación por solicitud (django.contrib.auth.get_user, {repeticiones} solicitudes):")
+        for nombre, vaciar in (('sin caché', True), ('con caché', False)):
+            limpiar_cache_usuarios()
+            get_user(request)
+            with CaptureQueriesContext(connection) as consultas:
+                inicio = reloj.perf_counter()
+                for _ in range(repeticiones):
+                    if vaciar:
+                        limpiar_cache_usuarios()
+                    assert get_user(request).pk == usuario.pk
+                segundos = reloj.perf_counter() - inicio
+            self.stdout.write(
+                f"  {nombre:<10} {segundos * 1000 / repeticiones:7.3f} ms por solicitud, "
+                f"{len(consultas.captured_queries) / repeticiones:.0f} consultas"
+            )
@@ -0,0 +1,61 @@
+import select
+import time
+import psycopg2
+from psycopg2.extensions import ISOLATION_LEVEL_AUTOCOMMIT
+from django.core.management.base import BaseCommand
+from django.db import connections
+from reservas.bandeja_notificaciones import procesar_pendientes, CANAL_POSTGRES, TAMANO_LOTE
+
+
+class Command(BaseCommand):
+    help = (
+        'Worker de la bandeja de salida: crea las notificaciones pendientes por lotes. '
+        'Espera avisos de la base de datos (LISTEN) y revisa igual cada --intervalo segundos.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--una-vez', action='store_true', help='Procesa lo pendiente y termina')
+        parser.add_argument('--lote', type=int, default=TAMANO_LOTE, help='Eventos por transacción')
+        parser.add_argument('--intervalo', type=float, default=30, help='Segundos máximos entre revisiones')
+
+    def handle(self, *args, **options):
+        if options['una_vez']:
+            self._procesar(options['lote'])
+            return
+
+        self.stdout.write(f"📡 Escuchando {CANAL_POSTGRES} (Ctrl+C para terminar)")
+        conexion = None
+        try:
+            while True:
+                if conexion is None:
+                    conexion = self._escuchar()
+                # Primero lo pendiente (incluye lo que llegó sin worker o durante una reconexión)
+                self._procesar(options['lote'])
+                try:
+                    if select.select([conexion], [], [], options['intervalo'])[0]:
+                        conexion.poll()
+                        conexion.notifies.clear()
+                except psycopg2.Error as e:
+                    self.stdout.write(self.style.WARNING(f"⚠️ Se perdió la conexión de escucha: {e}"))
+                    conexion = None
+                    time.sleep(5)
+        except KeyboardInterrupt:
+            self.stdout.write('⏹️ Worker detenido')
+        finally:
+            if conexion is not None:
+                conexion.close()
+
+    def _escuchar(self):
+        conexion = psycopg2.connect(**connections['default'].get_connection_params())
+        conexion.set_isolation_level(ISOLATION_LEVEL_AUTOCOMMIT)
+        with conexion.cursor() as cursor:
+            cursor.execute(f'LISTEN {CANAL_POSTGRES}')
+        return conexion
+
+    def _procesar(self, lote):
+        procesados, creadas = procesar_pendientes(lote)
+        if procesados:
+            self.stdout.write(self.style.SUCCESS(
+                f"✅ {procesados} eventos procesados, {creadas} notificaciones creadas "
+                f"({procesados - creadas} duplicados descartados)"
+            ))
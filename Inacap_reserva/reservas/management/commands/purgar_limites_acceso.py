@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+from reservas.limites_acceso import purgar
+
+
+class Command(BaseCommand):
+    help = (
+        'Elimina los baldes del límite de intentos que ya se recargaron por completo '
+        '(equivalen a no tener balde). Pensado para correr periódicamente, p. ej. cada hora.'
+    )
+
+    def handle(self, *args, **options):
+        self.stdout.write(self.style.SUCCESS(f"✅ {purgar()} baldes eliminados"))
@@ -0,0 +1,46 @@
+import time
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+# Borra por lotes para no tomar un bloqueo largo sobre la tabla
+SQL_PURGAR_LOTE = """
+    DELETE FROM reservas_onetimepassword
+    WHERE id IN (
+        SELECT id FROM reservas_onetimepassword
+        WHERE expires_at < NOW() - make_interval(hours => %s)
+        ORDER BY expires_at
+        LIMIT %s
+        FOR UPDATE SKIP LOCKED
+    )
+"""
+TAMANO_LOTE = 1000
+
+
+class Command(BaseCommand):
+    help = (
+        'Elimina por lotes los OTP de recuperación de contraseña vencidos '
+        '(usados o no). Pensado para correr periódicamente, p. ej. cada hora.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=TAMANO_LOTE, help='Filas por transacción')
+        parser.add_argument('--pausa', type=float, default=0, help='Segundos de espera entre lotes')
+        parser.add_argument('--gracia', type=int, default=24, help='Horas que se conservan tras vencer')
+
+    def handle(self, *args, **options):
+        inicio = time.perf_counter()
+        total = 0
+        while True:
+            with transaction.atomic(), connection.cursor() as cursor:
+                cursor.execute(SQL_PURGAR_LOTE, [options['gracia'], options['lote']])
+                borradas = cursor.rowcount
+            total += borradas
+            if borradas < options['lote']:
+                break
+            self.stdout.write(f"   {borradas} OTP eliminados")
+            if options['pausa']:
+                time.sleep(options['pausa'])
+
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ {total} OTP vencidos eliminados en {time.perf_counter() - inicio:.1f} s"
+        ))
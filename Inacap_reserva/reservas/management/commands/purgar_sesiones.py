@@ -0,0 +1,26 @@
+import time
+from django.core.management.base import BaseCommand
+from reservas.sesiones import purgar_vencidas, TAMANO_LOTE
+
+
+class Command(BaseCommand):
+    help = (
+        'Elimina por lotes las sesiones vencidas de django_session (reemplaza a clearsessions, '
+        'que las borra en una sola sentencia). Pensado para correr a diario.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=TAMANO_LOTE, help='Filas por transacción')
+        parser.add_argument('--pausa', type=float, default=0, help='Segundos de espera entre lotes')
+
+    def handle(self, *args, **options):
+        def al_terminar_lote(borradas):
+            self.stdout.write(f"   {borradas} sesiones eliminadas")
+            if options['pausa']:
+                time.sleep(options['pausa'])
+
+        inicio = time.perf_counter()
+        total = purgar_vencidas(options['lote'], al_terminar_lote)
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ {total} sesiones vencidas eliminadas en {time.perf_counter() - inicio:.1f} s"
+        ))
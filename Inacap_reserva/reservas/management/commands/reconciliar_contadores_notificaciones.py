@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand, CommandError
+from reservas.contadores import reconciliar_contadores
+
+
+class Command(BaseCommand):
+    help = 'Compara los contadores de notificaciones no leídas con el conteo real y corrige los desviados'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--solo-verificar', action='store_true',
+            help='Informa las diferencias sin corregirlas (termina con error si hay alguna)'
+        )
+
+    def handle(self, *args, **options):
+        corregir = not options['solo_verificar']
+        desviados = reconciliar_contadores(corregir=corregir)
+
+        for clave, antes, despues in desviados:
+            estilo = self.style.WARNING if corregir else self.style.ERROR
+            self.stdout.write(estilo(f"{'🔧' if corregir else '❌'} {clave}: contador={antes} real={despues}"))
+
+        if not desviados:
+            self.stdout.write(self.style.SUCCESS('✅ Todos los contadores coinciden con el conteo real'))
+        elif corregir:
+            self.stdout.write(self.style.SUCCESS(f'✅ {len(desviados)} contadores corregidos'))
+        else:
+            raise CommandError(f'{len(desviados)} contadores no coinciden')
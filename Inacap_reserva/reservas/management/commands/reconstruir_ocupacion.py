@@ -0,0 +1,119 @@
+import random
+from datetime import date, datetime, time, timedelta
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction, IntegrityError
+from reservas.models import Espacio, Reserva, Mantenimiento, OcupacionEspacioDia, OcupacionHora
+from reservas.ocupacion import reconstruir_ocupacion, ESTADOS_MANTENIMIENTO_ACTIVOS
+from reservas.utils import validar_disponibilidad_espacio
+
+
+class _Deshacer(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Reconstruye el índice de ocupación por espacio y día (OcupacionEspacioDia)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--desde', help='Fecha inicial (YYYY-MM-DD)')
+        parser.add_argument('--hasta', help='Fecha final (YYYY-MM-DD)')
+        parser.add_argument('--espacio', type=int, help='Reconstruir solo este espacio')
+        parser.add_argument(
+            '--verificar', action='store_true',
+            help='Compara la validación con índice contra la validación por consultas'
+        )
+        parser.add_argument('--muestras', type=int, default=2000, help='Intervalos a comparar con --verificar')
+
+    def handle(self, *args, **options):
+        try:
+            desde = datetime.strptime(options['desde'], '%Y-%m-%d').date() if options['desde'] else None
+            hasta = datetime.strptime(options['hasta'], '%Y-%m-%d').date() if options['hasta'] else None
+        except ValueError:
+            raise CommandError('Formato de fecha inválido. Use YYYY-MM-DD')
+
+        resultado = reconstruir_ocupacion(desde=desde, hasta=hasta, espacio_id=options['espacio'])
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ Índice reconstruido: {resultado['creadas']} filas creadas, {resultado['actualizadas']} actualizadas"
+        ))
+
+        if options['verificar']:
+            self._verificar(desde, hasta, options['espacio'], options['muestras'])
+            self._verificar_borrado_espacio()
+
+    def _verificar(self, desde, hasta, espacio_id, muestras):
+        """Prueba de equivalencia: ambas validaciones deben dar exactamente el mismo resultado."""
+        reservas = Reserva.objects.all()
+        mantenimientos = Mantenimiento.objects.all()
+        if desde:
+            reservas = reservas.filter(fecha_reserva__gte=desde)
+            mantenimientos = mantenimientos.filter(fecha_fin__gte=desde)
+        if hasta:
+            reservas = reservas.filter(fecha_reserva__lte=hasta)
+            mantenimientos = mantenimientos.filter(fecha_inicio__lte=hasta)
+        if espacio_id:
+            reservas = reservas.filter(espacio_id=espacio_id)
+            mantenimientos = mantenimientos.filter(id_espacio_id=espacio_id)
+
+        # Casos: el intervalo exacto de reservas existentes (y desplazados) más días en mantenimiento
+        casos = []
+        for reserva in reservas.order_by('?')[:muestras]:
+            inicio = datetime.combine(reserva.fecha_reserva, reserva.hora_inicio)
+            for desplazamiento in (-45, -15, 0, 10, 30):
+                for duracion in (30, 60, 95):
+                    nuevo_inicio = inicio + timedelta(minutes=desplazamiento)
+                    nuevo_fin = nuevo_inicio + timedelta(minutes=duracion)
+                    if nuevo_inicio.date() == nuevo_fin.date() == reserva.fecha_reserva:
+                        casos.append((reserva.espacio_id, reserva.fecha_reserva, nuevo_inicio.time(), nuevo_fin.time(), random.choice([None, reserva.id])))
+        for mantenimiento in mantenimientos[:muestras]:
+            casos.append((mantenimiento.id_espacio_id, mantenimiento.fecha_inicio, time(10, 0), time(11, 0), None))
+
+        diferencias = 0
+        for espacio, fecha, hora_inicio, hora_fin, excluida in casos:
+            con_indice = validar_disponibilidad_espacio(espacio, fecha, hora_inicio, hora_fin, excluida)
+            sin_indice = validar_disponibilidad_espacio(espacio, fecha, hora_inicio, hora_fin, excluida, usar_indice=False)
+            if con_indice != sin_indice:
+                diferencias += 1
+                self.stdout.write(self.style.ERROR(
+                    f"❌ Espacio {espacio} {fecha} {hora_inicio}-{hora_fin}: índice={con_indice} consultas={sin_indice}"
+                ))
+
+        if diferencias:
+            raise CommandError(f'{diferencias} de {len(casos)} casos no coinciden')
+        self.stdout.write(self.style.SUCCESS(f"✅ {len(casos)} casos verificados: índice y consultas coinciden"))
+
+    def _verificar_borrado_espacio(self):
+        """Borrar un espacio con reservas y mantenimientos no debe dejar filas del índice huérfanas."""
+        usuario = User.objects.order_by('id').first()
+        if usuario is None:
+            raise CommandError('Se necesita al menos un usuario para verificar el borrado de espacios')
+        fecha = date.today() + timedelta(days=60)
+        try:
+            with transaction.atomic():
+                espacio = Espacio.objects.create(nombre='Verificación borrado', tipo='Sala', capacidad=10)
+                Reserva.objects.create(
+                    espacio=espacio, solicitante=usuario, fecha_reserva=fecha, hora_inicio=time(10, 0),
+                    hora_fin=time(11, 0), proposito='Verificación', num_asistentes=1, estado='Aprobada'
+                )
+                Mantenimiento.objects.create(
+                    id_espacio=espacio, tipo_mantenimiento=Mantenimiento.TIPO_MANTENIMIENTO_CHOICES[0][0],
+                    fecha_inicio=fecha, fecha_fin=fecha, estado=ESTADOS_MANTENIMIENTO_ACTIVOS[0],
+                    hora_inicio=time(12, 0), hora_fin=time(13, 0)
+                )
+                espacio_id = espacio.id
+                espacio.delete()
+                # Las FK se revisan al confirmar; aquí se fuerzan antes de deshacer
+                with connection.cursor() as cursor:
+                    cursor.execute('SET CONSTRAINTS ALL IMMEDIATE')
+                huerfanas = (
+                    OcupacionEspacioDia.objects.filter(espacio_id=espacio_id).count()
+                    + OcupacionHora.objects.filter(espacio_id=espacio_id).count()
+                )
+                if huerfanas:
+                    raise CommandError(f'Borrar un espacio dejó {huerfanas} filas del índice')
+                raise _Deshacer
+        except _Deshacer:
+            pass
+        except IntegrityError as e:
+            raise CommandError(f'Borrar un espacio con reservas falla: {e}')
+        self.stdout.write(self.style.SUCCESS('✅ Un espacio con reservas y mantenimientos se borra sin dejar filas del índice'))
@@ -0,0 +1,60 @@
+import random
+from datetime import datetime
+from django.core.management.base import BaseCommand, CommandError
+from reservas.models import Reserva, OcupacionHora
+from reservas.ocupacion_horaria import reconstruir_ocupacion_horas, minutos_por_hora
+
+
+class Command(BaseCommand):
+    help = 'Reconstruye la ocupación por espacio, día y hora (OcupacionHora) desde las reservas aprobadas'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--desde', help='Fecha inicial (YYYY-MM-DD)')
+        parser.add_argument('--hasta', help='Fecha final (YYYY-MM-DD)')
+        parser.add_argument('--espacio', type=int, help='Reconstruir solo este espacio')
+        parser.add_argument(
+            '--verificar', action='store_true',
+            help='Compara la tabla con el cálculo en Python sobre una muestra de días'
+        )
+        parser.add_argument('--muestras', type=int, default=500, help='Días (espacio, fecha) a comparar con --verificar')
+
+    def handle(self, *args, **options):
+        try:
+            desde = datetime.strptime(options['desde'], '%Y-%m-%d').date() if options['desde'] else None
+            hasta = datetime.strptime(options['hasta'], '%Y-%m-%d').date() if options['hasta'] else None
+        except ValueError:
+            raise CommandError('Formato de fecha inválido. Use YYYY-MM-DD')
+
+        filas = reconstruir_ocupacion_horas(desde=desde, hasta=hasta, espacio_id=options['espacio'])
+        self.stdout.write(self.style.SUCCESS(f"✅ Ocupación por hora reconstruida: {filas} filas"))
+
+        if options['verificar']:
+            self._verificar(desde, hasta, options['espacio'], options['muestras'])
+
+    def _verificar(self, desde, hasta, espacio_id, muestras):
+        """Cada día de la muestra debe tener exactamente las horas que da minutos_por_hora."""
+        reservas = Reserva.objects.all()
+        if desde:
+            reservas = reservas.filter(fecha_reserva__gte=desde)
+        if hasta:
+            reservas = reservas.filter(fecha_reserva__lte=hasta)
+        if espacio_id:
+            reservas = reservas.filter(espacio_id=espacio_id)
+
+        dias = list(reservas.values_list('espacio_id', 'fecha_reserva').distinct()[:muestras * 20])
+        dias = random.sample(dias, min(muestras, len(dias)))
+
+        diferencias = 0
+        for espacio, fecha in dias:
+            esperado = {
+                hora: minutos
+                for (_, _, hora), minutos in minutos_por_hora(reservas.filter(espacio_id=espacio, fecha_reserva=fecha)).items()
+            }
+            guardado = dict(OcupacionHora.objects.filter(espacio_id=espacio, fecha=fecha).values_list('hora', 'minutos'))
+            if esperado != guardado:
+                diferencias += 1
+                self.stdout.write(self.style.ERROR(f"❌ Espacio {espacio} {fecha}: tabla={guardado} reservas={esperado}"))
+
+        if diferencias:
+            raise CommandError(f'{diferencias} de {len(dias)} días no coinciden')
+        self.stdout.write(self.style.SUCCESS(f"✅ {len(dias)} días verificados: tabla y reservas coinciden"))
@@ -0,0 +1,78 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from reservas.models import PerfilUsuario
+from reservas.perfiles import SESION_ROL
+
+# Vistas protegidas por rol: decoradores + vista deben leer el perfil a lo más una vez
+VISTAS_ADMIN = [
+    'admin_dashboard',
+    'reportes',
+    'lista_elementos',
+    'get_notificaciones_admin_api',
+    'contar_notificaciones_admin_no_leidas',
+]
+VISTAS_USUARIO = [
+    'dashboard',
+    'reservas',
+    'calendario',
+    'get_reservas',
+]
+MAX_CONSULTAS_PERFIL = 1
+
+
+class _Deshacer(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        'Prueba de regresión: recorre vistas protegidas por rol con un administrador y un '
+        'usuario y falla si alguna consulta PerfilUsuario más de una vez por solicitud. No deja datos.'
+    )
+
+    def handle(self, *args, **options):
+        self.verbosity = options['verbosity']
+        errores = []
+        try:
+            with transaction.atomic():
+                for rol, vistas in (('Administrativo', VISTAS_ADMIN), ('Estudiante', VISTAS_USUARIO)):
+                    usuario = User.objects.create_user(f'verificacion_perfil_{rol.lower()}', 'verificacion@inacap.cl')
+                    PerfilUsuario.objects.create(user=usuario, rol=rol)
+                    cliente = Client(HTTP_HOST='localhost')
+                    cliente.force_login(usuario)
+                    for nombre in vistas:
+                        self._olvidar_rol(cliente)
+                        # La primera solicitud carga el rol; la segunda lo toma de la sesión
+                        for intento in ('sin rol en sesión', 'con rol en sesión'):
+                            errores += self._medir(cliente, f'{rol} {nombre} ({intento})', reverse(nombre))
+                raise _Deshacer
+        except _Deshacer:
+            pass
+
+        if errores:
+            raise CommandError('; '.join(errores))
+        self.stdout.write(self.style.SUCCESS('✅ Cada solicitud consulta el perfil a lo más una vez'))
+
+    def _olvidar_rol(self, cliente):
+        sesion = cliente.session
+        sesion.pop(SESION_ROL, None)
+        sesion.save()
+
+    def _medir(self, cliente, caso, url):
+        with CaptureQueriesContext(connection) as consultas:
+            respuesta = cliente.get(url)
+        if respuesta.status_code >= 400:
+            return [f'{caso}: respuesta {respuesta.status_code}']
+
+        perfil = [c['sql'] for c in consultas.captured_queries if 'FROM "reservas_perfilusuario"' in c['sql']]
+        self.stdout.write(f'  {caso}: {len(perfil)} consultas de perfil')
+        if self.verbosity > 1:
+            for sql in perfil:
+                self.stdout.write(f'      {sql[:160]}')
+        if len(perfil) > MAX_CONSULTAS_PERFIL:
+            return [f'{caso}: {len(perfil)} consultas de perfil, máximo {MAX_CONSULTAS_PERFIL}']
+        return []
@@ -0,0 +1,101 @@
+import json
+from datetime import date, time, timedelta
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+from reservas import views
+from reservas.models import Espacio, PerfilUsuario
+from reservas.utils import validar_reserva
+
+# Consultas esperadas por llamada. Si un cambio las aumenta, este comando falla;
+# si las reduce, actualiza el número.
+CONSULTAS_VALIDACION = 1
+CONSULTAS_RESERVA_CREADA = 15
+CONSULTAS_RESERVA_RECHAZADA = 7  # incluye las 4 de sugerir_horarios
+
+
+class _Deshacer(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        'Prueba de regresión: cuenta las consultas de crear_reserva_api (reserva creada y '
+        'rechazada por solapamiento) y falla si superan las esperadas. No deja datos.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--espacio', type=int, help='Espacio a usar (por defecto el primero disponible)')
+
+    def handle(self, *args, **options):
+        self.verbosity = options['verbosity']
+        espacios = Espacio.objects.filter(estado='Disponible').order_by('id')
+        if options['espacio']:
+            espacios = espacios.filter(id=options['espacio'])
+        espacio = espacios.first()
+        if espacio is None:
+            raise CommandError('Se necesita al menos un espacio disponible')
+
+        errores = []
+        try:
+            with transaction.atomic():
+                usuario = User.objects.create_user('verificacion_consultas', 'verificacion@inacap.cl')
+                PerfilUsuario.objects.create(user=usuario, rol='Estudiante')
+
+                fecha, hora_inicio, hora_fin = self._horario_libre(espacio, usuario)
+                datos = {
+                    'espacio_id': espacio.id,
+                    'fecha_reserva': fecha.isoformat(),
+                    'hora_inicio': hora_inicio.strftime('%H:%M'),
+                    'hora_fin': hora_fin.strftime('%H:%M'),
+                    'proposito': 'Verificación de consultas',
+                    'num_asistentes': 1,
+                }
+
+                with CaptureQueriesContext(connection) as consultas:
+                    validar_reserva(espacio.id, fecha, hora_inicio, hora_fin, 1, usuario)
+                errores += self._comparar('validar_reserva', consultas, CONSULTAS_VALIDACION)
+
+                for caso, esperado, estado_http in (
+                    ('reserva creada', CONSULTAS_RESERVA_CREADA, 200),
+                    ('reserva rechazada', CONSULTAS_RESERVA_RECHAZADA, 400),
+                ):
+                    request = RequestFactory().post(
+                        '/api/crear-reserva/', json.dumps(datos), content_type='application/json'
+                    )
+                    request.user = usuario
+                    with CaptureQueriesContext(connection) as consultas:
+                        respuesta = views.crear_reserva_api(request)
+                    if respuesta.status_code != estado_http:
+                        raise CommandError(f'{caso}: respuesta {respuesta.status_code} {respuesta.content.decode()}')
+                    errores += self._comparar(caso, consultas, esperado)
+
+                raise _Deshacer
+        except _Deshacer:
+            pass
+
+        if errores:
+            raise CommandError('; '.join(errores))
+        self.stdout.write(self.style.SUCCESS('✅ Cantidad de consultas dentro de lo esperado'))
+
+    def _horario_libre(self, espacio, usuario):
+        """Primer horario de una hora que pasa todas las reglas en los próximos días."""
+        for dias in range(1, 29):
+            fecha = date.today() + timedelta(days=dias)
+            for hora in range(7, 22):
+                _, regla, _ = validar_reserva(espacio.id, fecha, time(hora), time(hora + 1), 1, usuario)
+                if regla is None:
+                    return fecha, time(hora), time(hora + 1)
+        raise CommandError(f'No hay horarios libres para {espacio.nombre} en las próximas 4 semanas')
+
+    def _comparar(self, caso, consultas, esperado):
+        total = len(consultas.captured_queries)
+        self.stdout.write(f'  {caso}: {total} consultas (esperadas {esperado})')
+        if self.verbosity > 1:
+            for consulta in consultas.captured_queries:
+                self.stdout.write(f"      {consulta['sql'][:160]}")
+        if total > esperado:
+            return [f'{caso}: {total} consultas, se esperaban {esperado}']
+        return []
@@ -0,0 +1,86 @@
+from datetime import timedelta
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from reservas.models import PerfilUsuario
+from reservas.sesiones import SessionStore
+
+VISTAS = ['dashboard', 'reservas', 'calendario', 'get_reservas']
+REPETICIONES = 5
+
+
+class _Deshacer(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        'Prueba de regresión: con una sesión iniciada, las vistas no deben escribir en '
+        'django_session salvo cuando cambian sus datos o cuando toca extender su vencimiento. No deja datos.'
+    )
+
+    def handle(self, *args, **options):
+        if settings.SESSION_ENGINE != 'reservas.sesiones':
+            raise CommandError(f'SESSION_ENGINE es {settings.SESSION_ENGINE}, se esperaba reservas.sesiones')
+
+        errores = []
+        try:
+            with transaction.atomic():
+                usuario = User.objects.create_user('verificacion_sesion', 'verificacion_sesion@inacap.cl')
+                PerfilUsuario.objects.create(user=usuario, rol='Usuario')
+                cliente = Client(HTTP_HOST='localhost')
+                cliente.force_login(usuario)
+
+                # La primera solicitud guarda el rol en la sesión (perfiles.rol_de): una escritura
+                cliente.get(reverse(VISTAS[0]))
+                for nombre in VISTAS:
+                    for _ in range(REPETICIONES):
+                        escrituras, _respuesta = self._solicitar(cliente, nombre)
+                        if escrituras:
+                            errores.append(f'{nombre}: {escrituras} escrituras en django_session sin cambios')
+                self.stdout.write(f'  {len(VISTAS) * REPETICIONES} solicitudes sin cambios en la sesión')
+
+                errores += self._verificar_renovacion(cliente)
+                raise _Deshacer
+        except _Deshacer:
+            pass
+
+        if errores:
+            raise CommandError('; '.join(errores))
+        self.stdout.write(self.style.SUCCESS('✅ La sesión solo se escribe cuando cambia o hay que extenderla'))
+
+    def _solicitar(self, cliente, nombre):
+        with CaptureQueriesContext(connection) as consultas:
+            respuesta = cliente.get(reverse(nombre))
+        if respuesta.status_code >= 400:
+            raise CommandError(f'{nombre}: respuesta {respuesta.status_code}')
+        escrituras = [
+            c['sql'] for c in consultas.captured_queries
+            if '"django_session"' in c['sql'] and not c['sql'].lstrip().startswith('SELECT')
+        ]
+        return len(escrituras), respuesta
+
+    def _verificar_renovacion(self, cliente):
+        """Una sesión por debajo de la fracción se guarda una vez con el vencimiento completo."""
+        sesion = SessionStore(cliente.cookies[settings.SESSION_COOKIE_NAME].value)
+        edad = settings.SESSION_COOKIE_AGE
+        casi_vencida = timezone.now() + timedelta(seconds=edad * settings.SESION_FRACCION_RENOVAR * 0.9)
+        type(sesion).get_model_class().objects.filter(session_key=sesion.session_key).update(expire_date=casi_vencida)
+        sesion._cache.delete(sesion.cache_key)
+
+        errores = []
+        escrituras, respuesta = self._solicitar(cliente, VISTAS[0])
+        max_age = respuesta.cookies[settings.SESSION_COOKIE_NAME]['max-age'] if settings.SESSION_COOKIE_NAME in respuesta.cookies else None
+        self.stdout.write(f'  sesión por vencer: {escrituras} escrituras, cookie max-age {max_age}')
+        if escrituras != 1 or max_age != edad:
+            errores.append(f'renovación: {escrituras} escrituras y max-age {max_age}, se esperaba 1 y {edad}')
+
+        escrituras, _respuesta = self._solicitar(cliente, VISTAS[0])
+        if escrituras:
+            errores.append(f'después de renovar: {escrituras} escrituras')
+        return errores
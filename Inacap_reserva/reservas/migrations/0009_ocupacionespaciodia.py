@@ -0,0 +1,68 @@
+# Generated by Django 4.2.7 on 2026-10-18 13:15
+
+from django.db import migrations, models
+import django.db.models.deletion
+from datetime import timedelta
+
+
+def construir_indice_ocupacion(apps, schema_editor):
+    """Carga inicial del índice con las reservas activas y mantenimientos existentes."""
+    Reserva = apps.get_model('reservas', 'Reserva')
+    Mantenimiento = apps.get_model('reservas', 'Mantenimiento')
+    OcupacionEspacioDia = apps.get_model('reservas', 'OcupacionEspacioDia')
+
+    def segundos(hora):
+        return hora.hour * 3600 + hora.minute * 60 + hora.second
+
+    calculado = {}
+    for espacio_id, fecha, hora_inicio, hora_fin in Reserva.objects.filter(
+        estado__in=['Aprobada', 'Pendiente']
+    ).values_list('espacio_id', 'fecha_reserva', 'hora_inicio', 'hora_fin').iterator(chunk_size=5000):
+        inicio = segundos(hora_inicio) // 900
+        fin = -(-segundos(hora_fin) // 900)
+        if fin > inicio:
+            calculado.setdefault((espacio_id, fecha), [0, False])[0] |= ((1 << (fin - inicio)) - 1) << inicio
+
+    for espacio_id, fecha_inicio, fecha_fin in Mantenimiento.objects.filter(
+        estado__in=['Programado', 'En Proceso']
+    ).values_list('id_espacio_id', 'fecha_inicio', 'fecha_fin'):
+        fecha = fecha_inicio
+        while fecha <= fecha_fin:
+            calculado.setdefault((espacio_id, fecha), [0, False])[1] = True
+            fecha += timedelta(days=1)
+
+    OcupacionEspacioDia.objects.bulk_create([
+        OcupacionEspacioDia(
+            espacio_id=espacio_id,
+            fecha=fecha,
+            bloques=bits.to_bytes(12, 'big'),
+            en_mantenimiento=en_mantenimiento
+        )
+        for (espacio_id, fecha), (bits, en_mantenimiento) in calculado.items()
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reservas', '0008_alter_reserva_elementos'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OcupacionEspacioDia',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField()),
+                ('bloques', models.BinaryField(default=b'\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00')),
+                ('en_mantenimiento', models.BooleanField(default=False)),
+                ('espacio', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ocupacion_dias', to='reservas.espacio')),
+            ],
+            options={
+                'verbose_name': 'Ocupación de Espacio por Día',
+                'verbose_name_plural': 'Ocupación de Espacios por Día',
+                'unique_together': {('espacio', 'fecha')},
+            },
+        ),
+        migrations.RunPython(construir_indice_ocupacion, migrations.RunPython.noop),
+    ]
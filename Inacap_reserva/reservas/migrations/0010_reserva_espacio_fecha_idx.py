@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-18 13:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reservas', '0009_ocupacionespaciodia'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='reserva',
+            index=models.Index(fields=['espacio', 'fecha_reserva'], name='reserva_espacio_fecha_idx'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-18 13:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reservas', '0011_reserva_rango_horario'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='horariosdisponibilidad',
+            index=models.Index(fields=['id_espacio', 'dia_semana', '-fecha_inicio_vigencia'], name='horario_espacio_dia_idx'),
+        ),
+    ]
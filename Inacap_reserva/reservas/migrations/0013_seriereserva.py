@@ -0,0 +1,42 @@
+# Generated by Django 4.2.7 on 2026-10-18 13:28
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('reservas', '0012_horario_espacio_dia_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SerieReserva',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha_inicio', models.DateField()),
+                ('fecha_fin', models.DateField()),
+                ('dias_semana', models.JSONField(default=list)),
+                ('intervalo_semanas', models.PositiveIntegerField(default=1)),
+                ('excepciones', models.JSONField(blank=True, default=list)),
+                ('hora_inicio', models.TimeField()),
+                ('hora_fin', models.TimeField()),
+                ('proposito', models.TextField()),
+                ('num_asistentes', models.IntegerField()),
+                ('estado', models.CharField(choices=[('Pendiente', 'Pendiente'), ('Aprobada', 'Aprobada'), ('Cancelada', 'Cancelada')], default='Pendiente', max_length=50)),
+                ('fecha_solicitud', models.DateTimeField(auto_now_add=True)),
+                ('comentario_admin', models.TextField(blank=True, null=True)),
+                ('espacio', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='series', to='reservas.espacio')),
+                ('id_aprobador', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='series_aprobadas', to=settings.AUTH_USER_MODEL)),
+                ('solicitante', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='series_solicitadas', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='reserva',
+            name='serie',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='reservas', to='reservas.seriereserva'),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 4.2.7 on 2026-10-18 13:40
+
+import django.contrib.postgres.constraints
+import django.contrib.postgres.fields.ranges
+from django.db import migrations, models
+import django.db.models.constraints
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reservas', '0013_seriereserva'),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name='reserva',
+            name='reserva_sin_solapamiento_activo',
+        ),
+        migrations.AddConstraint(
+            model_name='reserva',
+            constraint=django.contrib.postgres.constraints.ExclusionConstraint(condition=models.Q(('estado__in', ['Pendiente', 'Aprobada'])), deferrable=django.db.models.constraints.Deferrable['IMMEDIATE'], expressions=[(models.Func(models.F('espacio'), models.F('espacio'), models.Value('[]'), function='int8range', output_field=django.contrib.postgres.fields.ranges.BigIntegerRangeField()), '&&'), ('rango_horario', '&&')], name='reserva_sin_solapamiento_activo'),
+        ),
+    ]
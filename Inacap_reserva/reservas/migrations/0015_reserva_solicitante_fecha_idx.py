@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-18 13:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reservas', '0014_reserva_solapamiento_diferible'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='reserva',
+            index=models.Index(fields=['solicitante', 'fecha_reserva'], name='reserva_solicitante_fecha_idx'),
+        ),
+    ]
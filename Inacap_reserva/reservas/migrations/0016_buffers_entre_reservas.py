@@ -0,0 +1,37 @@
+# Generated by Django 4.2.7 on 2026-10-18 13:59
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reservas', '0015_reserva_solicitante_fecha_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BufferTipoEspacio',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(choices=[('Sala de Reuniones', 'Sala de Reuniones'), ('Auditorio', 'Auditorio'), ('Laboratorio', 'Laboratorio'), ('Oficina', 'Oficina'), ('Aula', 'Aula')], max_length=100, unique=True)),
+                ('minutos_antes', models.PositiveSmallIntegerField(default=0, validators=[django.core.validators.MaxValueValidator(240)])),
+                ('minutos_despues', models.PositiveSmallIntegerField(default=0, validators=[django.core.validators.MaxValueValidator(240)])),
+            ],
+            options={
+                'verbose_name': 'Tiempo entre Reservas por Tipo',
+                'verbose_name_plural': 'Tiempos entre Reservas por Tipo',
+            },
+        ),
+        migrations.AddField(
+            model_name='espacio',
+            name='minutos_antes',
+            field=models.PositiveSmallIntegerField(blank=True, null=True, validators=[django.core.validators.MaxValueValidator(240)]),
+        ),
+        migrations.AddField(
+            model_name='espacio',
+            name='minutos_despues',
+            field=models.PositiveSmallIntegerField(blank=True, null=True, validators=[django.core.validators.MaxValueValidator(240)]),
+        ),
+    ]
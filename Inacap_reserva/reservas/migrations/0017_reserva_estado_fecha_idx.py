@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-18 14:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reservas', '0016_buffers_entre_reservas'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='reserva',
+            index=models.Index(fields=['estado', 'fecha_reserva'], name='reserva_estado_fecha_idx'),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 4.2.7 on 2026-10-18 14:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reservas', '0017_reserva_estado_fecha_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ocupacionespaciodia',
+            name='version',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='ocupacionespaciodia',
+            index=models.Index(fields=['fecha'], include=('version',), name='ocupacion_fecha_version_idx'),
+        ),
+    ]
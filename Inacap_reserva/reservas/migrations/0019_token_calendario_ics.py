@@ -0,0 +1,31 @@
+# Generated by Django 4.2.7 on 2026-10-18 14:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reservas', '0018_version_ocupacion_dia'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='ocupacionespaciodia',
+            name='ocupacion_fecha_version_idx',
+        ),
+        migrations.AddField(
+            model_name='ocupacionespaciodia',
+            name='actualizado',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='perfilusuario',
+            name='token_calendario',
+            field=models.CharField(blank=True, max_length=64, null=True, unique=True),
+        ),
+        migrations.AddIndex(
+            model_name='ocupacionespaciodia',
+            index=models.Index(fields=['fecha'], include=('version', 'actualizado'), name='ocupacion_fecha_version_idx'),
+        ),
+    ]
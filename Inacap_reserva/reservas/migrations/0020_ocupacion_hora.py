@@ -0,0 +1,49 @@
+# Generated by Django 4.2.7 on 2026-10-18 14:16
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+# Carga inicial con las reservas aprobadas existentes (mismo cálculo que ocupacion_horaria.py)
+CARGA_INICIAL = """
+    INSERT INTO reservas_ocupacionhora (espacio_id, fecha, hora, minutos)
+    SELECT r.espacio_id, r.fecha_reserva, h.hora,
+           LEAST(60, SUM(LEAST(r.fin, (h.hora + 1) * 60) - GREATEST(r.inicio, h.hora * 60)))
+    FROM (
+        SELECT espacio_id, fecha_reserva,
+               EXTRACT(epoch FROM hora_inicio)::int / 60 AS inicio,
+               EXTRACT(epoch FROM hora_fin)::int / 60 AS fin
+        FROM reservas_reserva
+        WHERE estado = 'Aprobada'
+    ) r
+    CROSS JOIN LATERAL generate_series(r.inicio / 60, (r.fin - 1) / 60) AS h(hora)
+    WHERE r.fin > r.inicio
+    GROUP BY r.espacio_id, r.fecha_reserva, h.hora
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reservas', '0019_token_calendario_ics'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OcupacionHora',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField()),
+                ('hora', models.PositiveSmallIntegerField()),
+                ('minutos', models.PositiveSmallIntegerField()),
+                ('espacio', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ocupacion_horas', to='reservas.espacio')),
+            ],
+            options={
+                'verbose_name': 'Ocupación de Espacio por Hora',
+                'verbose_name_plural': 'Ocupación de Espacios por Hora',
+                'indexes': [models.Index(fields=['fecha'], include=('espacio', 'hora', 'minutos'), name='ocupacion_hora_fecha_idx')],
+                'unique_together': {('espacio', 'fecha', 'hora')},
+            },
+        ),
+        migrations.RunSQL(CARGA_INICIAL, migrations.RunSQL.noop),
+    ]
@@ -0,0 +1,64 @@
+# Generated by Django 4.2.7 on 2026-10-18 16:02
+
+from django.db import migrations
+
+
+# Cada notificación insertada (también por bulk_create o SQL) se publica con
+# NOTIFY al confirmarse la transacción; tiempo_real.py escucha el canal y la
+# reenvía por SSE. Las fechas formateadas son las de get_fecha_creacion_formateada.
+CREAR_TRIGGERS = """
+    CREATE FUNCTION reservas_notificar_notificacion() RETURNS trigger AS $$
+    BEGIN
+        PERFORM pg_notify('reservas_notificaciones', json_build_object(
+            'canal', 'usuario:' || NEW.destinatario_id,
+            'id', NEW.id,
+            'tipo', NEW.tipo,
+            'titulo', NEW.titulo,
+            'mensaje', left(NEW.mensaje, 1000),
+            'fecha_creacion_formateada', to_char(NEW.fecha_creacion AT TIME ZONE 'UTC', 'DD/MM/YYYY HH24:MI')
+        )::text);
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql;
+
+    CREATE FUNCTION reservas_notificar_notificacion_admin() RETURNS trigger AS $$
+    BEGIN
+        PERFORM pg_notify('reservas_notificaciones', json_build_object(
+            'canal', 'admin',
+            'id', NEW.id,
+            'tipo', NEW.tipo,
+            'titulo', NEW.titulo,
+            'mensaje', left(NEW.mensaje, 1000),
+            'prioridad', NEW.prioridad,
+            'fecha_creacion_formateada', to_char(NEW.fecha_creacion AT TIME ZONE 'UTC', 'DD/MM/YYYY HH24:MI:SS')
+        )::text);
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql;
+
+    CREATE TRIGGER notificacion_notify
+        AFTER INSERT ON reservas_notificacion
+        FOR EACH ROW EXECUTE FUNCTION reservas_notificar_notificacion();
+
+    CREATE TRIGGER notificacion_admin_notify
+        AFTER INSERT ON reservas_notificacionadmin
+        FOR EACH ROW EXECUTE FUNCTION reservas_notificar_notificacion_admin();
+"""
+
+BORRAR_TRIGGERS = """
+    DROP TRIGGER IF EXISTS notificacion_notify ON reservas_notificacion;
+    DROP TRIGGER IF EXISTS notificacion_admin_notify ON reservas_notificacionadmin;
+    DROP FUNCTION IF EXISTS reservas_notificar_notificacion();
+    DROP FUNCTION IF EXISTS reservas_notificar_notificacion_admin();
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reservas', '0020_ocupacion_hora'),
+    ]
+
+    operations = [
+        migrations.RunSQL(CREAR_TRIGGERS, BORRAR_TRIGGERS),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 4.2.7 on 2026-10-18 14:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reservas', '0021_notificar_notificaciones'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='notificacion',
+            index=models.Index(fields=['destinatario', 'id'], name='notificacion_dest_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notificacion',
+            index=models.Index(fields=['destinatario', 'fecha_creacion'], name='notificacion_dest_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notificacionadmin',
+            index=models.Index(fields=['fecha_creacion'], name='notif_admin_fecha_idx'),
+        ),
+    ]
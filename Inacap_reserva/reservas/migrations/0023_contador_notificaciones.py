@@ -0,0 +1,85 @@
+# Generated by Django 4.2.7 on 2026-10-18 14:24
+
+from django.db import migrations, models
+
+
+# Triggers por sentencia con tablas de transición: un bulk_create o un
+# update(leida=True) de muchas filas suma o resta una sola vez por clave.
+# En plpgsql cada rama se prepara al ejecutarse, así que la de INSERT no
+# necesita la tabla "viejas" ni la de DELETE la tabla "nuevas".
+FUNCION_CONTADOR = """
+    CREATE FUNCTION {funcion}() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP = 'INSERT' THEN
+            INSERT INTO reservas_contadornotificaciones (clave, no_leidas)
+            SELECT {clave}, COUNT(*) FROM nuevas WHERE NOT leida GROUP BY 1
+            ON CONFLICT (clave) DO UPDATE
+            SET no_leidas = reservas_contadornotificaciones.no_leidas + EXCLUDED.no_leidas;
+        ELSIF TG_OP = 'DELETE' THEN
+            UPDATE reservas_contadornotificaciones c SET no_leidas = c.no_leidas - d.cantidad
+            FROM (SELECT {clave} AS clave, COUNT(*) AS cantidad FROM viejas WHERE NOT leida GROUP BY 1) d
+            WHERE c.clave = d.clave;
+        ELSE
+            INSERT INTO reservas_contadornotificaciones (clave, no_leidas)
+            SELECT clave, SUM(delta) FROM (
+                SELECT {clave} AS clave, 1 AS delta FROM nuevas WHERE NOT leida
+                UNION ALL
+                SELECT {clave}, -1 FROM viejas WHERE NOT leida
+            ) d
+            GROUP BY clave HAVING SUM(delta) <> 0
+            ON CONFLICT (clave) DO UPDATE
+            SET no_leidas = reservas_contadornotificaciones.no_leidas + EXCLUDED.no_leidas;
+        END IF;
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql;
+
+    CREATE TRIGGER {tabla}_contador_insert AFTER INSERT ON {tabla}
+        REFERENCING NEW TABLE AS nuevas FOR EACH STATEMENT EXECUTE FUNCTION {funcion}();
+    CREATE TRIGGER {tabla}_contador_update AFTER UPDATE ON {tabla}
+        REFERENCING OLD TABLE AS viejas NEW TABLE AS nuevas FOR EACH STATEMENT EXECUTE FUNCTION {funcion}();
+    CREATE TRIGGER {tabla}_contador_delete AFTER DELETE ON {tabla}
+        REFERENCING OLD TABLE AS viejas FOR EACH STATEMENT EXECUTE FUNCTION {funcion}();
+"""
+
+BORRAR_FUNCION = "DROP FUNCTION IF EXISTS {funcion}() CASCADE;"
+
+TABLAS = [
+    {'tabla': 'reservas_notificacion', 'funcion': 'reservas_contar_notificaciones', 'clave': "'usuario:' || destinatario_id"},
+    {'tabla': 'reservas_notificacionadmin', 'funcion': 'reservas_contar_notificaciones_admin', 'clave': "'admin'"},
+]
+
+# Mismo conteo que contadores.SQL_CONTEOS_REALES
+CARGA_INICIAL = """
+    INSERT INTO reservas_contadornotificaciones (clave, no_leidas)
+    SELECT 'usuario:' || destinatario_id, COUNT(*) FROM reservas_notificacion WHERE NOT leida GROUP BY 1
+    UNION ALL
+    SELECT 'admin', COUNT(*) FROM reservas_notificacionadmin WHERE NOT leida
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reservas', '0022_cursor_notificaciones'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ContadorNotificaciones',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('clave', models.CharField(max_length=50, unique=True)),
+                ('no_leidas', models.IntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Contador de Notificaciones',
+                'verbose_name_plural': 'Contadores de Notificaciones',
+            },
+        ),
+        *[
+            migrations.RunSQL(FUNCION_CONTADOR.format(**tabla), BORRAR_FUNCION.format(**tabla))
+            for tabla in TABLAS
+        ],
+        migrations.RunSQL(CARGA_INICIAL, migrations.RunSQL.noop),
+    ]
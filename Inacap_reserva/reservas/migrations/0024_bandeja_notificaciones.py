@@ -0,0 +1,58 @@
+# Generated by Django 4.2.7 on 2026-10-18 14:26
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+# Despierta al worker (procesar_notificaciones) al confirmarse cada transacción
+# que dejó eventos; NOTIFY repetidos con el mismo contenido se envían una vez.
+CREAR_TRIGGER = """
+    CREATE FUNCTION reservas_avisar_bandeja() RETURNS trigger AS $$
+    BEGIN
+        PERFORM pg_notify('reservas_bandeja_notificaciones', '');
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql;
+
+    CREATE TRIGGER eventonotificacion_notify
+        AFTER INSERT ON reservas_eventonotificacion
+        FOR EACH STATEMENT EXECUTE FUNCTION reservas_avisar_bandeja();
+"""
+
+BORRAR_TRIGGER = "DROP FUNCTION IF EXISTS reservas_avisar_bandeja() CASCADE;"
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('reservas', '0023_contador_notificaciones'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EventoNotificacion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('para_admin', models.BooleanField(default=False)),
+                ('tipo', models.CharField(max_length=100)),
+                ('titulo', models.CharField(max_length=255)),
+                ('mensaje', models.TextField()),
+                ('prioridad', models.CharField(blank=True, max_length=50)),
+                ('ip_address', models.GenericIPAddressField(blank=True, null=True)),
+                ('user_agent', models.TextField(blank=True, null=True)),
+                ('evitar_duplicado', models.BooleanField(default=False)),
+                ('creado', models.DateTimeField(auto_now_add=True)),
+                ('destinatario', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('espacio', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='reservas.espacio')),
+                ('reserva', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='reservas.reserva')),
+                ('usuario_relacionado', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Evento de Notificación',
+                'verbose_name_plural': 'Eventos de Notificación',
+            },
+        ),
+        migrations.RunSQL(CREAR_TRIGGER, BORRAR_TRIGGER),
+    ]
@@ -0,0 +1,85 @@
+# Generated by Django 4.2.7 on 2026-10-18 14:29
+
+from importlib import import_module
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+contador = import_module('reservas.migrations.0023_contador_notificaciones')
+TABLA_ADMIN = contador.TABLAS[1]
+
+# Las NotificacionAdmin dejan de tener un "leida" global y un contador 'admin'
+BORRAR_CONTADOR_ADMIN = contador.BORRAR_FUNCION.format(**TABLA_ADMIN) + """
+    DELETE FROM reservas_contadornotificaciones WHERE clave = 'admin';
+"""
+
+RESTAURAR_CONTADOR_ADMIN = contador.FUNCION_CONTADOR.format(**TABLA_ADMIN) + """
+    INSERT INTO reservas_contadornotificaciones (clave, no_leidas)
+    SELECT 'admin', COUNT(*) FROM reservas_notificacionadmin WHERE NOT leida;
+"""
+
+# Cada administrador parte del estado global: la marca queda justo antes de la
+# primera no leída y lo leído por encima de ella pasa a excepciones.
+COPIAR_LEIDAS = """
+    INSERT INTO reservas_lecturanotificacionesadmin (usuario_id, ultimo_leido_id, fecha_lectura)
+    SELECT p.user_id, COALESCE(
+        (SELECT MIN(id) - 1 FROM reservas_notificacionadmin WHERE NOT leida),
+        (SELECT MAX(id) FROM reservas_notificacionadmin),
+        0
+    ), NOW()
+    FROM reservas_perfilusuario p
+    WHERE p.rol IN ('Administrativo', 'Investigacion', 'Aprobador', 'SuperAdmin');
+
+    INSERT INTO reservas_notificacionadminleida (usuario_id, notificacion_id, fecha_lectura)
+    SELECT l.usuario_id, n.id, COALESCE(n.fecha_lectura, NOW())
+    FROM reservas_lecturanotificacionesadmin l
+    JOIN reservas_notificacionadmin n ON n.leida AND n.id > l.ultimo_leido_id;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('reservas', '0024_bandeja_notificaciones'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LecturaNotificacionesAdmin',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ultimo_leido_id', models.BigIntegerField(default=0)),
+                ('fecha_lectura', models.DateTimeField(auto_now=True)),
+                ('usuario', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Lectura de Notificaciones de Administrador',
+                'verbose_name_plural': 'Lecturas de Notificaciones de Administrador',
+            },
+        ),
+        migrations.CreateModel(
+            name='NotificacionAdminLeida',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha_lectura', models.DateTimeField(auto_now_add=True)),
+                ('notificacion', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lecturas', to='reservas.notificacionadmin')),
+                ('usuario', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Notificación de Administrador Leída',
+                'verbose_name_plural': 'Notificaciones de Administrador Leídas',
+                'unique_together': {('usuario', 'notificacion')},
+            },
+        ),
+        migrations.RunSQL(BORRAR_CONTADOR_ADMIN, RESTAURAR_CONTADOR_ADMIN),
+        migrations.RunSQL(COPIAR_LEIDAS, migrations.RunSQL.noop),
+        migrations.RemoveField(
+            model_name='notificacionadmin',
+            name='fecha_lectura',
+        ),
+        migrations.RemoveField(
+            model_name='notificacionadmin',
+            name='leida',
+        ),
+    ]
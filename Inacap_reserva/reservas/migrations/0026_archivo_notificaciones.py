@@ -0,0 +1,53 @@
+# Generated by Django 4.2.7 on 2026-10-18 14:40
+
+from django.db import migrations
+
+
+# Archivo de notificaciones (ver reservas/archivo_notificaciones.py), particionado
+# por mes de fecha_creacion. No tiene modelo: solo lo escribe el comando
+# archivar_notificaciones y los meses viejos se desprenden con DETACH PARTITION.
+CREAR_ARCHIVO = """
+    CREATE TABLE reservas_notificacionarchivada (
+        id bigint NOT NULL,
+        origen varchar(10) NOT NULL,
+        destinatario_id integer NULL,
+        tipo varchar(100) NOT NULL,
+        fecha_creacion timestamp with time zone NOT NULL,
+        fecha_archivo timestamp with time zone NOT NULL DEFAULT NOW(),
+        datos jsonb NOT NULL,
+        PRIMARY KEY (origen, id, fecha_creacion)
+    ) PARTITION BY RANGE (fecha_creacion);
+
+    CREATE INDEX notif_archivada_dest_fecha_idx
+        ON reservas_notificacionarchivada (destinatario_id, fecha_creacion);
+
+    CREATE FUNCTION reservas_particion_archivo(mes timestamp with time zone) RETURNS void AS $$
+    DECLARE
+        desde timestamp with time zone := date_trunc('month', mes);
+        nombre text := 'reservas_notificacionarchivada_' || to_char(desde, 'YYYY_MM');
+    BEGIN
+        -- Dos archivadores a la vez no intentan crear la misma partición
+        PERFORM pg_advisory_xact_lock(hashtext(nombre));
+        EXECUTE format(
+            'CREATE TABLE IF NOT EXISTS %I PARTITION OF reservas_notificacionarchivada FOR VALUES FROM (%L) TO (%L)',
+            nombre, desde, desde + interval '1 month'
+        );
+    END;
+    $$ LANGUAGE plpgsql;
+"""
+
+BORRAR_ARCHIVO = """
+    DROP FUNCTION IF EXISTS reservas_particion_archivo(timestamp with time zone);
+    DROP TABLE IF EXISTS reservas_notificacionarchivada;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reservas', '0025_lecturas_notificaciones_admin'),
+    ]
+
+    operations = [
+        migrations.RunSQL(CREAR_ARCHIVO, BORRAR_ARCHIVO),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 4.2.7 on 2026-10-18 14:55
+
+from django.db import migrations
+
+
+# EmailBackend busca con LOWER(email) = ... OR LOWER(username) = ...
+# (backends.buscar_usuario_login); con estos índices es un BitmapOr de dos
+# búsquedas por índice en vez de recorrer auth_user.
+CREAR_INDICES = """
+    CREATE INDEX IF NOT EXISTS auth_user_email_lower_idx ON auth_user (lower(email));
+    CREATE INDEX IF NOT EXISTS auth_user_username_lower_idx ON auth_user (lower(username));
+"""
+
+BORRAR_INDICES = """
+    DROP INDEX IF EXISTS auth_user_email_lower_idx;
+    DROP INDEX IF EXISTS auth_user_username_lower_idx;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('reservas', '0026_archivo_notificaciones'),
+    ]
+
+    operations = [
+        migrations.RunSQL(CREAR_INDICES, BORRAR_INDICES),
+    ]
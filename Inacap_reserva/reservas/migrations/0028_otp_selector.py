@@ -0,0 +1,28 @@
+# Generated by Django 4.2.7 on 2026-10-18 14:39
+
+from django.db import migrations, models
+
+
+# Los OTP anteriores guardan un PBKDF2 del token completo y no tienen selector:
+# ya no se pueden verificar, así que se dan por usados (duran 60 minutos).
+INVALIDAR_ANTERIORES = "UPDATE reservas_onetimepassword SET used = true WHERE selector IS NULL AND NOT used"
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reservas', '0027_indices_login'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='onetimepassword',
+            name='selector',
+            field=models.CharField(max_length=6, null=True, unique=True),
+        ),
+        migrations.AlterField(
+            model_name='onetimepassword',
+            name='expires_at',
+            field=models.DateTimeField(db_index=True),
+        ),
+        migrations.RunSQL(INVALIDAR_ANTERIORES, migrations.RunSQL.noop),
+    ]
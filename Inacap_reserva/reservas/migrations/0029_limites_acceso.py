@@ -0,0 +1,29 @@
+# Generated by Django 4.2.7 on 2026-10-18 15:20
+
+from django.db import migrations
+
+
+# Baldes de reservas/limites_acceso.py. Sin modelo y UNLOGGED: se escribe en
+# cada intento de login y, si se pierde tras una caída, solo se reinician los límites.
+CREAR_LIMITES = """
+    CREATE UNLOGGED TABLE reservas_limiteacceso (
+        clave varchar(200) PRIMARY KEY,
+        tokens double precision NOT NULL,
+        capacidad double precision NOT NULL,
+        recarga double precision NOT NULL,
+        actualizado timestamp with time zone NOT NULL
+    );
+"""
+
+BORRAR_LIMITES = "DROP TABLE IF EXISTS reservas_limiteacceso;"
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reservas', '0028_otp_selector'),
+    ]
+
+    operations = [
+        migrations.RunSQL(CREAR_LIMITES, BORRAR_LIMITES),
+    ]
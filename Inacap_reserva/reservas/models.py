@@ -1,8 +1,14 @@
 from django.db import models
 from django.contrib.auth.models import User
 from django.utils import timezone
-from django.contrib.auth.hashers import make_password, check_password
-from datetime import timedelta
+from django.utils.crypto import constant_time_compare, get_random_string, salted_hmac
+from django.core.validators import MaxValueValidator
+from django.contrib.postgres.constraints import ExclusionConstraint
+from django.contrib.postgres.fields import DateTimeRangeField, BigIntegerRangeField, RangeOperators
+from django.db.backends.postgresql.psycopg_any import DateTimeTZRange
+from datetime import timedelta, datetime, date, time, timezone as dt_timezone
+from functools import cached_property
+import secrets
 
 class Area(models.Model):
     nombre_area = models.CharField(max_length=100)
@@ -34,9 +40,17 @@ class PerfilUsuario(models.Model):
     estado = models.CharField(max_length=50, choices=ESTADO_CHOICES, default='activo')
     fecha_registro = models.DateTimeField(auto_now_add=True)
     ultimo_acceso = models.DateTimeField(null=True, blank=True)
+    # Token secreto de las suscripciones iCalendar (/ics/...); se genera al pedirlo
+    token_calendario = models.CharField(max_length=64, unique=True, null=True, blank=True)
     
     def __str__(self):
         return f"{self.user.username} ({self.rol})"
+    
+    def regenerar_token_calendario(self):
+        """Crea un token nuevo; las URLs de suscripción anteriores dejan de funcionar."""
+        self.token_calendario = secrets.token_urlsafe(32)
+        self.save(update_fields=['token_calendario'])
+        return self.token_calendario
 
 class Espacio(models.Model):
     ESTADO_CHOICES = (
@@ -61,9 +75,39 @@ class Espacio(models.Model):
     descripcion = models.TextField(blank=True, null=True)
     estado = models.CharField(max_length=50, choices=ESTADO_CHOICES, default='Disponible')
     
+    # Tiempo de preparación y de limpieza alrededor de cada reserva; vacío = el de su tipo
+    MAX_MINUTOS_BUFFER = 240
+    minutos_antes = models.PositiveSmallIntegerField(null=True, blank=True, validators=[MaxValueValidator(MAX_MINUTOS_BUFFER)])
+    minutos_despues = models.PositiveSmallIntegerField(null=True, blank=True, validators=[MaxValueValidator(MAX_MINUTOS_BUFFER)])
+    
     def __str__(self):
         return self.nombre
     
+    @cached_property
+    def buffers(self):
+        """(minutos_antes, minutos_despues) efectivos: los del espacio o, si faltan, los de su tipo"""
+        antes, despues = self.minutos_antes, self.minutos_despues
+        if antes is None or despues is None:
+            del_tipo = BufferTipoEspacio.objects.filter(tipo=self.tipo).values_list(
+                'minutos_antes', 'minutos_despues'
+            ).first() or (0, 0)
+            antes = del_tipo[0] if antes is None else antes
+            despues = del_tipo[1] if despues is None else despues
+        return antes, despues
+
+class BufferTipoEspacio(models.Model):
+    """Tiempo entre reservas por defecto para todos los espacios de un tipo."""
+    tipo = models.CharField(max_length=100, choices=Espacio.TIPO_CHOICES, unique=True)
+    minutos_antes = models.PositiveSmallIntegerField(default=0, validators=[MaxValueValidator(Espacio.MAX_MINUTOS_BUFFER)])
+    minutos_despues = models.PositiveSmallIntegerField(default=0, validators=[MaxValueValidator(Espacio.MAX_MINUTOS_BUFFER)])
+    
+    class Meta:
+        verbose_name = 'Tiempo entre Reservas por Tipo'
+        verbose_name_plural = 'Tiempos entre Reservas por Tipo'
+    
+    def __str__(self):
+        return f"{self.tipo}: {self.minutos_antes} min antes, {self.minutos_despues} min después"
+    
 class Equipamiento(models.Model):
     TIPO_EQUIPO_CHOICES = (
         ('Proyector', 'Proyector'),
@@ -171,6 +215,38 @@ class ElementoReserva(models.Model):
 
 
 
+class SerieReserva(models.Model):
+    """
+    Reserva recurrente: las ocurrencias se crean como Reserva con serie=self.
+    
+    dias_semana usa date.weekday() (0 = lunes) y excepciones son fechas ISO
+    que se omiten al expandir la regla.
+    """
+    ESTADO_CHOICES = (
+        ('Pendiente', 'Pendiente'),
+        ('Aprobada', 'Aprobada'),
+        ('Cancelada', 'Cancelada'),
+    )
+    
+    espacio = models.ForeignKey(Espacio, on_delete=models.CASCADE, related_name='series')
+    solicitante = models.ForeignKey(User, on_delete=models.CASCADE, related_name='series_solicitadas')
+    fecha_inicio = models.DateField()
+    fecha_fin = models.DateField()
+    dias_semana = models.JSONField(default=list)
+    intervalo_semanas = models.PositiveIntegerField(default=1)
+    excepciones = models.JSONField(default=list, blank=True)
+    hora_inicio = models.TimeField()
+    hora_fin = models.TimeField()
+    proposito = models.TextField()
+    num_asistentes = models.IntegerField()
+    estado = models.CharField(max_length=50, choices=ESTADO_CHOICES, default='Pendiente')
+    fecha_solicitud = models.DateTimeField(auto_now_add=True)
+    id_aprobador = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='series_aprobadas')
+    comentario_admin = models.TextField(blank=True, null=True)
+    
+    def __str__(self):
+        return f"Serie de {self.espacio.nombre} por {self.solicitante.username}"
+
 class Reserva(models.Model):
     ESTADO_CHOICES = (
         ('Pendiente', 'Pendiente'),
@@ -179,6 +255,9 @@ class Reserva(models.Model):
         ('Cancelada', 'Cancelada'),
     )
     
+    # Estados que ocupan el espacio (se consideran en la validación de solapamiento)
+    ESTADOS_ACTIVOS = ('Aprobada', 'Pendiente')
+    
     espacio = models.ForeignKey(Espacio, on_delete=models.CASCADE)
     solicitante = models.ForeignKey(User, on_delete=models.CASCADE, related_name='reservas_solicitadas')
     fecha_reserva = models.DateField()
@@ -205,6 +284,81 @@ class Reserva(models.Model):
     # Campos adicionales de aprobación
     fecha_aprobacion = models.DateTimeField(null=True, blank=True)
     
+    # Ocurrencia de una reserva recurrente
+    serie = models.ForeignKey(SerieReserva, on_delete=models.SET_NULL, null=True, blank=True, related_name='reservas')
+    
+    # [inicio - minutos_antes, fin + minutos_despues) derivado de fecha_reserva/hora_inicio/
+    # hora_fin y de los buffers del espacio en save(); lo usa la restricción de exclusión
+    # que impide reservas activas solapadas, así el tiempo entre reservas queda incluido
+    rango_horario = DateTimeRangeField(null=True, blank=True, editable=False)
+    
+    CAMPOS_RANGO_HORARIO = ('fecha_reserva', 'hora_inicio', 'hora_fin', 'espacio')
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['espacio', 'fecha_reserva'], name='reserva_espacio_fecha_idx'),
+            # límite diario por usuario (validar_reserva / validar_limite_reservas_usuario)
+            models.Index(fields=['solicitante', 'fecha_reserva'], name='reserva_solicitante_fecha_idx'),
+            # eventos del calendario por rango visible (calendario_eventos_api)
+            models.Index(fields=['estado', 'fecha_reserva'], name='reserva_estado_fecha_idx'),
+        ]
+        constraints = [
+            # int8range(espacio, espacio, '[]') && int8range(...) equivale a espacio = espacio
+            # y usa solo clases de operador GiST nativas (no requiere btree_gist).
+            # Es diferible para que la asignación por lotes pueda intercambiar salas
+            # dentro de una transacción (SET CONSTRAINTS ... DEFERRED)
+            ExclusionConstraint(
+                name='reserva_sin_solapamiento_activo',
+                expressions=[
+                    (models.Func(
+                        models.F('espacio'), models.F('espacio'), models.Value('[]'),
+                        function='int8range',
+                        output_field=BigIntegerRangeField()
+                    ), RangeOperators.OVERLAPS),
+                    ('rango_horario', RangeOperators.OVERLAPS),
+                ],
+                condition=models.Q(estado__in=['Pendiente', 'Aprobada']),
+                deferrable=models.Deferrable.IMMEDIATE,
+            ),
+        ]
+    
+    def calcular_rango_horario(self, buffers=None):
+        """
+        Retorna el rango [inicio, fin) de la reserva, ampliado con los buffers
+        del espacio, en la zona horaria del proyecto.
+        
+        buffers: (minutos_antes, minutos_despues) ya calculados; los procesos
+        masivos los pasan para no consultar el espacio por cada reserva.
+        """
+        fecha, hora_inicio, hora_fin = self.fecha_reserva, self.hora_inicio, self.hora_fin
+        if None in (fecha, hora_inicio, hora_fin):
+            return None
+        
+        # Algunas vistas asignan los valores tal como llegan en el JSON
+        if isinstance(fecha, str):
+            fecha = date.fromisoformat(fecha)
+        if isinstance(hora_inicio, str):
+            hora_inicio = time.fromisoformat(hora_inicio)
+        if isinstance(hora_fin, str):
+            hora_fin = time.fromisoformat(hora_fin)
+        
+        # Los buffers se restan en UTC (minutos reales, también en cambios de horario)
+        antes, despues = buffers if buffers is not None else self.espacio.buffers
+        return DateTimeTZRange(
+            timezone.make_aware(datetime.combine(fecha, hora_inicio)).astimezone(dt_timezone.utc) - timedelta(minutes=antes),
+            timezone.make_aware(datetime.combine(fecha, hora_fin)).astimezone(dt_timezone.utc) + timedelta(minutes=despues),
+            '[)'
+        )
+    
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None:
+            self.rango_horario = self.calcular_rango_horario()
+        elif set(update_fields) & set(self.CAMPOS_RANGO_HORARIO):
+            self.rango_horario = self.calcular_rango_horario()
+            kwargs['update_fields'] = set(update_fields) | {'rango_horario'}
+        super().save(*args, **kwargs)
+    
     def __str__(self):
         return f"Reserva de {self.espacio.nombre} por {self.solicitante.username}"
 
@@ -263,6 +417,11 @@ class Notificacion(models.Model):
         ordering = ['-fecha_creacion']
         verbose_name = 'Notificación'
         verbose_name_plural = 'Notificaciones'
+        indexes = [
+            # Consultas periódicas con since_id / since_ts
+            models.Index(fields=['destinatario', 'id'], name='notificacion_dest_id_idx'),
+            models.Index(fields=['destinatario', 'fecha_creacion'], name='notificacion_dest_fecha_idx'),
+        ]
     
     def get_fecha_creacion_formateada(self):
         """Retorna la fecha formateada de manera legible"""
@@ -278,6 +437,11 @@ class Notificacion(models.Model):
         ordering = ['-fecha_creacion']
         verbose_name = 'Notificación'
         verbose_name_plural = 'Notificaciones'
+        indexes = [
+            # Consultas periódicas con since_id / since_ts
+            models.Index(fields=['destinatario', 'id'], name='notificacion_dest_id_idx'),
+            models.Index(fields=['destinatario', 'fecha_creacion'], name='notificacion_dest_fecha_idx'),
+        ]
 
 class NotificacionAdmin(models.Model):
     TIPO_CHOICES = (
@@ -307,9 +471,8 @@ class NotificacionAdmin(models.Model):
     titulo = models.CharField(max_length=255)
     mensaje = models.TextField()
     prioridad = models.CharField(max_length=50, choices=PRIORIDAD_CHOICES, default='media')
-    leida = models.BooleanField(default=False)
     fecha_creacion = models.DateTimeField(auto_now_add=True)
-    fecha_lectura = models.DateTimeField(null=True, blank=True)
+    # Lo leído es por administrador: ver LecturaNotificacionesAdmin y NotificacionAdminLeida
     
     # Campos específicos para diferentes tipos de eventos
     usuario_relacionado = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='notificaciones_admin_usuario')
@@ -327,40 +490,88 @@ class NotificacionAdmin(models.Model):
         """Retorna la fecha formateada de manera legible"""
         return self.fecha_creacion.strftime('%d/%m/%Y %H:%M:%S')
     
-    def marcar_como_leida(self):
-        """Marca la notificación como leída"""
-        self.leida = True
-        self.fecha_lectura = timezone.now()
-        self.save()
+    def marcar_como_leida(self, usuario):
+        """Marca la notificación como leída para un administrador"""
+        NotificacionAdminLeida.objects.bulk_create(
+            [NotificacionAdminLeida(usuario=usuario, notificacion=self)], ignore_conflicts=True
+        )
     
     class Meta:
         ordering = ['-fecha_creacion']
         verbose_name = 'Notificación de Administrador'
         verbose_name_plural = 'Notificaciones de Administrador'
+        indexes = [
+            models.Index(fields=['fecha_creacion'], name='notif_admin_fecha_idx'),
+        ]
 
 
 class OneTimePassword(models.Model):
-    """Token/contraseña temporal de un solo uso para recuperación."""
+    """
+    Token/contraseña temporal de un solo uso para recuperación.
+    
+    El token que recibe el usuario es selector + verificador: el selector (no
+    secreto, único) ubica la fila por índice y solo se compara el HMAC del
+    verificador, así que verificar cuesta una consulta y un hash, sin importar
+    cuántos OTP se hayan pedido.
+    """
+    LARGO_SELECTOR = 6
+    LARGO_VERIFICADOR = 10
+    LARGO_TOKEN = LARGO_SELECTOR + LARGO_VERIFICADOR
+
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='one_time_passwords')
-    token_hash = models.CharField(max_length=255)
+    selector = models.CharField(max_length=LARGO_SELECTOR, unique=True, null=True)
+    token_hash = models.CharField(max_length=255)  # HMAC del verificador
     created_at = models.DateTimeField(auto_now_add=True)
-    expires_at = models.DateTimeField()
+    expires_at = models.DateTimeField(db_index=True)
     used = models.BooleanField(default=False)
 
     def is_valid(self):
         return (not self.used) and (self.expires_at >= timezone.now())
 
     def mark_used(self):
+        """Marca el OTP como usado; False si otra solicitud lo usó antes."""
         self.used = True
-        self.save()
+        return OneTimePassword.objects.filter(pk=self.pk, used=False).update(used=True) == 1
+
+    @staticmethod
+    def _hash_verificador(verificador):
+        return salted_hmac('reservas.OneTimePassword', verificador, algorithm='sha256').hexdigest()
 
     @classmethod
-    def create_for_user(cls, user, raw_token, ttl_minutes=60):
+    def create_for_user(cls, user, ttl_minutes=60):
+        """
+        Invalida los OTP pendientes del usuario (un UPDATE) y crea uno nuevo.
+        
+        Returns:
+            tuple: (otp, token para entregar al usuario)
+        """
+        cls.objects.filter(user=user, used=False).update(used=True)
+        while True:
+            selector = get_random_string(cls.LARGO_SELECTOR)
+            if not cls.objects.filter(selector=selector).exists():
+                break
+        verificador = get_random_string(cls.LARGO_VERIFICADOR)
         expires = timezone.now() + timedelta(minutes=ttl_minutes)
-        return cls.objects.create(user=user, token_hash=make_password(raw_token), expires_at=expires)
+        otp = cls.objects.create(
+            user=user, selector=selector, token_hash=cls._hash_verificador(verificador), expires_at=expires
+        )
+        return otp, selector + verificador
+
+    @classmethod
+    def verificar(cls, user, raw_token):
+        """OTP vigente del usuario que corresponde al token, o None."""
+        if len(raw_token) != cls.LARGO_TOKEN:
+            return None
+        selector, verificador = raw_token[:cls.LARGO_SELECTOR], raw_token[cls.LARGO_SELECTOR:]
+        otp = cls.objects.filter(
+            selector=selector, user=user, used=False, expires_at__gte=timezone.now()
+        ).first()
+        if otp is None or not otp.check_token(verificador):
+            return None
+        return otp
 
-    def check_token(self, raw_token):
-        return check_password(raw_token, self.token_hash)
+    def check_token(self, verificador):
+        return constant_time_compare(self._hash_verificador(verificador), self.token_hash)
 
 class Mantenimiento(models.Model):
     ESTADO_CHOICES = (
@@ -406,6 +617,12 @@ class HorariosDisponibilidad(models.Model):
     bloques_disponibles = models.IntegerField(default=1)
     fecha_registro = models.DateTimeField(auto_now_add=True)
     
+    class Meta:
+        indexes = [
+            # Horario vigente de un espacio para un día de la semana
+            models.Index(fields=['id_espacio', 'dia_semana', '-fecha_inicio_vigencia'], name='horario_espacio_dia_idx'),
+        ]
+    
     def __str__(self):
         return f"{self.id_espacio.nombre} - {self.dia_semana}"
 
@@ -437,4 +654,142 @@ class Incidencia(models.Model):
     observaciones = models.TextField(blank=True, null=True)
     
     def __str__(self):
-        return f"Incidencia {self.id} - {self.descripcion[:50]}"
\ No newline at end of file
+        return f"Incidencia {self.id} - {self.descripcion[:50]}"
+
+
+class OcupacionEspacioDia(models.Model):
+    """
+    Índice precalculado de ocupación de un espacio en un día.
+    
+    `bloques` es un bitset de 96 bloques de 15 minutos (bit 0 = 00:00-00:15)
+    con las reservas activas; se mantiene desde reservas/signals.py.
+    
+    `version` aumenta cada vez que se crea, cambia o elimina una reserva o un
+    mantenimiento del día; las respuestas del calendario y de disponibilidad
+    arman su ETag con las versiones del rango (ver ocupacion.version_rango).
+    """
+    espacio = models.ForeignKey(Espacio, on_delete=models.CASCADE, related_name='ocupacion_dias')
+    fecha = models.DateField()
+    bloques = models.BinaryField(default=bytes(12))
+    en_mantenimiento = models.BooleanField(default=False)
+    version = models.PositiveIntegerField(default=0)
+    actualizado = models.DateTimeField(null=True, blank=True)  # último aumento de version
+    
+    class Meta:
+        unique_together = ['espacio', 'fecha']
+        indexes = [
+            # resumen_rango de todos los espacios se resuelve solo con el índice
+            models.Index(fields=['fecha'], include=['version', 'actualizado'], name='ocupacion_fecha_version_idx'),
+        ]
+        verbose_name = 'Ocupación de Espacio por Día'
+        verbose_name_plural = 'Ocupación de Espacios por Día'
+    
+    def __str__(self):
+        return f"Ocupación {self.espacio_id} - {self.fecha}"
+
+class OcupacionHora(models.Model):
+    """
+    Minutos ocupados por reservas aprobadas de un espacio en cada hora de un día.
+    
+    Materializa el mapa de calor de uso (ver reservas/ocupacion_horaria.py): solo
+    hay filas para las horas con algún minuto ocupado. Se mantiene desde
+    reservas/signals.py y se reconstruye con `manage.py reconstruir_ocupacion_horas`.
+    """
+    espacio = models.ForeignKey(Espacio, on_delete=models.CASCADE, related_name='ocupacion_horas')
+    fecha = models.DateField()
+    hora = models.PositiveSmallIntegerField()  # 0-23
+    minutos = models.PositiveSmallIntegerField()  # 1-60
+    
+    class Meta:
+        unique_together = ['espacio', 'fecha', 'hora']
+        indexes = [
+            # mapa de calor de muchos espacios sin leer la tabla
+            models.Index(fields=['fecha'], include=['espacio', 'hora', 'minutos'], name='ocupacion_hora_fecha_idx'),
+        ]
+        verbose_name = 'Ocupación de Espacio por Hora'
+        verbose_name_plural = 'Ocupación de Espacios por Hora'
+    
+    def __str__(self):
+        return f"Ocupación {self.espacio_id} - {self.fecha} {self.hora:02d}:00 ({self.minutos} min)"
+
+class ContadorNotificaciones(models.Model):
+    """
+    Notificaciones no leídas por destinatario, para no contar en cada consulta.
+    
+    `clave` es 'usuario:<id>' (las NotificacionAdmin se cuentan por
+    administrador, ver LecturaNotificacionesAdmin). Lo mantienen triggers de
+    la base de datos (migración 0023), así que también cuentan bulk_create,
+    QuerySet.update() y los borrados en cascada; si el valor se desvía se
+    corrige con `manage.py reconciliar_contadores_notificaciones`.
+    """
+    clave = models.CharField(max_length=50, unique=True)
+    no_leidas = models.IntegerField(default=0)
+    
+    class Meta:
+        verbose_name = 'Contador de Notificaciones'
+        verbose_name_plural = 'Contadores de Notificaciones'
+    
+    def __str__(self):
+        return f"{self.clave}: {self.no_leidas} sin leer"
+
+class EventoNotificacion(models.Model):
+    """
+    Bandeja de salida de notificaciones (ver reservas/bandeja_notificaciones.py).
+    
+    Las vistas solo insertan aquí, dentro de su propia transacción; el worker
+    `manage.py procesar_notificaciones` crea las Notificacion / NotificacionAdmin
+    por lotes y borra los eventos procesados.
+    """
+    para_admin = models.BooleanField(default=False)
+    destinatario = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True, related_name='+')
+    tipo = models.CharField(max_length=100)
+    titulo = models.CharField(max_length=255)
+    mensaje = models.TextField()
+    prioridad = models.CharField(max_length=50, blank=True)
+    usuario_relacionado = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    reserva = models.ForeignKey('Reserva', on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    espacio = models.ForeignKey('Espacio', on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    ip_address = models.GenericIPAddressField(null=True, blank=True)
+    user_agent = models.TextField(blank=True, null=True)
+    evitar_duplicado = models.BooleanField(default=False)  # omitir si ya se notificó lo mismo hace poco
+    creado = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        verbose_name = 'Evento de Notificación'
+        verbose_name_plural = 'Eventos de Notificación'
+    
+    def __str__(self):
+        return f"{'Admin' if self.para_admin else self.destinatario_id}: {self.titulo}"
+
+class LecturaNotificacionesAdmin(models.Model):
+    """
+    Hasta dónde leyó cada administrador las NotificacionAdmin.
+    
+    Todo id <= ultimo_leido_id cuenta como leído para ese administrador;
+    "marcar todas como leídas" solo mueve esta marca.
+    """
+    usuario = models.OneToOneField(User, on_delete=models.CASCADE, related_name='+')
+    ultimo_leido_id = models.BigIntegerField(default=0)
+    fecha_lectura = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        verbose_name = 'Lectura de Notificaciones de Administrador'
+        verbose_name_plural = 'Lecturas de Notificaciones de Administrador'
+    
+    def __str__(self):
+        return f"{self.usuario_id}: leídas hasta {self.ultimo_leido_id}"
+
+class NotificacionAdminLeida(models.Model):
+    """NotificacionAdmin leída una por una, posterior a la marca del administrador."""
+    usuario = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    notificacion = models.ForeignKey(NotificacionAdmin, on_delete=models.CASCADE, related_name='lecturas')
+    fecha_lectura = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        # El índice único (usuario, notificacion) sirve también para contar por rango
+        unique_together = ['usuario', 'notificacion']
+        verbose_name = 'Notificación de Administrador Leída'
+        verbose_name_plural = 'Notificaciones de Administrador Leídas'
+    
+    def __str__(self):
+        return f"{self.usuario_id} leyó {self.notificacion_id}"
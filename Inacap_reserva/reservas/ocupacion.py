@@ -0,0 +1,260 @@
+"""
+Índice de ocupación por espacio y día.
+
+Cada fila de OcupacionEspacioDia guarda un bitset de bloques de 15 minutos
+con las reservas activas del día y un indicador de mantenimiento, de modo que
+la validación de disponibilidad se resuelve con una sola búsqueda por clave.
+
+Cada fila lleva además un contador `version` que sube con cada cambio de
+reservas o mantenimientos del día (y `actualizado` con la hora del cambio);
+resumen_rango los resume para un rango y permite responder 304 sin volver a
+leer las reservas.
+"""
+import hashlib
+from datetime import timedelta
+from django.db import connection, models, transaction
+from django.utils import timezone
+from .models import Reserva, Mantenimiento, OcupacionEspacioDia
+
+SEGUNDOS_POR_BLOQUE = 15 * 60
+BLOQUES_POR_DIA = 24 * 60 * 60 // SEGUNDOS_POR_BLOQUE  # 96
+BYTES_BLOQUES = BLOQUES_POR_DIA // 8
+
+SQL_INCREMENTAR_VERSIONES = """
+    INSERT INTO reservas_ocupacionespaciodia (espacio_id, fecha, bloques, en_mantenimiento, version, actualizado)
+    SELECT DISTINCT d.espacio_id, d.fecha, %(bloques)s, false, 1, now()
+    FROM unnest(%(espacio_ids)s::bigint[], %(fechas)s::date[]) AS d(espacio_id, fecha)
+    ON CONFLICT (espacio_id, fecha) DO UPDATE
+    SET version = reservas_ocupacionespaciodia.version + 1, actualizado = now()
+"""
+
+ESTADOS_MANTENIMIENTO_ACTIVOS = ('Programado', 'En Proceso')
+
+
+def _segundos(hora):
+    return hora.hour * 3600 + hora.minute * 60 + hora.second
+
+
+def mascara_intervalo(hora_inicio, hora_fin):
+    """
+    Retorna la máscara de bloques que cubre [hora_inicio, hora_fin).
+
+    Los extremos se redondean hacia afuera, así que la máscara nunca deja
+    fuera un minuto ocupado (puede marcar de más en horas no alineadas).
+    """
+    inicio = _segundos(hora_inicio) // SEGUNDOS_POR_BLOQUE
+    fin = -(-_segundos(hora_fin) // SEGUNDOS_POR_BLOQUE)
+    if fin <= inicio:
+        return 0
+    return ((1 << (fin - inicio)) - 1) << inicio
+
+
+def bloques_a_entero(bloques):
+    return int.from_bytes(bytes(bloques or b''), 'big')
+
+
+def entero_a_bloques(valor):
+    return valor.to_bytes(BYTES_BLOQUES, 'big')
+
+
+def obtener_ocupacion_dia(espacio_id, fecha):
+    """Retorna (bitset, en_mantenimiento) del día; un día sin fila está libre."""
+    fila = OcupacionEspacioDia.objects.filter(
+        espacio_id=espacio_id,
+        fecha=fecha
+    ).values_list('bloques', 'en_mantenimiento').first()
+
+    if fila is None:
+        return 0, False
+    return bloques_a_entero(fila[0]), fila[1]
+
+
+def _calcular_bloques(espacio_id, fecha):
+    bits = 0
+    for hora_inicio, hora_fin in Reserva.objects.filter(
+        espacio_id=espacio_id,
+        fecha_reserva=fecha,
+        estado__in=Reserva.ESTADOS_ACTIVOS
+    ).values_list('hora_inicio', 'hora_fin'):
+        bits |= mascara_intervalo(hora_inicio, hora_fin)
+    return bits
+
+
+def _calcular_mantenimiento(espacio_id, fecha):
+    return Mantenimiento.objects.filter(
+        id_espacio_id=espacio_id,
+        fecha_inicio__lte=fecha,
+        fecha_fin__gte=fecha,
+        estado__in=ESTADOS_MANTENIMIENTO_ACTIVOS
+    ).exists()
+
+
+def actualizar_ocupacion_dias(dias):
+    """
+    Recalcula el índice para un conjunto de (espacio_id, fecha).
+
+    La fila del día se bloquea antes de leer las reservas para que dos
+    transacciones concurrentes sobre el mismo día no se pisen el resultado.
+    Cada día recalculado sube su versión aunque los bloques no cambien (por
+    ejemplo, una reserva que pasa de Pendiente a Aprobada).
+    """
+    dias = sorted(
+        {(e, f) for e, f in dias if e is not None and f is not None},
+        key=lambda dia: (dia[0], str(dia[1]))
+    )
+    if not dias:
+        return
+
+    with transaction.atomic():
+        # Un solo INSERT ... ON CONFLICT DO NOTHING crea las filas que falten
+        OcupacionEspacioDia.objects.bulk_create(
+            [OcupacionEspacioDia(espacio_id=espacio_id, fecha=fecha) for espacio_id, fecha in dias],
+            ignore_conflicts=True
+        )
+        for espacio_id, fecha in dias:
+            fila = OcupacionEspacioDia.objects.select_for_update().get(espacio_id=espacio_id, fecha=fecha)
+            fila.bloques = entero_a_bloques(_calcular_bloques(espacio_id, fecha))
+            fila.en_mantenimiento = _calcular_mantenimiento(espacio_id, fecha)
+            fila.version += 1
+            fila.actualizado = timezone.now()
+            fila.save(update_fields=['bloques', 'en_mantenimiento', 'version', 'actualizado'])
+
+
+def incrementar_versiones(dias):
+    """
+    Sube en una sentencia la versión de varios (espacio_id, fecha).
+
+    Para operaciones masivas con update() que cambian reservas sin mover sus
+    bloques (aprobaciones, cambios de sala ya reconstruidos); los días sin fila
+    se crean vacíos, así que debe llamarse después de reconstruir el índice.
+    """
+    dias = sorted({(e, f) for e, f in dias if e is not None and f is not None}, key=lambda dia: (dia[0], str(dia[1])))
+    if not dias:
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(SQL_INCREMENTAR_VERSIONES, {
+            'bloques': bytes(BYTES_BLOQUES),
+            'espacio_ids': [espacio_id for espacio_id, _ in dias],
+            'fechas': [fecha for _, fecha in dias],
+        })
+
+
+def resumen_rango(desde, hasta, espacio_ids=None):
+    """
+    Resumen de las versiones de [desde, hasta] (ambos inclusive) para respuestas condicionales.
+
+    Las versiones solo suben y las filas no se borran (salvo junto con su
+    espacio), así que cantidad de filas + suma de versiones cambia con
+    cualquier modificación dentro del rango.
+
+    Returns:
+        tuple: (ETag entre comillas, fecha del último cambio o None)
+    """
+    filas = OcupacionEspacioDia.objects.filter(fecha__gte=desde, fecha__lte=hasta)
+    if espacio_ids is not None:
+        espacio_ids = sorted(espacio_ids)
+        filas = filas.filter(espacio_id__in=espacio_ids)
+    resumen = filas.aggregate(
+        filas=models.Count('fecha'),
+        suma=models.Sum('version'),
+        ultimo=models.Max('actualizado')
+    )
+    clave = f"{desde}:{hasta}:{espacio_ids if espacio_ids is not None else '*'}:{resumen['filas']}:{resumen['suma'] or 0}"
+    return '"%s"' % hashlib.md5(clave.encode()).hexdigest(), resumen['ultimo']
+
+
+def version_rango(desde, hasta, espacio_ids=None):
+    """ETag de resumen_rango."""
+    return resumen_rango(desde, hasta, espacio_ids)[0]
+
+
+def dias_de_rango(espacio_id, fecha_inicio, fecha_fin):
+    """Genera los (espacio_id, fecha) cubiertos por un rango de fechas."""
+    if espacio_id is None or fecha_inicio is None or fecha_fin is None:
+        return []
+    dias = []
+    fecha = fecha_inicio
+    while fecha <= fecha_fin:
+        dias.append((espacio_id, fecha))
+        fecha += timedelta(days=1)
+    return dias
+
+
+def reconstruir_ocupacion(desde=None, hasta=None, espacio_id=None, espacio_ids=None):
+    """
+    Reconstruye el índice completo (o el rango indicado) desde Reserva y Mantenimiento.
+    
+    espacio_ids limita la reconstrucción a varios espacios (p. ej. los tocados
+    por una operación masiva con update()).
+
+    Returns:
+        dict: filas creadas y actualizadas
+    """
+    reservas = Reserva.objects.filter(estado__in=Reserva.ESTADOS_ACTIVOS)
+    mantenimientos = Mantenimiento.objects.filter(estado__in=ESTADOS_MANTENIMIENTO_ACTIVOS)
+    existentes = OcupacionEspacioDia.objects.all()
+
+    if desde:
+        reservas = reservas.filter(fecha_reserva__gte=desde)
+        mantenimientos = mantenimientos.filter(fecha_fin__gte=desde)
+        existentes = existentes.filter(fecha__gte=desde)
+    if hasta:
+        reservas = reservas.filter(fecha_reserva__lte=hasta)
+        mantenimientos = mantenimientos.filter(fecha_inicio__lte=hasta)
+        existentes = existentes.filter(fecha__lte=hasta)
+    if espacio_id:
+        reservas = reservas.filter(espacio_id=espacio_id)
+        mantenimientos = mantenimientos.filter(id_espacio_id=espacio_id)
+        existentes = existentes.filter(espacio_id=espacio_id)
+    if espacio_ids is not None:
+        espacio_ids = list(espacio_ids)
+        reservas = reservas.filter(espacio_id__in=espacio_ids)
+        mantenimientos = mantenimientos.filter(id_espacio_id__in=espacio_ids)
+        existentes = existentes.filter(espacio_id__in=espacio_ids)
+
+    # Estado calculado: (espacio_id, fecha) -> [bits, en_mantenimiento]
+    calculado = {}
+    for e_id, fecha, hora_inicio, hora_fin in reservas.values_list(
+        'espacio_id', 'fecha_reserva', 'hora_inicio', 'hora_fin'
+    ).iterator(chunk_size=5000):
+        calculado.setdefault((e_id, fecha), [0, False])[0] |= mascara_intervalo(hora_inicio, hora_fin)
+
+    for e_id, fecha_inicio, fecha_fin in mantenimientos.values_list('id_espacio_id', 'fecha_inicio', 'fecha_fin'):
+        inicio = max(fecha_inicio, desde) if desde else fecha_inicio
+        fin = min(fecha_fin, hasta) if hasta else fecha_fin
+        for clave in dias_de_rango(e_id, inicio, fin):
+            calculado.setdefault(clave, [0, False])[1] = True
+
+    creadas = actualizadas = 0
+    ahora = timezone.now()
+    with transaction.atomic():
+        por_actualizar = []
+        for fila in existentes.select_for_update().iterator(chunk_size=5000):
+            bits, en_mantenimiento = calculado.pop((fila.espacio_id, fila.fecha), (0, False))
+            if bloques_a_entero(fila.bloques) != bits or fila.en_mantenimiento != en_mantenimiento:
+                fila.bloques = entero_a_bloques(bits)
+                fila.en_mantenimiento = en_mantenimiento
+                fila.version += 1
+                fila.actualizado = ahora
+                por_actualizar.append(fila)
+
+        OcupacionEspacioDia.objects.bulk_update(
+            por_actualizar, ['bloques', 'en_mantenimiento', 'version', 'actualizado'], batch_size=1000
+        )
+        actualizadas = len(por_actualizar)
+
+        nuevas = [
+            OcupacionEspacioDia(
+                espacio_id=e_id,
+                fecha=fecha,
+                bloques=entero_a_bloques(bits),
+                en_mantenimiento=en_mantenimiento,
+                version=1,
+                actualizado=ahora
+            )
+            for (e_id, fecha), (bits, en_mantenimiento) in calculado.items()
+        ]
+        OcupacionEspacioDia.objects.bulk_create(nuevas, batch_size=1000)
+        creadas = len(nuevas)
+
+    return {'creadas': creadas, 'actualizadas': actualizadas}
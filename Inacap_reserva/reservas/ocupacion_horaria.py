@@ -0,0 +1,192 @@
+"""
+Ocupación por espacio, día y hora (mapa de calor de uso).
+
+OcupacionHora guarda, para cada hora con uso, los minutos cubiertos por
+reservas aprobadas. Se recalcula por día igual que el índice de ocupación
+(señales y operaciones masivas) y los reportes agregan estas filas en SQL
+en lugar de recorrer las reservas en Python.
+"""
+from datetime import timedelta
+from django.db import connection, transaction
+
+ESTADO_OCUPA = 'Aprobada'
+
+# Minutos de cada reserva aprobada repartidos por hora. Las reservas activas de
+# un espacio no se solapan (restricción de exclusión), el LEAST es solo resguardo.
+SQL_MINUTOS_POR_HORA = """
+    SELECT r.espacio_id, r.fecha_reserva, h.hora,
+           LEAST(60, SUM(LEAST(r.fin, (h.hora + 1) * 60) - GREATEST(r.inicio, h.hora * 60))) AS minutos
+    FROM (
+        SELECT espacio_id, fecha_reserva,
+               EXTRACT(epoch FROM hora_inicio)::int / 60 AS inicio,
+               EXTRACT(epoch FROM hora_fin)::int / 60 AS fin
+        FROM reservas_reserva
+        WHERE estado = %(estado)s AND {filtro}
+    ) r
+    CROSS JOIN LATERAL generate_series(r.inicio / 60, (r.fin - 1) / 60) AS h(hora)
+    WHERE r.fin > r.inicio
+    GROUP BY r.espacio_id, r.fecha_reserva, h.hora
+"""
+
+SQL_INSERTAR = """
+    INSERT INTO reservas_ocupacionhora (espacio_id, fecha, hora, minutos)
+""" + SQL_MINUTOS_POR_HORA
+
+# Recalcula días sueltos en una sentencia: inserta o actualiza las horas con uso
+# y borra las que quedaron sin uso (conjuntos disjuntos, sin tocar dos veces una fila)
+SQL_ACTUALIZAR_DIAS = """
+    WITH dias AS (
+        SELECT * FROM unnest(%(espacio_ids)s::bigint[], %(fechas)s::date[]) AS d(espacio_id, fecha)
+    ),
+    nuevas AS ({minutos}),
+    borradas AS (
+        DELETE FROM reservas_ocupacionhora o
+        USING dias
+        WHERE o.espacio_id = dias.espacio_id AND o.fecha = dias.fecha
+          AND NOT EXISTS (
+              SELECT 1 FROM nuevas n
+              WHERE n.espacio_id = o.espacio_id AND n.fecha_reserva = o.fecha AND n.hora = o.hora
+          )
+    )
+    INSERT INTO reservas_ocupacionhora (espacio_id, fecha, hora, minutos)
+    SELECT * FROM nuevas
+    ON CONFLICT (espacio_id, fecha, hora) DO UPDATE SET minutos = EXCLUDED.minutos
+""".format(minutos=SQL_MINUTOS_POR_HORA.format(
+    filtro='(espacio_id, fecha_reserva) IN (SELECT espacio_id, fecha FROM dias)'
+))
+
+SQL_MAPA_CALOR = """
+    SELECT EXTRACT(isodow FROM fecha)::int AS dia, hora, SUM(minutos)
+    FROM reservas_ocupacionhora
+    WHERE fecha BETWEEN %(desde)s AND %(hasta)s AND espacio_id = ANY(%(espacio_ids)s)
+    GROUP BY dia, hora
+"""
+
+SQL_USO_ESPACIOS = """
+    SELECT espacio_id, SUM(minutos), COUNT(DISTINCT fecha)
+    FROM reservas_ocupacionhora
+    WHERE fecha BETWEEN %(desde)s AND %(hasta)s AND espacio_id = ANY(%(espacio_ids)s)
+    GROUP BY espacio_id
+"""
+
+
+def _parametros_dias(dias):
+    dias = sorted({(e, f) for e, f in dias if e is not None and f is not None}, key=lambda dia: (dia[0], str(dia[1])))
+    return {
+        'estado': ESTADO_OCUPA,
+        'espacio_ids': [espacio_id for espacio_id, _ in dias],
+        'fechas': [fecha for _, fecha in dias],
+    }
+
+
+def actualizar_ocupacion_horas(dias):
+    """Recalcula las horas de un conjunto de (espacio_id, fecha) en una sentencia."""
+    parametros = _parametros_dias(dias)
+    if not parametros['espacio_ids']:
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(SQL_ACTUALIZAR_DIAS, parametros)
+
+
+def reconstruir_ocupacion_horas(desde=None, hasta=None, espacio_id=None):
+    """
+    Reconstruye la tabla completa (o el rango indicado) desde las reservas aprobadas.
+
+    Returns:
+        int: filas creadas
+    """
+    filtros_reservas, filtros_horas, parametros = ['TRUE'], ['TRUE'], {'estado': ESTADO_OCUPA}
+    if desde:
+        filtros_reservas.append('fecha_reserva >= %(desde)s')
+        filtros_horas.append('fecha >= %(desde)s')
+        parametros['desde'] = desde
+    if hasta:
+        filtros_reservas.append('fecha_reserva <= %(hasta)s')
+        filtros_horas.append('fecha <= %(hasta)s')
+        parametros['hasta'] = hasta
+    if espacio_id:
+        filtros_reservas.append('espacio_id = %(espacio_id)s')
+        filtros_horas.append('espacio_id = %(espacio_id)s')
+        parametros['espacio_id'] = espacio_id
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM reservas_ocupacionhora WHERE {' AND '.join(filtros_horas)}", parametros)
+        cursor.execute(SQL_INSERTAR.format(filtro=' AND '.join(filtros_reservas)), parametros)
+        return cursor.rowcount
+
+
+def minutos_por_hora(reservas):
+    """
+    Mismo cálculo en Python para un conjunto de reservas (usado al verificar la tabla).
+
+    Returns:
+        dict: {(espacio_id, fecha, hora): minutos}
+    """
+    resultado = {}
+    for espacio_id, fecha, hora_inicio, hora_fin in reservas.filter(estado=ESTADO_OCUPA).values_list(
+        'espacio_id', 'fecha_reserva', 'hora_inicio', 'hora_fin'
+    ):
+        inicio = hora_inicio.hour * 60 + hora_inicio.minute
+        fin = hora_fin.hour * 60 + hora_fin.minute
+        for hora in range(inicio // 60, (fin - 1) // 60 + 1) if fin > inicio else ():
+            clave = (espacio_id, fecha, hora)
+            minutos = min(fin, (hora + 1) * 60) - max(inicio, hora * 60)
+            resultado[clave] = min(60, resultado.get(clave, 0) + minutos)
+    return resultado
+
+
+def _dias_por_dia_semana(desde, hasta):
+    """Cuántas veces aparece cada día ISO (1 = lunes) en [desde, hasta]."""
+    conteo = dict.fromkeys(range(1, 8), 0)
+    fecha = desde
+    while fecha <= hasta:
+        conteo[fecha.isoweekday()] += 1
+        fecha += timedelta(days=1)
+    return conteo
+
+
+def mapa_calor(espacio_ids, desde, hasta):
+    """
+    Uso por día de la semana y hora de un grupo de espacios.
+
+    El porcentaje es sobre los minutos posibles: cantidad de espacios × veces que
+    ese día de la semana cae en el rango × 60.
+
+    Returns:
+        list: 7 × 24 dicts {'dia': 1-7 (ISO), 'hora', 'minutos', 'porcentaje'}
+    """
+    espacio_ids = list(espacio_ids)
+    ocupados = {}
+    if espacio_ids:
+        with connection.cursor() as cursor:
+            cursor.execute(SQL_MAPA_CALOR, {'desde': desde, 'hasta': hasta, 'espacio_ids': espacio_ids})
+            ocupados = {(dia, hora): minutos for dia, hora, minutos in cursor.fetchall()}
+
+    veces = _dias_por_dia_semana(desde, hasta)
+    celdas = []
+    for dia in range(1, 8):
+        posibles = len(espacio_ids) * veces[dia] * 60
+        for hora in range(24):
+            minutos = ocupados.get((dia, hora), 0)
+            celdas.append({
+                'dia': dia,
+                'hora': hora,
+                'minutos': minutos,
+                'porcentaje': round(minutos * 100 / posibles, 1) if posibles else 0,
+            })
+    return celdas
+
+
+def uso_espacios(espacio_ids, desde, hasta):
+    """
+    Minutos ocupados y días con uso de cada espacio en el rango.
+
+    Returns:
+        dict: {espacio_id: (minutos, dias_ocupados)}; los espacios sin uso no aparecen
+    """
+    espacio_ids = list(espacio_ids)
+    if not espacio_ids:
+        return {}
+    with connection.cursor() as cursor:
+        cursor.execute(SQL_USO_ESPACIOS, {'desde': desde, 'hasta': hasta, 'espacio_ids': espacio_ids})
+        return {espacio_id: (minutos, dias) for espacio_id, minutos, dias in cursor.fetchall()}
@@ -0,0 +1,83 @@
+"""
+Perfil y rol del usuario de la solicitud, sin repetir consultas.
+
+- El perfil se lee siempre con `request.user.perfilusuario`: Django guarda el
+  resultado (o que no existe) en el mismo objeto usuario, así que decoradores
+  y vista comparten una sola consulta por solicitud.
+- El rol, que es lo único que miran los decoradores, queda además en la
+  sesión. Vale mientras coincida la versión guardada para ese usuario en la
+  caché compartida entre procesos (signals.py pone una nueva cuando se guarda
+  o borra su PerfilUsuario, p. ej. desde cambiar_rango_admin_api o
+  actualizar_usuario_api) y como máximo VIGENCIA_ROL segundos, por si la
+  versión se pierde de la caché.
+"""
+import time
+import uuid
+from django.core.cache import caches
+
+ROLES_ADMIN = ('Administrativo', 'Investigacion', 'Aprobador', 'SuperAdmin')
+
+SESION_ROL = '_rol_usuario'
+VIGENCIA_ROL = 300  # segundos
+
+# Debe verse desde todos los procesos: si no, invalidar_rol no llega a los demás workers
+CACHE_ROLES = 'compartida'
+
+
+def _clave_version(usuario_id):
+    return f'reservas:rol_version:{usuario_id}'
+
+
+def perfil_de(usuario):
+    """PerfilUsuario del usuario o None (usa y llena la caché del propio objeto usuario)."""
+    return getattr(usuario, 'perfilusuario', None)
+
+
+def _version(usuario_id, en_sesion=None):
+    """
+    Versión vigente del rol del usuario.
+
+    Si no está en la caché (se reinició o se descartó) se adopta la que trae la
+    sesión, para no obligar a releer el perfil y reescribir todas las sesiones.
+    """
+    cache = caches[CACHE_ROLES]
+    clave = _clave_version(usuario_id)
+    version = cache.get(clave)
+    if version is None:
+        cache.add(clave, en_sesion or uuid.uuid4().hex, None)
+        version = cache.get(clave)
+    return version
+
+
+def rol_de(request):
+    """
+    Rol del usuario de la solicitud (None si no tiene perfil o no inició sesión).
+
+    Con la sesión vigente no hace consultas; si no, carga el perfil una vez y
+    guarda el rol para las solicitudes siguientes.
+    """
+    if not request.user.is_authenticated:
+        return None
+
+    sesion = getattr(request, 'session', None)
+    guardado = sesion.get(SESION_ROL) if sesion is not None else None
+    vigente = guardado if guardado and guardado['hasta'] > time.time() else None
+    if sesion is None:
+        version = None
+    else:
+        # La versión se toma antes de leer el perfil: si el rol cambia entremedio, no coincidirá
+        version = _version(request.user.id, vigente and vigente['version'])
+        if vigente and vigente['version'] == version:
+            return vigente['rol']
+
+    perfil = perfil_de(request.user)
+    rol = perfil.rol if perfil else None
+    if sesion is not None:
+        sesion[SESION_ROL] = {'rol': rol, 'version': version, 'hasta': time.time() + VIGENCIA_ROL}
+    return rol
+
+
+def invalidar_rol(usuario_id):
+    """Obliga a releer el rol del usuario en su próxima solicitud, en cualquier sesión."""
+    # Una versión nueva y no un delete: sin versión en la caché se adoptaría la de la sesión
+    caches[CACHE_ROLES].set(_clave_version(usuario_id), uuid.uuid4().hex, None)
@@ -0,0 +1,228 @@
+"""
+Reservas recurrentes (SerieReserva).
+
+Una serie se expande a sus fechas, se revisa completa contra Reserva y
+Mantenimiento con consultas por rango (no una validación por ocurrencia) y
+se crea con un solo bulk_create dentro de una transacción.
+"""
+from datetime import date, timedelta
+from django.db import transaction
+from django.db.models import Count
+from django.utils import timezone
+from .models import Reserva, Mantenimiento, SerieReserva, HistorialAprobacion
+from .ocupacion import actualizar_ocupacion_dias, incrementar_versiones, ESTADOS_MANTENIMIENTO_ACTIVOS
+from .ocupacion_horaria import actualizar_ocupacion_horas
+from .utils import filtro_solapamiento, mensaje_conflicto, cargar_horarios, horario_vigente, MAX_RESERVAS_POR_DIA
+from .buffers import margenes_de_espacios
+
+MAX_OCURRENCIAS_SERIE = 200
+
+
+def rango_demasiado_largo(fecha_inicio, fecha_fin, intervalo_semanas=1, excepciones=()):
+    """
+    True si el rango tiene más semanas activas que ocurrencias permitidas.
+
+    Cada semana activa completa aporta al menos una fecha, así que el rango
+    se puede rechazar sin expandirlo (las excepciones dan holgura).
+    """
+    semanas = (MAX_OCURRENCIAS_SERIE + len(excepciones) + 1) * intervalo_semanas
+    return (fecha_fin - fecha_inicio).days > semanas * 7 + 6
+
+
+def expandir_fechas(fecha_inicio, fecha_fin, dias_semana, intervalo_semanas=1, excepciones=(), limite=None):
+    """
+    Fechas de la regla de recurrencia entre fecha_inicio y fecha_fin (inclusive).
+
+    Las semanas se cuentan desde el lunes de la semana de fecha_inicio, así
+    intervalo_semanas=2 toma una semana sí y una no. Se recorre semana activa
+    por semana activa y, con `limite`, se detiene al pasar de esa cantidad.
+    """
+    dias_semana = sorted(set(dias_semana))
+    excepciones = {date.fromisoformat(f) if isinstance(f, str) else f for f in excepciones}
+    lunes = fecha_inicio - timedelta(days=fecha_inicio.weekday())
+    paso = timedelta(weeks=intervalo_semanas)
+
+    fechas = []
+    while lunes <= fecha_fin:
+        for dia in dias_semana:
+            if dia > (fecha_fin - lunes).days:
+                break
+            fecha = lunes + timedelta(days=dia)
+            if fecha >= fecha_inicio and fecha not in excepciones:
+                fechas.append(fecha)
+                if limite is not None and len(fechas) > limite:
+                    return fechas
+        if fecha_fin - lunes < paso:
+            break
+        lunes += paso
+    return fechas
+
+
+def revisar_ocurrencias(espacio_id, fechas, hora_inicio, hora_fin, solicitante=None):
+    """
+    Revisa todas las ocurrencias de una serie de una vez.
+
+    Como todas comparten la ventana horaria, el cruce con las reservas se
+    reduce a fecha_reserva IN (...) más la condición de solapamiento de
+    validar_disponibilidad_espacio (ampliada con el tiempo entre reservas del
+    espacio), en una sola consulta.
+
+    Returns:
+        dict: {fecha: mensaje_conflicto o None}
+    """
+    if not fechas:
+        return {}
+
+    conflictos = {}
+    margen = margenes_de_espacios([espacio_id]).get(espacio_id, 0)
+
+    for fecha, r_inicio, r_fin in Reserva.objects.filter(
+        filtro_solapamiento(hora_inicio, hora_fin, margen),
+        espacio_id=espacio_id,
+        fecha_reserva__in=fechas,
+        estado__in=Reserva.ESTADOS_ACTIVOS
+    ).order_by('fecha_reserva', 'hora_inicio').values_list('fecha_reserva', 'hora_inicio', 'hora_fin'):
+        conflictos.setdefault(fecha, mensaje_conflicto(r_inicio, r_fin, hora_inicio, hora_fin, margen))
+
+    fechas_set = set(fechas)
+    for m_inicio, m_fin in Mantenimiento.objects.filter(
+        id_espacio_id=espacio_id,
+        fecha_inicio__lte=max(fechas),
+        fecha_fin__gte=min(fechas),
+        estado__in=ESTADOS_MANTENIMIENTO_ACTIVOS
+    ).values_list('fecha_inicio', 'fecha_fin'):
+        for fecha in fechas_set:
+            if m_inicio <= fecha <= m_fin and fecha not in conflictos:
+                conflictos[fecha] = "El espacio está en mantenimiento en la fecha seleccionada"
+
+    horarios = cargar_horarios([espacio_id], max(fechas))
+    for fecha in fechas:
+        vigente = horario_vigente(horarios, espacio_id, fecha)
+        if vigente and fecha not in conflictos:
+            apertura, cierre = vigente
+            if hora_inicio < apertura:
+                conflictos[fecha] = f"El espacio abre a las {apertura.strftime('%H:%M')}"
+            elif hora_fin > cierre:
+                conflictos[fecha] = f"El espacio cierra a las {cierre.strftime('%H:%M')}"
+
+    if solicitante is not None:
+        for fila in Reserva.objects.filter(
+            solicitante=solicitante,
+            fecha_reserva__in=fechas,
+            estado__in=Reserva.ESTADOS_ACTIVOS
+        ).values('fecha_reserva').annotate(total=Count('id')):
+            if fila['total'] >= MAX_RESERVAS_POR_DIA and fila['fecha_reserva'] not in conflictos:
+                conflictos[fila['fecha_reserva']] = f"Límite de {MAX_RESERVAS_POR_DIA} reservas por día alcanzado"
+
+    return {fecha: conflictos.get(fecha) for fecha in fechas}
+
+
+def crear_serie(solicitante, espacio, fechas, hora_inicio, hora_fin, proposito, num_asistentes,
+                regla, omitir_conflictos=False, solo_verificar=False):
+    """
+    Crea la serie y todas sus ocurrencias de forma atómica.
+
+    Args:
+        regla: dict con fecha_inicio, fecha_fin, dias_semana, intervalo_semanas y excepciones
+        omitir_conflictos: crear solo las ocurrencias libres en vez de rechazar la serie
+        solo_verificar: devolver el reporte sin crear nada
+
+    Returns:
+        tuple: (serie o None, reporte por ocurrencia)
+    """
+    with transaction.atomic():
+        revision = revisar_ocurrencias(espacio.id, fechas, hora_inicio, hora_fin, solicitante)
+        reporte = [
+            {'fecha': fecha.isoformat(), 'disponible': motivo is None, 'motivo': motivo}
+            for fecha, motivo in revision.items()
+        ]
+        libres = [fecha for fecha, motivo in revision.items() if motivo is None]
+        hay_conflictos = len(libres) < len(fechas)
+
+        if solo_verificar or not libres or (hay_conflictos and not omitir_conflictos):
+            return None, reporte
+
+        serie = SerieReserva.objects.create(
+            espacio=espacio,
+            solicitante=solicitante,
+            hora_inicio=hora_inicio,
+            hora_fin=hora_fin,
+            proposito=proposito,
+            num_asistentes=num_asistentes,
+            **regla
+        )
+
+        ocurrencias = []
+        for fecha in libres:
+            reserva = Reserva(
+                espacio=espacio,
+                solicitante=solicitante,
+                fecha_reserva=fecha,
+                hora_inicio=hora_inicio,
+                hora_fin=hora_fin,
+                proposito=proposito,
+                num_asistentes=num_asistentes,
+                estado='Pendiente',
+                serie=serie
+            )
+            # bulk_create no llama a save() ni a las señales
+            reserva.rango_horario = reserva.calcular_rango_horario()
+            ocurrencias.append(reserva)
+
+        Reserva.objects.bulk_create(ocurrencias, batch_size=500)
+        actualizar_ocupacion_dias((espacio.id, fecha) for fecha in libres)
+
+    return serie, reporte
+
+
+def cambiar_estado_serie(serie, estado, usuario_admin, comentario=None):
+    """
+    Aprueba o cancela todas las ocurrencias vigentes de una serie en una operación.
+
+    Returns:
+        int: cantidad de reservas modificadas
+    """
+    if estado == 'Aprobada':
+        estados_origen = ['Pendiente']
+        cambios = {
+            'estado': 'Aprobada',
+            'id_aprobador': usuario_admin,
+            'comentario_admin': comentario,
+            'fecha_aprobacion': timezone.now(),
+        }
+    elif estado == 'Cancelada':
+        estados_origen = list(Reserva.ESTADOS_ACTIVOS)
+        cambios = {'estado': 'Cancelada', 'comentario_admin': comentario}
+    else:
+        raise ValueError(f'Estado de serie no soportado: {estado}')
+
+    with transaction.atomic():
+        reservas = serie.reservas.select_for_update().filter(estado__in=estados_origen)
+        afectadas = list(reservas.values_list('id', 'espacio_id', 'fecha_reserva'))
+        Reserva.objects.filter(id__in=[r[0] for r in afectadas]).update(**cambios)
+
+        HistorialAprobacion.objects.bulk_create([
+            HistorialAprobacion(
+                reserva_id=reserva_id,
+                usuario_admin=usuario_admin,
+                tipo_accion=estado,
+                motivo=comentario
+            )
+            for reserva_id, _, _ in afectadas
+        ], batch_size=500)
+
+        # update() no dispara las señales del índice de ocupación; al aprobar los
+        # bloques no cambian, solo la versión del día
+        dias = [(espacio_id, fecha) for _, espacio_id, fecha in afectadas]
+        if estado == 'Cancelada':
+            actualizar_ocupacion_dias(dias)
+        else:
+            incrementar_versiones(dias)
+        actualizar_ocupacion_horas(dias)
+
+        serie.estado = estado
+        serie.id_aprobador = usuario_admin
+        serie.comentario_admin = comentario
+        serie.save(update_fields=['estado', 'id_aprobador', 'comentario_admin'])
+
+    return len(afectadas)
@@ -1,31 +1,37 @@
 from django.utils import timezone
 from .models import Notificacion, Reserva, NotificacionAdmin
 from django.contrib.auth.models import User
+from .contadores import no_leidas_usuario
+from .bandeja_notificaciones import encolar_notificacion, encolar_notificacion_admin
 
 
 class NotificacionService:
     
     @staticmethod
-    def crear_notificacion(destinatario, tipo, titulo, mensaje, reserva=None):
+    def crear_notificacion(destinatario, tipo, titulo, mensaje, reserva=None, evitar_duplicado=False):
         """
-        Crea una notificación genérica
+        Crea una notificación genérica (queda en la bandeja de salida; ver bandeja_notificaciones.py)
+        
+        Devuelve el id del EventoNotificacion encolado, no el de una Notificacion:
+        esa la crea el worker después y puede descartarla si es un duplicado.
         """
         try:
-            notificacion = Notificacion.objects.create(
+            evento = encolar_notificacion(
                 destinatario=destinatario,
                 tipo=tipo,
                 titulo=titulo,
                 mensaje=mensaje,
-                reserva=reserva
+                reserva=reserva,
+                evitar_duplicado=evitar_duplicado
             )
-            print(f"📧 Notificación creada: {titulo} para {destinatario.username}")
-            return notificacion
+            print(f"📧 Notificación encolada (evento {evento.id}): {titulo} para {destinatario.username}")
+            return evento.id
         except Exception as e:
             print(f"❌ Error creando notificación: {e}")
             return None
     
     @staticmethod
-    def crear_notificacion_reserva(reserva, tipo, titulo, mensaje):
+    def crear_notificacion_reserva(reserva, tipo, titulo, mensaje, evitar_duplicado=False):
         """
         Crea una notificación relacionada con una reserva
         """
@@ -35,7 +41,8 @@ class NotificacionService:
                 tipo=tipo,
                 titulo=titulo,
                 mensaje=mensaje,
-                reserva=reserva
+                reserva=reserva,
+                evitar_duplicado=evitar_duplicado
             )
         except Exception as e:
             print(f"❌ Error en crear_notificacion_reserva: {e}")
@@ -49,19 +56,19 @@ class NotificacionService:
         try:
             mensaje = f"Tu solicitud de reserva para {reserva.espacio.nombre} el {reserva.fecha_reserva.strftime('%d/%m/%Y')} de {reserva.hora_inicio.strftime('%H:%M')} a {reserva.hora_fin.strftime('%H:%M')} ha sido recibida y está pendiente de aprobación."
             
-            notificacion = NotificacionService.crear_notificacion_reserva(
+            evento_id = NotificacionService.crear_notificacion_reserva(
                 reserva=reserva,
                 tipo='reserva_creada',
                 titulo='📋 Reserva Creada Exitosamente',
                 mensaje=mensaje
             )
             
-            if notificacion:
-                print(f"✅ Notificación de creación enviada para reserva {reserva.id}")
+            if evento_id:
+                print(f"✅ Notificación de creación encolada para reserva {reserva.id}")
             else:
                 print(f"❌ Falló notificación de creación para reserva {reserva.id}")
                 
-            return notificacion
+            return evento_id
         except Exception as e:
             print(f"❌ Error en notificar_creacion_reserva: {e}")
             return None
@@ -76,31 +83,21 @@ class NotificacionService:
             if comentario_admin:
                 mensaje += f"\n\nComentario del administrador: {comentario_admin}"
             
-            # Verificar si ya existe una notificación similar
-            notificacion_existente = Notificacion.objects.filter(
-                destinatario=reserva.solicitante,
-                tipo='reserva_aprobada',
-                reserva=reserva,
-                fecha_creacion__gte=timezone.now() - timezone.timedelta(minutes=5)
-            ).exists()
-            
-            if notificacion_existente:
-                print(f"⚠️ Notificación de aprobación duplicada evitada para reserva {reserva.id}")
-                return None
-            
-            notificacion = NotificacionService.crear_notificacion_reserva(
+            # Si ya se avisó esta aprobación hace poco, el worker descarta el duplicado
+            evento_id = NotificacionService.crear_notificacion_reserva(
                 reserva=reserva,
                 tipo='reserva_aprobada',
                 titulo='✅ Reserva Aprobada',
-                mensaje=mensaje
+                mensaje=mensaje,
+                evitar_duplicado=True
             )
             
-            if notificacion:
-                print(f"✅ Notificación de aprobación enviada para reserva {reserva.id}")
+            if evento_id:
+                print(f"✅ Notificación de aprobación encolada para reserva {reserva.id}")
             else:
                 print(f"❌ Falló notificación de aprobación para reserva {reserva.id}")
                 
-            return notificacion
+            return evento_id
         except Exception as e:
             print(f"❌ Error en notificar_aprobacion_reserva: {e}")
             return None
@@ -113,19 +110,19 @@ class NotificacionService:
         try:
             mensaje = f"❌ Tu reserva para {reserva.espacio.nombre} el {reserva.fecha_reserva.strftime('%d/%m/%Y')} ha sido RECHAZADA.\n\nMotivo: {motivo}"
             
-            notificacion = NotificacionService.crear_notificacion_reserva(
+            evento_id = NotificacionService.crear_notificacion_reserva(
                 reserva=reserva,
                 tipo='reserva_rechazada',
                 titulo='❌ Reserva Rechazada',
                 mensaje=mensaje
             )
             
-            if notificacion:
-                print(f"✅ Notificación de rechazo enviada para reserva {reserva.id}")
+            if evento_id:
+                print(f"✅ Notificación de rechazo encolada para reserva {reserva.id}")
             else:
                 print(f"❌ Falló notificación de rechazo para reserva {reserva.id}")
                 
-            return notificacion
+            return evento_id
         except Exception as e:
             print(f"❌ Error en notificar_rechazo_reserva: {e}")
             return None
@@ -150,15 +147,26 @@ class NotificacionService:
             return None
 
     @staticmethod
-    def obtener_notificaciones_usuario(usuario, no_leidas=False, limite=10):
-        """Obtiene las notificaciones de un usuario"""
+    def obtener_notificaciones_usuario(usuario, no_leidas=False, limite=10, cursor=None):
+        """
+        Obtiene las notificaciones de un usuario
+        
+        Sin cursor devuelve las más recientes. Con cursor devuelve las posteriores a él
+        de la más antigua a la más nueva, para que el cliente pueda seguir paginando
+        desde la última recibida sin saltarse ninguna.
+        """
         try:
             notificaciones = Notificacion.objects.filter(destinatario=usuario)
             
             if no_leidas:
                 notificaciones = notificaciones.filter(leida=False)
             
-            return notificaciones.select_related('reserva', 'reserva__espacio').order_by('-fecha_creacion')[:limite]
+            if cursor:
+                notificaciones = notificaciones.filter(**cursor).order_by('id')
+            else:
+                notificaciones = notificaciones.order_by('-fecha_creacion')
+            
+            return notificaciones.select_related('reserva', 'reserva__espacio')[:limite]
         except Exception as e:
             print(f"❌ Error en obtener_notificaciones_usuario: {e}")
             return []
@@ -180,13 +188,10 @@ class NotificacionService:
         """
         Marca todas las notificaciones de un usuario como leídas
         """
-        notificaciones = Notificacion.objects.filter(
+        count = Notificacion.objects.filter(
             destinatario=usuario, 
             leida=False
-        )
-        
-        count = notificaciones.count()
-        notificaciones.update(leida=True, fecha_lectura=timezone.now())
+        ).update(leida=True, fecha_lectura=timezone.now())
         
         print(f"📭 Marcadas {count} notificaciones como leídas para {usuario.username}")
         return count
@@ -194,12 +199,9 @@ class NotificacionService:
     @staticmethod
     def contar_notificaciones_no_leidas(usuario):
         """
-        Cuenta las notificaciones no leídas de un usuario
+        Cuenta las notificaciones no leídas de un usuario (contador mantenido por la base de datos)
         """
-        return Notificacion.objects.filter(
-            destinatario=usuario,
-            leida=False
-        ).count()
+        return no_leidas_usuario(usuario)
 
 class NotificacionAdminService:
     
@@ -207,27 +209,26 @@ class NotificacionAdminService:
     def crear_notificacion_admin(tipo, titulo, mensaje, prioridad='media', usuario_relacionado=None, 
                                reserva=None, espacio=None, request=None):
         """
-        Crea una notificación para administradores
+        Crea una notificación para administradores (queda en la bandeja de salida)
+        
+        Devuelve el id del EventoNotificacion encolado o None si no se pudo encolar.
         """
         try:
-            notificacion = NotificacionAdmin.objects.create(
+            # Información de la solicitud si está disponible, en el mismo INSERT
+            evento = encolar_notificacion_admin(
                 tipo=tipo,
                 titulo=titulo,
                 mensaje=mensaje,
                 prioridad=prioridad,
                 usuario_relacionado=usuario_relacionado,
                 reserva=reserva,
-                espacio=espacio
+                espacio=espacio,
+                ip_address=get_client_ip(request) if request else None,
+                user_agent=request.META.get('HTTP_USER_AGENT', '') if request else None
             )
             
-            # Agregar información de la solicitud si está disponible
-            if request:
-                notificacion.ip_address = get_client_ip(request)
-                notificacion.user_agent = request.META.get('HTTP_USER_AGENT', '')
-                notificacion.save()
-            
-            print(f"📢 Notificación Admin creada: {titulo}")
-            return notificacion
+            print(f"📢 Notificación Admin encolada (evento {evento.id}): {titulo}")
+            return evento.id
             
         except Exception as e:
             print(f"❌ Error creando notificación admin: {e}")
@@ -0,0 +1,105 @@
+"""
+Motor de sesiones (SESSION_ENGINE) que escribe en la BD solo cuando hace falta.
+
+Con SESSION_SAVE_EVERY_REQUEST cada solicitud hacía un UPDATE en
+django_session. Este motor, basado en cached_db, lee la sesión desde la caché
+y solo la guarda cuando:
+
+- cambian sus datos (asignar el mismo valor que ya tenía no cuenta), o
+- le queda menos de SESION_FRACCION_RENOVAR de su duración: se guarda una vez
+  para extender el vencimiento y el middleware reenvía la cookie.
+
+La caché guarda los datos junto al vencimiento, así que decidir si renovar no
+cuesta consultas. Debe ser compartida entre procesos (SESSION_CACHE_ALIAS, lo
+revisa checks.py): un logout o un cambio hecho en un worker tiene que verse de
+inmediato en los demás, como con el motor de BD.
+"""
+import time
+from datetime import datetime
+from django.conf import settings
+from django.contrib.sessions.backends.cached_db import SessionStore as CachedDBStore
+from django.contrib.sessions.backends.db import SessionStore as DBStore
+from django.db import connection, transaction
+
+# Borra por lotes para no tomar un bloqueo largo sobre django_session
+SQL_PURGAR_LOTE = """
+    DELETE FROM django_session
+    WHERE session_key IN (
+        SELECT session_key FROM django_session
+        WHERE expire_date < NOW()
+        ORDER BY expire_date
+        LIMIT %s
+        FOR UPDATE SKIP LOCKED
+    )
+"""
+TAMANO_LOTE = 5000
+
+_SIN_VALOR = object()
+
+
+class SessionStore(CachedDBStore):
+    cache_key_prefix = 'reservas.sesiones'
+
+    def __setitem__(self, key, value):
+        actual = self._session.get(key, _SIN_VALOR)
+        # El mismo objeto pudo modificarse en su lugar: solo se omite si es otro objeto igual
+        if actual is not value and actual == value:
+            return
+        super().__setitem__(key, value)
+
+    def load(self):
+        try:
+            guardado = self._cache.get(self.cache_key)
+        except Exception:
+            guardado = None
+
+        if guardado is None:
+            s = self._get_session_from_db()
+            if not s:
+                return {}
+            guardado = (self.decode(s.session_data), s.expire_date.timestamp())
+            self._guardar_en_cache(*guardado)
+
+        datos, vence = guardado
+        if self._debe_renovarse(datos, vence):
+            self.modified = True
+        return datos
+
+    def save(self, must_create=False):
+        DBStore.save(self, must_create)
+        self._guardar_en_cache(self._session, self.get_expiry_date().timestamp())
+
+    def _guardar_en_cache(self, datos, vence):
+        segundos = vence - time.time()
+        if segundos > 0:
+            self._cache.set(self.cache_key, (datos, vence), segundos)
+
+    def _debe_renovarse(self, datos, vence):
+        expiry = datos.get('_session_expiry')
+        if isinstance(expiry, (datetime, str)):
+            return False  # Vencimiento fijo (set_expiry con fecha): no se extiende
+        duracion = self.get_expiry_age(expiry=expiry)
+        return vence - time.time() < duracion * getattr(settings, 'SESION_FRACCION_RENOVAR', 0.5)
+
+    @classmethod
+    def clear_expired(cls):
+        purgar_vencidas()
+
+
+def purgar_vencidas(tamano_lote=TAMANO_LOTE, al_terminar_lote=None):
+    """
+    Elimina las sesiones vencidas en transacciones de `tamano_lote` filas.
+
+    Returns:
+        int: sesiones eliminadas
+    """
+    total = 0
+    while True:
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(SQL_PURGAR_LOTE, [tamano_lote])
+            borradas = cursor.rowcount
+        total += borradas
+        if borradas and al_terminar_lote:
+            al_terminar_lote(borradas)
+        if borradas < tamano_lote:
+            return total
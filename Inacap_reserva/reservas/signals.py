@@ -0,0 +1,154 @@
+import threading
+from django.contrib.auth.models import User
+from django.core.signals import request_finished
+from django.db.models.signals import post_init, post_save, post_delete, pre_delete
+from django.db import transaction
+from django.db.models import Q
+from django.dispatch import receiver
+from .models import Reserva, Mantenimiento, Espacio, BufferTipoEspacio, PerfilUsuario
+from .ocupacion import actualizar_ocupacion_dias, dias_de_rango
+from .ocupacion_horaria import actualizar_ocupacion_horas, ESTADO_OCUPA
+from .buffers import recalcular_rangos_espacios
+from .perfiles import invalidar_rol
+from .backends import olvidar_usuario
+
+
+# === ÍNDICE DE OCUPACIÓN Y OCUPACIÓN POR HORA ===
+# Se recuerda el día original de cada instancia para recalcular también el día
+# anterior cuando una reserva cambia de espacio o de fecha.
+#
+# Al borrar un Espacio, Django borra primero en cascada sus filas del índice y
+# luego sus reservas y mantenimientos; recalcular esos días volvería a insertar
+# filas de un espacio que ya no existe. Mientras dura el borrado el espacio
+# queda marcado y las señales de sus reservas/mantenimientos no hacen nada.
+
+_borrando = threading.local()
+
+
+def _espacios_en_borrado():
+    if not hasattr(_borrando, 'ids'):
+        _borrando.ids = set()
+    return _borrando.ids
+
+@receiver(pre_delete, sender=Espacio)
+def marcar_espacio_en_borrado(sender, instance, **kwargs):
+    _espacios_en_borrado().add(instance.pk)
+
+@receiver(post_delete, sender=Espacio)
+def desmarcar_espacio_borrado(sender, instance, **kwargs):
+    _espacios_en_borrado().discard(instance.pk)
+
+@receiver(request_finished)
+def olvidar_espacios_en_borrado(sender, **kwargs):
+    # Un borrado que falló no llega a post_delete: la marca no pasa a la siguiente solicitud
+    _espacios_en_borrado().clear()
+
+@receiver(post_init, sender=Reserva)
+def recordar_dia_reserva(sender, instance, **kwargs):
+    # Usar __dict__ evita disparar consultas en campos diferidos (.only()/.defer())
+    instance._dia_ocupacion_original = (
+        instance.__dict__.get('espacio_id'),
+        instance.__dict__.get('fecha_reserva'),
+    )
+    instance._estado_original = instance.__dict__.get('estado')
+
+@receiver(post_save, sender=Reserva)
+def actualizar_ocupacion_reserva(sender, instance, **kwargs):
+    dias = {(instance.espacio_id, instance.fecha_reserva)}
+    dias.add(getattr(instance, '_dia_ocupacion_original', (None, None)))
+    actualizar_ocupacion_dias(dias)
+    # La ocupación por hora solo cuenta reservas aprobadas
+    if ESTADO_OCUPA in (instance.estado, getattr(instance, '_estado_original', None)):
+        actualizar_ocupacion_horas(dias)
+    instance._dia_ocupacion_original = (instance.espacio_id, instance.fecha_reserva)
+    instance._estado_original = instance.estado
+
+@receiver(post_delete, sender=Reserva)
+def liberar_ocupacion_reserva(sender, instance, **kwargs):
+    if instance.espacio_id in _espacios_en_borrado():
+        return
+    actualizar_ocupacion_dias([(instance.espacio_id, instance.fecha_reserva)])
+    if instance.estado == ESTADO_OCUPA:
+        actualizar_ocupacion_horas([(instance.espacio_id, instance.fecha_reserva)])
+
+@receiver(post_init, sender=Mantenimiento)
+def recordar_rango_mantenimiento(sender, instance, **kwargs):
+    instance._rango_ocupacion_original = (
+        instance.__dict__.get('id_espacio_id'),
+        instance.__dict__.get('fecha_inicio'),
+        instance.__dict__.get('fecha_fin'),
+    )
+
+@receiver(post_save, sender=Mantenimiento)
+def actualizar_ocupacion_mantenimiento(sender, instance, **kwargs):
+    dias = set(dias_de_rango(instance.id_espacio_id, instance.fecha_inicio, instance.fecha_fin))
+    dias.update(dias_de_rango(*getattr(instance, '_rango_ocupacion_original', (None, None, None))))
+    actualizar_ocupacion_dias(dias)
+    instance._rango_ocupacion_original = (instance.id_espacio_id, instance.fecha_inicio, instance.fecha_fin)
+
+@receiver(post_delete, sender=Mantenimiento)
+def liberar_ocupacion_mantenimiento(sender, instance, **kwargs):
+    if instance.id_espacio_id in _espacios_en_borrado():
+        return
+    actualizar_ocupacion_dias(dias_de_rango(instance.id_espacio_id, instance.fecha_inicio, instance.fecha_fin))
+
+
+# === TIEMPO ENTRE RESERVAS ===
+# rango_horario incluye los buffers del espacio; si cambian (en el espacio o en
+# su tipo) se recalculan las reservas desde hoy. Quien cambia los buffers debe
+# revisar antes con buffers.verificar_buffers_* que no queden reservas juntas.
+
+@receiver(post_init, sender=Espacio)
+def recordar_buffers_espacio(sender, instance, **kwargs):
+    instance._buffers_originales = (
+        instance.__dict__.get('tipo'),
+        instance.__dict__.get('minutos_antes'),
+        instance.__dict__.get('minutos_despues'),
+    )
+
+@receiver(post_save, sender=Espacio)
+def recalcular_rangos_espacio(sender, instance, created, **kwargs):
+    actuales = (instance.tipo, instance.minutos_antes, instance.minutos_despues)
+    if not created and actuales != getattr(instance, '_buffers_originales', actuales):
+        recalcular_rangos_espacios([instance.id])
+    instance._buffers_originales = actuales
+    instance.__dict__.pop('buffers', None)
+
+@receiver(post_save, sender=BufferTipoEspacio)
+@receiver(post_delete, sender=BufferTipoEspacio)
+def recalcular_rangos_tipo(sender, instance, **kwargs):
+    recalcular_rangos_espacios(Espacio.objects.filter(tipo=instance.tipo).filter(
+        Q(minutos_antes__isnull=True) | Q(minutos_despues__isnull=True)
+    ).values_list('id', flat=True))
+
+
+# === ROL EN SESIÓN ===
+# Las sesiones guardan el rol (perfiles.rol_de); si cambia, se invalida al
+# confirmar la transacción, para que nadie vuelva a guardar el rol anterior.
+
+@receiver(post_init, sender=PerfilUsuario)
+def recordar_rol_perfil(sender, instance, **kwargs):
+    instance._rol_original = instance.__dict__.get('rol')
+
+@receiver(post_save, sender=PerfilUsuario)
+def invalidar_rol_perfil(sender, instance, created, **kwargs):
+    if created or instance.rol != instance._rol_original:
+        transaction.on_commit(lambda: invalidar_rol(instance.user_id))
+    instance._rol_original = instance.rol
+
+@receiver(post_delete, sender=PerfilUsuario)
+def invalidar_rol_perfil_borrado(sender, instance, **kwargs):
+    transaction.on_commit(lambda: invalidar_rol(instance.user_id))
+
+
+# === CACHÉ DE USUARIOS (backends.EmailBackend.get_user) ===
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def olvidar_usuario_guardado(sender, instance, **kwargs):
+    olvidar_usuario(instance.pk)
+
+@receiver(post_save, sender=PerfilUsuario)
+@receiver(post_delete, sender=PerfilUsuario)
+def olvidar_usuario_perfil(sender, instance, **kwargs):
+    olvidar_usuario(instance.user_id)
@@ -0,0 +1,169 @@
+"""
+Notificaciones en tiempo real por Server-Sent Events.
+
+Los triggers de la migración 0021 publican cada Notificacion y
+NotificacionAdmin nueva con NOTIFY en el canal CANAL_POSTGRES (al confirmarse
+la transacción, así que nunca se avisa algo que luego se deshizo). En cada
+proceso ASGI un Broker mantiene una sola conexión con LISTEN y reparte los
+avisos a las colas de las conexiones SSE abiertas en ese proceso:
+
+    'usuario:<id>'  notificaciones de un usuario
+    'admin'         notificaciones administrativas
+
+Con varios workers cada uno escucha por su cuenta, así que no importa en qué
+proceso se creó la notificación. Si la conexión de escucha se corta se avisa
+RESINCRONIZAR a los clientes para que vuelvan a pedir la lista.
+"""
+import asyncio
+import json
+from collections import defaultdict
+import psycopg2
+from psycopg2.extensions import ISOLATION_LEVEL_AUTOCOMMIT
+from django.db import connections
+from .models import Notificacion, NotificacionAdmin, PerfilUsuario
+
+CANAL_POSTGRES = 'reservas_notificaciones'
+CANAL_ADMIN = 'admin'
+ROLES_ADMIN = ('Administrativo', 'Investigacion', 'Aprobador', 'SuperAdmin')
+
+MAX_PENDIENTES = 100         # avisos en cola por cliente antes de pedirle resincronizar
+ESPERA_RECONEXION = 5        # segundos entre intentos de reconectar el LISTEN
+MAX_REENVIO = 50             # notificaciones reenviadas al reconectar con Last-Event-ID
+
+RESINCRONIZAR = {'evento': 'resincronizar'}
+
+
+def canal_usuario(usuario_id):
+    return f'usuario:{usuario_id}'
+
+
+def canal_de(usuario):
+    """Canal al que se suscribe un usuario según su rol (None si no está autenticado)."""
+    if not usuario.is_authenticated:
+        return None
+    rol = PerfilUsuario.objects.filter(user=usuario).values_list('rol', flat=True).first()
+    return CANAL_ADMIN if rol in ROLES_ADMIN else canal_usuario(usuario.id)
+
+
+def evento_notificacion(notificacion):
+    """Mismo contenido que publican los triggers, para reenviar notificaciones perdidas."""
+    evento = {
+        'id': notificacion.id,
+        'tipo': notificacion.tipo,
+        'titulo': notificacion.titulo,
+        'mensaje': notificacion.mensaje[:1000],
+        'fecha_creacion_formateada': notificacion.get_fecha_creacion_formateada(),
+    }
+    if isinstance(notificacion, NotificacionAdmin):
+        evento['prioridad'] = notificacion.prioridad
+    return evento
+
+
+def notificaciones_desde(canal, ultimo_id):
+    """Notificaciones del canal posteriores a ultimo_id (las que se perdió un cliente al reconectar)."""
+    if canal == CANAL_ADMIN:
+        notificaciones = NotificacionAdmin.objects.all()
+    else:
+        notificaciones = Notificacion.objects.filter(destinatario_id=int(canal.split(':')[1]))
+    notificaciones = notificaciones.filter(id__gt=ultimo_id).only(
+        'tipo', 'titulo', 'mensaje', 'fecha_creacion', *(['prioridad'] if canal == CANAL_ADMIN else [])
+    ).order_by('id')[:MAX_REENVIO]
+    return [evento_notificacion(notificacion) for notificacion in notificaciones]
+
+
+def _conectar():
+    """Conexión propia (fuera del pool de Django) en autocommit y escuchando el canal."""
+    conexion = psycopg2.connect(**connections['default'].get_connection_params())
+    conexion.set_isolation_level(ISOLATION_LEVEL_AUTOCOMMIT)
+    with conexion.cursor() as cursor:
+        cursor.execute(f'LISTEN {CANAL_POSTGRES}')
+    return conexion
+
+
+class Broker:
+    """Reparte los NOTIFY de PostgreSQL entre las conexiones SSE de este proceso."""
+
+    def __init__(self):
+        self._suscriptores = defaultdict(set)
+        self._loop = None
+        self._tarea = None
+
+    def suscribir(self, canal):
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # Primer uso o el servidor creó otro event loop: lo anterior ya no sirve
+            self._suscriptores.clear()
+            self._loop, self._tarea = loop, None
+        if self._tarea is None or self._tarea.done():
+            self._tarea = loop.create_task(self._escuchar())
+        cola = asyncio.Queue(maxsize=MAX_PENDIENTES)
+        self._suscriptores[canal].add(cola)
+        return cola
+
+    def desuscribir(self, canal, cola):
+        colas = self._suscriptores.get(canal)
+        if colas is not None:
+            colas.discard(cola)
+            if not colas:
+                del self._suscriptores[canal]
+
+    def despachar(self, canal, evento):
+        for cola in list(self._suscriptores.get(canal, ())):
+            self._encolar(cola, evento)
+
+    def _encolar(self, cola, evento):
+        try:
+            cola.put_nowait(evento)
+        except asyncio.QueueFull:
+            # Cliente que no alcanza a leer: se descarta lo pendiente y recarga la lista
+            while not cola.empty():
+                cola.get_nowait()
+            cola.put_nowait(RESINCRONIZAR)
+
+    def _recibir(self, payload):
+        try:
+            evento = json.loads(payload)
+            canal = evento.pop('canal')
+        except (ValueError, KeyError):
+            print(f"⚠️ Aviso de notificación inválido: {payload[:200]}")
+            return
+        self.despachar(canal, evento)
+
+    async def _escuchar(self):
+        loop = asyncio.get_running_loop()
+        reconectando = False
+        while True:
+            try:
+                conexion = await loop.run_in_executor(None, _conectar)
+            except psycopg2.Error as e:
+                print(f"❌ No se pudo escuchar {CANAL_POSTGRES}: {e}")
+                await asyncio.sleep(ESPERA_RECONEXION)
+                continue
+
+            if reconectando:
+                # Pudieron perderse avisos mientras no había conexión
+                for colas in list(self._suscriptores.values()):
+                    for cola in list(colas):
+                        self._encolar(cola, RESINCRONIZAR)
+            print(f"📡 Escuchando {CANAL_POSTGRES}")
+
+            hay_datos = asyncio.Event()
+            descriptor = conexion.fileno()
+            loop.add_reader(descriptor, hay_datos.set)
+            try:
+                while True:
+                    await hay_datos.wait()
+                    hay_datos.clear()
+                    conexion.poll()
+                    while conexion.notifies:
+                        self._recibir(conexion.notifies.pop(0).payload)
+            except psycopg2.Error as e:
+                print(f"⚠️ Se perdió la conexión de {CANAL_POSTGRES}: {e}")
+            finally:
+                loop.remove_reader(descriptor)
+                conexion.close()
+            reconectando = True
+            await asyncio.sleep(ESPERA_RECONEXION)
+
+
+broker = Broker()
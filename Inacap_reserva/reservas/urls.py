@@ -73,6 +73,11 @@ urlpatterns = [
     
     # === REPORTES ===
     path('reportes/generar-pdf/<str:tipo_reporte>/', views.generar_reporte_pdf, name='generar_reporte_pdf'),
+    path('api/reportes/mapa-calor/', views.mapa_calor_uso_api, name='mapa_calor_uso_api'),
+    path('api/reportes/uso-espacios/', views.uso_espacios_api, name='uso_espacios_api'),
+    
+    # === SEGURIDAD ===
+    path('api/seguridad/limites-acceso/', views.metricas_limites_acceso_api, name='metricas_limites_acceso_api'),
     
     # === API ENDPOINTS ===
     path('api/', include(router.urls)),
@@ -84,8 +89,22 @@ urlpatterns = [
     path('api/reservas/<int:reserva_id>/aprobar/', views.aprobar_reserva_api, name='aprobar_reserva_api'),
     path('api/reservas/<int:reserva_id>/rechazar/', views.rechazar_reserva_api, name='rechazar_reserva_api'),
     
+    # API - Reservas recurrentes
+    path('api/series/crear/', views.crear_serie_api, name='crear_serie_api'),
+    path('api/series/<int:serie_id>/', views.obtener_serie_api, name='obtener_serie_api'),
+    path('api/series/<int:serie_id>/aprobar/', views.aprobar_serie_api, name='aprobar_serie_api'),
+    path('api/series/<int:serie_id>/cancelar/', views.cancelar_serie_api, name='cancelar_serie_api'),
+    path('api/asignacion/previsualizar/', views.previsualizar_asignacion_api, name='previsualizar_asignacion_api'),
+    path('api/asignacion/aplicar/', views.aplicar_asignacion_api, name='aplicar_asignacion_api'),
+    
     # API - Espacios
+    path('api/calendario/eventos/', views.calendario_eventos_api, name='calendario_eventos_api'),
+    path('api/calendario/suscripcion/', views.suscripcion_calendario_api, name='suscripcion_calendario_api'),
+    path('ics/espacio/<int:espacio_id>.ics', views.ics_espacio, name='ics_espacio'),
+    path('ics/usuario/<str:token>.ics', views.ics_usuario, name='ics_usuario'),
     path('api/espacios/', views.get_espacios_disponibles, name='get_espacios'),
+    path('api/espacios/disponibilidad/', views.disponibilidad_espacios_api, name='disponibilidad_espacios_api'),
+    path('api/espacios/buscar/', views.buscar_espacios_api, name='buscar_espacios_api'),
     path('api/espacios/crear/', views.crear_espacio_api, name='crear_espacio_api'),
     path('api/espacios/<int:espacio_id>/', views.obtener_espacio_api, name='obtener_espacio_api'),
     path('api/espacios/<int:espacio_id>/actualizar/', views.actualizar_espacio_api, name='actualizar_espacio_api'),
@@ -104,6 +123,7 @@ urlpatterns = [
     # API - Notificaciones
     path('api/notificaciones/', views.get_notificaciones_usuario, name='get_notificaciones'),
     path('api/notificaciones/contar/', views.contar_notificaciones_no_leidas, name='contar_notificaciones'),
+    path('api/eventos/notificaciones/', views.eventos_notificaciones, name='eventos_notificaciones'),
     path('api/notificaciones/marcar-todas-leidas/', views.marcar_todas_leidas, name='marcar_todas_leidas'),
     path('api/notificaciones/<int:notificacion_id>/marcar-leida/', views.marcar_notificacion_leida, name='marcar_notificacion_leida'),
     
@@ -1,9 +1,77 @@
-from django.db.models import Q
+from django.db import connection
+from django.contrib.postgres.fields import DateTimeRangeField
+from django.db.models import Q, F, Exists, OuterRef, Subquery, Value, Func, BooleanField, DateTimeField, DurationField, ExpressionWrapper
+from django.db.models.functions import Coalesce
 from django.utils import timezone
-from .models import Reserva, Mantenimiento, HorariosDisponibilidad
-from datetime import datetime, time, date
+from .models import Reserva, Mantenimiento, HorariosDisponibilidad, Espacio, Equipamiento, BufferTipoEspacio
+from .ocupacion import obtener_ocupacion_dia, mascara_intervalo, ESTADOS_MANTENIMIENTO_ACTIVOS
+from .buffers import buffers_de_espacios, margenes_de_espacios, SQL_BUFFERS_ESPACIOS
+from .ocupacion_horaria import uso_espacios
+from datetime import datetime, time, date, timedelta
 
-def validar_disponibilidad_espacio(espacio_id, fecha, hora_inicio, hora_fin, reserva_excluida_id=None):
+# Índice = date.weekday(); son los valores de HorariosDisponibilidad.dia_semana
+DIAS_SEMANA_ES = ['Lunes', 'Martes', 'Miércoles', 'Jueves', 'Viernes', 'Sábado', 'Domingo']
+
+MAX_RESERVAS_POR_DIA = 3
+
+def ampliar_intervalo(hora_inicio, hora_fin, margen):
+    """[hora_inicio - margen, hora_fin + margen) en minutos, recortado al día"""
+    if not margen:
+        return hora_inicio, hora_fin
+    inicio = datetime.combine(date.min, hora_inicio) - timedelta(minutes=margen)
+    fin = datetime.combine(date.min, hora_fin) + timedelta(minutes=margen)
+    return (
+        inicio.time() if inicio.date() == date.min else time.min,
+        fin.time() if fin.date() == date.min else time.max
+    )
+
+def filtro_solapamiento(hora_inicio, hora_fin, margen=0):
+    """
+    Condición de solapamiento con [hora_inicio, hora_fin) sobre hora_inicio/hora_fin
+    
+    Una reserva que termina justo cuando empieza la otra no se considera solapada.
+    margen son los minutos que el espacio exige entre reservas (antes + después).
+    """
+    hora_inicio, hora_fin = ampliar_intervalo(hora_inicio, hora_fin, margen)
+    return Q(
+        hora_inicio__lt=hora_fin,    # La reserva existente comienza ANTES de que termine la nueva
+        hora_fin__gt=hora_inicio     # La reserva existente termina DESPUÉS de que comience la nueva
+    )
+
+def mensaje_conflicto(r_inicio, r_fin, hora_inicio, hora_fin, margen=0):
+    """Mensaje de choque con una reserva existente; aclara cuando solo choca el tiempo entre reservas"""
+    mensaje = f"Conflicto con reserva existente de {r_inicio.strftime('%H:%M')} a {r_fin.strftime('%H:%M')}"
+    if margen and not (r_inicio < hora_fin and r_fin > hora_inicio):
+        mensaje += f" (el espacio requiere {margen} minutos entre reservas)"
+    return mensaje
+
+def rango_con_buffers(fecha, hora_inicio, hora_fin, buffers):
+    """Rango [inicio - antes, fin + despues) con el que se guardaría una reserva nueva"""
+    return Reserva(fecha_reserva=fecha, hora_inicio=hora_inicio, hora_fin=hora_fin).calcular_rango_horario(buffers)
+
+def validar_duracion_reserva(hora_inicio, hora_fin):
+    """
+    Valida el orden de las horas y la duración mínima y máxima
+    
+    Returns:
+        tuple: (valido, mensaje_error)
+    """
+    # 1. Validar que la hora de fin sea después de la hora de inicio
+    if hora_inicio >= hora_fin:
+        return False, "La hora de fin debe ser posterior a la hora de inicio"
+    
+    # 2. Validar duración mínima (30 minutos)
+    duracion_minutos = (hora_fin.hour * 60 + hora_fin.minute) - (hora_inicio.hour * 60 + hora_inicio.minute)
+    if duracion_minutos < 30:
+        return False, "La duración mínima de reserva es de 30 minutos"
+    
+    # 3. Validar duración máxima (8 horas)
+    if duracion_minutos > 480:
+        return False, "La duración máxima de reserva es de 8 horas"
+    
+    return True, "Duración válida"
+
+def validar_disponibilidad_espacio(espacio_id, fecha, hora_inicio, hora_fin, reserva_excluida_id=None, usar_indice=True):
     """
     Valida que no existan reservas solapadas para el mismo espacio
     
@@ -13,6 +81,8 @@ def validar_disponibilidad_espacio(espacio_id, fecha, hora_inicio, hora_fin, res
         hora_inicio: hora de inicio
         hora_fin: hora de fin
         reserva_excluida_id: ID de reserva a excluir (para ediciones)
+        usar_indice: consultar el índice de ocupación (OcupacionEspacioDia) en vez
+            de filtrar Reserva y Mantenimiento directamente
     
     Returns:
         tuple: (disponible, mensaje_error)
@@ -26,69 +96,61 @@ def validar_disponibilidad_espacio(espacio_id, fecha, hora_inicio, hora_fin, res
         
         # ======== VALIDACIONES NUEVAS ========
         
-        # 1. Validar que la hora de fin sea después de la hora de inicio
-        if hora_inicio >= hora_fin:
-            return False, "La hora de fin debe ser posterior a la hora de inicio"
-        
-        # 2. Validar duración mínima (30 minutos)
-        duracion_minutos = (hora_fin.hour * 60 + hora_fin.minute) - (hora_inicio.hour * 60 + hora_inicio.minute)
-        if duracion_minutos < 30:
-            return False, "La duración mínima de reserva es de 30 minutos"
-        
-        # 3. Validar duración máxima (8 horas)
-        if duracion_minutos > 480:
-            return False, "La duración máxima de reserva es de 8 horas"
+        valido, mensaje = validar_duracion_reserva(hora_inicio, hora_fin)
+        if not valido:
+            return False, mensaje
         
         # ======== VALIDACIONES EXISTENTES ========
         
-        # Validar reservas existentes
-        reservas_query = Reserva.objects.filter(
-            espacio_id=espacio_id,
-            fecha_reserva=fecha,
-            estado__in=['Aprobada', 'Pendiente']  # Solo considerar reservas activas
-        )
+        buffers = buffers_de_espacios([espacio_id]).get(espacio_id, (0, 0))
+        margen = sum(buffers)
         
-        # Excluir la reserva actual si se está editando
-        if reserva_excluida_id:
-            reservas_query = reservas_query.exclude(id=reserva_excluida_id)
-        
-        # ======== CORRECCIÓN CRÍTICA AQUÍ ========
-        # Validación CORREGIDA de solapamiento
-        # Buscar reservas que SE SOLAPEN (no las que NO se solapen)
-        reservas_solapadas = reservas_query.filter(
-            hora_inicio__lt=hora_fin,    # La reserva existente comienza ANTES de que termine la nueva
-            hora_fin__gt=hora_inicio     # La reserva existente termina DESPUÉS de que comience la nueva
-        )
+        if usar_indice:
+            # Una sola búsqueda por clave: si ningún bloque del intervalo (con el
+            # tiempo entre reservas) está ocupado no hace falta consultar Reserva
+            bloques_ocupados, en_mantenimiento = obtener_ocupacion_dia(espacio_id, fecha)
+            # Si el margen pasa la medianoche, una reserva del día vecino puede alcanzar a esta
+            cruza_dia = margen and (_minutos(hora_inicio) < margen or _minutos(hora_fin) + margen > 24 * 60)
+            posible_conflicto = cruza_dia or bool(
+                bloques_ocupados & mascara_intervalo(*ampliar_intervalo(hora_inicio, hora_fin, margen))
+            )
+        else:
+            posible_conflicto = True
+            en_mantenimiento = None
         
-        if reservas_solapadas.exists():
-            # Obtener información de la reserva que causa conflicto
-            conflicto = reservas_solapadas.first()
-            return False, f"Conflicto con reserva existente de {conflicto.hora_inicio.strftime('%H:%M')} a {conflicto.hora_fin.strftime('%H:%M')}"
+        if posible_conflicto:
+            # Validar reservas existentes: rango_horario ya incluye los buffers de
+            # cada reserva, se compara con el rango ampliado de la nueva
+            reservas_query = Reserva.objects.filter(
+                espacio_id=espacio_id,
+                fecha_reserva__range=(fecha - timedelta(days=1), fecha + timedelta(days=1)),
+                estado__in=Reserva.ESTADOS_ACTIVOS,  # Solo considerar reservas activas
+                rango_horario__overlap=rango_con_buffers(fecha, hora_inicio, hora_fin, buffers)
+            )
+            
+            # Excluir la reserva actual si se está editando
+            if reserva_excluida_id:
+                reservas_query = reservas_query.exclude(id=reserva_excluida_id)
+            
+            conflicto = reservas_query.order_by('rango_horario').first()
+            
+            if conflicto:
+                return False, mensaje_conflicto(conflicto.hora_inicio, conflicto.hora_fin, hora_inicio, hora_fin, margen)
         
         # Validar mantenimiento programado
-        mantenimiento_activo = Mantenimiento.objects.filter(
-            id_espacio_id=espacio_id,
-            fecha_inicio__lte=fecha,
-            fecha_fin__gte=fecha,
-            estado__in=['Programado', 'En Proceso']
-        ).exists()
+        if en_mantenimiento is None:
+            en_mantenimiento = Mantenimiento.objects.filter(
+                id_espacio_id=espacio_id,
+                fecha_inicio__lte=fecha,
+                fecha_fin__gte=fecha,
+                estado__in=ESTADOS_MANTENIMIENTO_ACTIVOS
+            ).exists()
         
-        if mantenimiento_activo:
+        if en_mantenimiento:
             return False, "El espacio está en mantenimiento en la fecha seleccionada"
         
         # Validar horarios de disponibilidad del espacio
-        dia_semana = fecha.strftime('%A')
-        dias_semana_es = {
-            'Monday': 'Lunes',
-            'Tuesday': 'Martes',
-            'Wednesday': 'Miércoles',
-            'Thursday': 'Jueves',
-            'Friday': 'Viernes',
-            'Saturday': 'Sábado',
-            'Sunday': 'Domingo'
-        }
-        
-        dia_semana_es = dias_semana_es.get(dia_semana, dia_semana)
+        dia_semana_es = DIAS_SEMANA_ES[fecha.weekday()]
         
         horario_disponibilidad = HorariosDisponibilidad.objects.filter(
             id_espacio_id=espacio_id,
@@ -108,6 +170,110 @@ def validar_disponibilidad_espacio(espacio_id, fecha, hora_inicio, hora_fin, res
     except Exception as e:
         return False, f"Error al validar disponibilidad: {str(e)}"
 
+def es_error_solapamiento(error):
+    """
+    Indica si un error de la BD al guardar una reserva corresponde a un solapamiento
+    
+    Además de la violación de la restricción de exclusión, dos inserciones
+    solapadas y simultáneas pueden quedar esperando una a la otra; PostgreSQL
+    aborta una de ellas con deadlock (40P01), que es el mismo conflicto.
+    """
+    causa = getattr(error, '__cause__', None)
+    if getattr(causa, 'pgcode', None) == '40P01':
+        return True
+    diag = getattr(causa, 'diag', None)
+    nombre = getattr(diag, 'constraint_name', None) or str(error)
+    return 'reserva_sin_solapamiento_activo' in nombre
+
+def anotar_buffers(espacios):
+    """Anota buffer_antes y buffer_despues efectivos (los del espacio o los de su tipo)"""
+    buffer_tipo = BufferTipoEspacio.objects.filter(tipo=OuterRef('tipo'))
+    return espacios.annotate(
+        buffer_antes=Coalesce('minutos_antes', Subquery(buffer_tipo.values('minutos_antes')[:1]), Value(0)),
+        buffer_despues=Coalesce('minutos_despues', Subquery(buffer_tipo.values('minutos_despues')[:1]), Value(0)),
+    )
+
+def buscar_espacios_libres(fecha, hora_inicio, hora_fin, capacidad_minima=None, tipo=None,
+                           edificio=None, piso=None, tipos_equipo=()):
+    """
+    Busca los espacios libres en una ventana horaria, ordenados por ajuste de capacidad
+    
+    Aplica las mismas reglas que validar_disponibilidad_espacio (solapamiento con
+    reservas activas y tiempo entre reservas, mantenimiento del día y horario
+    vigente del día de la semana)
+    como subconsultas de una sola consulta, así que el costo no depende de la
+    cantidad de espacios. Los equipamientos se precargan con un prefetch.
+    
+    Returns:
+        QuerySet de Espacio anotado con 'holgura' (capacidad sobrante)
+    """
+    espacios = Espacio.objects.filter(estado='Disponible')
+    
+    if capacidad_minima:
+        espacios = espacios.filter(capacidad__gte=capacidad_minima)
+    if tipo:
+        espacios = espacios.filter(tipo=tipo)
+    if edificio:
+        espacios = espacios.filter(edificio__iexact=edificio)
+    if piso is not None:
+        espacios = espacios.filter(piso=piso)
+    
+    # Debe tener todos los tipos de equipamiento pedidos
+    for tipo_equipo in set(tipos_equipo):
+        espacios = espacios.filter(Exists(Equipamiento.objects.filter(
+            id_espacio=OuterRef('pk'),
+            tipo_equipo=tipo_equipo
+        )))
+    
+    espacios = anotar_buffers(espacios)
+    
+    # rango_horario ya incluye los buffers de las reservas existentes; se compara
+    # con el rango pedido ampliado con los buffers de cada espacio
+    rango_pedido = rango_con_buffers(fecha, hora_inicio, hora_fin, (0, 0))
+    un_minuto = Value(timedelta(minutes=1), output_field=DurationField())
+    reservas_solapadas = Reserva.objects.filter(
+        espacio=OuterRef('pk'),
+        fecha_reserva__range=(fecha - timedelta(days=1), fecha + timedelta(days=1)),
+        estado__in=Reserva.ESTADOS_ACTIVOS,
+        rango_horario__overlap=Func(
+            ExpressionWrapper(Value(rango_pedido.lower) - OuterRef('buffer_antes') * un_minuto, output_field=DateTimeField()),
+            ExpressionWrapper(Value(rango_pedido.upper) + OuterRef('buffer_despues') * un_minuto, output_field=DateTimeField()),
+            Value('[)'),
+            function='tstzrange',
+            output_field=DateTimeRangeField()
+        )
+    )
+    mantenimiento = Mantenimiento.objects.filter(
+        id_espacio=OuterRef('pk'),
+        fecha_inicio__lte=fecha,
+        fecha_fin__gte=fecha,
+        estado__in=ESTADOS_MANTENIMIENTO_ACTIVOS
+    )
+    # Si el horario vigente cubre la ventana; sin horario registrado no hay restricción
+    horario_cubre = HorariosDisponibilidad.objects.filter(
+        id_espacio=OuterRef('pk'),
+        dia_semana=DIAS_SEMANA_ES[fecha.weekday()],
+        fecha_inicio_vigencia__lte=fecha
+    ).order_by('-fecha_inicio_vigencia').annotate(
+        cubre=ExpressionWrapper(
+            Q(hora_apertura__lte=hora_inicio, hora_cierre__gte=hora_fin),
+            output_field=BooleanField()
+        )
+    ).values('cubre')[:1]
+    
+    espacios = espacios.annotate(
+        dentro_de_horario=Coalesce(Subquery(horario_cubre), Value(True))
+    ).filter(
+        ~Exists(reservas_solapadas),
+        ~Exists(mantenimiento),
+        dentro_de_horario=True
+    )
+    
+    # Mejor ajuste: primero los espacios con menos capacidad sobrante
+    return espacios.annotate(
+        holgura=F('capacidad') - (capacidad_minima or 0)
+    ).order_by('holgura', 'nombre', 'id').prefetch_related('equipamientos')
+
 def calcular_duracion(hora_inicio, hora_fin):
     """
     Calcular la duración en formato legible
@@ -138,21 +304,21 @@ def obtener_estadisticas_uso_espacio(espacio_id, mes=None, año=None):
     if not año:
         año = timezone.now().year
     
-    reservas_mes = Reserva.objects.filter(
-        espacio_id=espacio_id,
-        fecha_reserva__month=mes,
-        fecha_reserva__year=año,
-        estado='Aprobada'
-    )
+    desde = date(año, mes, 1)
+    hasta = (desde + timedelta(days=31)).replace(day=1) - timedelta(days=1)
+    
+    # Horas y días salen de la ocupación por hora ya agregada, no de cada reserva
+    minutos, dias_ocupados = uso_espacios([espacio_id], desde, hasta).get(espacio_id, (0, 0))
     
     return {
-        'total_reservas': reservas_mes.count(),
-        'dias_ocupados': reservas_mes.dates('fecha_reserva', 'day').count(),
-        'horas_totales': sum(
-            (reserva.hora_fin.hour - reserva.hora_inicio.hour) + 
-            (reserva.hora_fin.minute - reserva.hora_inicio.minute) / 60 
-            for reserva in reservas_mes
-        )
+        'total_reservas': Reserva.objects.filter(
+            espacio_id=espacio_id,
+            fecha_reserva__gte=desde,
+            fecha_reserva__lte=hasta,
+            estado='Aprobada'
+        ).count(),
+        'dias_ocupados': dias_ocupados,
+        'horas_totales': minutos / 60
     }
 
 # ======== FUNCIONES NUEVAS AÑADIDAS ========
@@ -205,10 +371,397 @@ def validar_limite_reservas_usuario(usuario, fecha_reserva):
             estado__in=['Aprobada', 'Pendiente']
         ).count()
         
-        if reservas_del_dia >= 3:
-            return False, "Límite de 3 reservas por día alcanzado"
+        if reservas_del_dia >= MAX_RESERVAS_POR_DIA:
+            return False, f"Límite de {MAX_RESERVAS_POR_DIA} reservas por día alcanzado"
         
         return True, "Límite de reservas válido"
         
     except Exception as e:
-        return False, f"Error validando límite de reservas: {str(e)}"
\ No newline at end of file
+        return False, f"Error validando límite de reservas: {str(e)}"
+
+# ======== VALIDACIÓN EN UNA CONSULTA ========
+
+# Orden en que se informan las reglas; es el mismo de las validaciones separadas
+REGLAS_RESERVA = (
+    'espacio_inexistente', 'espacio_no_disponible', 'capacidad', 'duracion', 'solapamiento',
+    'mantenimiento', 'antes_apertura', 'despues_cierre', 'anticipacion', 'limite_diario',
+)
+# Las que cubre validar_disponibilidad_espacio; ante ellas se ofrecen horarios alternativos
+REGLAS_DISPONIBILIDAD = ('duracion', 'solapamiento', 'mantenimiento', 'antes_apertura', 'despues_cierre')
+
+_CAMPOS_ESPACIO = [f.column for f in Espacio._meta.concrete_fields]
+
+SQL_VALIDAR_RESERVA = f"""
+    WITH esp AS (
+        SELECT {', '.join(f'e.{c}' for c in _CAMPOS_ESPACIO)}, b.antes, b.despues
+        FROM reservas_espacio e
+        JOIN ({SQL_BUFFERS_ESPACIOS} WHERE e.id = %(espacio_id)s) b ON b.id = e.id
+    ), choque AS (
+        -- rango_horario ya incluye los buffers; el pedido se amplía con los del espacio
+        SELECT r.hora_inicio, r.hora_fin
+        FROM reservas_reserva r, esp
+        WHERE r.espacio_id = %(espacio_id)s
+          AND r.fecha_reserva BETWEEN %(dia_anterior)s AND %(dia_siguiente)s
+          AND r.estado = ANY(%(estados)s)
+          AND r.rango_horario && tstzrange(
+              %(inicio)s - make_interval(mins => esp.antes),
+              %(fin)s + make_interval(mins => esp.despues),
+              '[)'
+          )
+        ORDER BY r.rango_horario
+        LIMIT 1
+    ), horario AS (
+        SELECT hora_apertura, hora_cierre
+        FROM reservas_horariosdisponibilidad
+        WHERE id_espacio_id = %(espacio_id)s
+          AND dia_semana = %(dia_semana)s
+          AND fecha_inicio_vigencia <= %(fecha)s
+        ORDER BY fecha_inicio_vigencia DESC
+        LIMIT 1
+    )
+    SELECT
+        ARRAY_REMOVE(ARRAY[
+            CASE WHEN esp.id IS NULL THEN 'espacio_inexistente' END,
+            CASE WHEN esp.estado <> 'Disponible' THEN 'espacio_no_disponible' END,
+            CASE WHEN %(num_asistentes)s > esp.capacidad THEN 'capacidad' END,
+            CASE WHEN choque.hora_inicio IS NOT NULL THEN 'solapamiento' END,
+            CASE WHEN EXISTS (
+                SELECT 1 FROM reservas_mantenimiento
+                WHERE id_espacio_id = %(espacio_id)s
+                  AND fecha_inicio <= %(fecha)s
+                  AND fecha_fin >= %(fecha)s
+                  AND estado = ANY(%(estados_mantenimiento)s)
+            ) THEN 'mantenimiento' END,
+            CASE WHEN %(hora_inicio)s < horario.hora_apertura THEN 'antes_apertura' END,
+            CASE WHEN %(hora_fin)s > horario.hora_cierre THEN 'despues_cierre' END,
+            CASE WHEN (
+                SELECT COUNT(*) FROM reservas_reserva
+                WHERE solicitante_id = %(usuario_id)s
+                  AND fecha_reserva = %(fecha)s
+                  AND estado = ANY(%(estados)s)
+            ) >= %(max_por_dia)s THEN 'limite_diario' END
+        ], NULL) AS violaciones,
+        choque.hora_inicio, choque.hora_fin,
+        horario.hora_apertura, horario.hora_cierre,
+        esp.antes, esp.despues,
+        {', '.join(f'esp.{c}' for c in _CAMPOS_ESPACIO)}
+    FROM (SELECT 1) AS base
+    LEFT JOIN esp ON TRUE
+    LEFT JOIN choque ON TRUE
+    LEFT JOIN horario ON TRUE
+"""
+
+def validar_reserva(espacio_id, fecha, hora_inicio, hora_fin, num_asistentes, usuario):
+    """
+    Evalúa todas las reglas de una reserva nueva en un solo viaje a la base de datos
+    
+    Las reglas que dependen de datos (espacio, capacidad, solapamiento, mantenimiento,
+    horario y límite diario) salen de una consulta con CTEs que devuelve los códigos
+    violados; duración y anticipación se revisan en Python. Se informa la primera
+    regla violada según REGLAS_RESERVA, con los mismos mensajes de las validaciones
+    individuales.
+    
+    Returns:
+        tuple: (espacio o None, código de la regla violada o None, mensaje)
+    """
+    try:
+        espacio_id = int(espacio_id)
+    except (TypeError, ValueError):
+        return None, 'espacio_inexistente', 'El espacio seleccionado no existe'
+    
+    # Antes de la consulta: con horas invertidas el tstzrange fallaría en la BD.
+    # En ese caso se consulta con un rango vacío, que no choca con nada, para
+    # seguir informando las reglas que tienen prioridad sobre la duración
+    valido_duracion, mensaje_duracion = validar_duracion_reserva(hora_inicio, hora_fin)
+    rango_pedido = rango_con_buffers(fecha, hora_inicio, hora_fin if hora_fin > hora_inicio else hora_inicio, (0, 0))
+    with connection.cursor() as cursor:
+        cursor.execute(SQL_VALIDAR_RESERVA, {
+            'espacio_id': espacio_id,
+            'fecha': fecha,
+            'dia_anterior': fecha - timedelta(days=1),
+            'dia_siguiente': fecha + timedelta(days=1),
+            'hora_inicio': hora_inicio,
+            'hora_fin': hora_fin,
+            'inicio': rango_pedido.lower,
+            'fin': rango_pedido.upper,
+            'dia_semana': DIAS_SEMANA_ES[fecha.weekday()],
+            'num_asistentes': num_asistentes,
+            'usuario_id': usuario.id,
+            'estados': list(Reserva.ESTADOS_ACTIVOS),
+            'estados_mantenimiento': list(ESTADOS_MANTENIMIENTO_ACTIVOS),
+            'max_por_dia': MAX_RESERVAS_POR_DIA,
+        })
+        fila = cursor.fetchone()
+    
+    violaciones, choque_inicio, choque_fin, apertura, cierre, antes, despues = fila[:7]
+    violaciones = set(violaciones)
+    espacio = None
+    if 'espacio_inexistente' not in violaciones:
+        espacio = Espacio.from_db(connection.alias, [f.attname for f in Espacio._meta.concrete_fields], fila[7:])
+        espacio.buffers = (antes, despues)  # ya calculados; los usa Reserva.save()
+    
+    if not valido_duracion:
+        violaciones.add('duracion')
+    valido, mensaje_anticipacion = validar_anticipacion_reserva(fecha, hora_inicio)
+    if not valido:
+        violaciones.add('anticipacion')
+    
+    codigo = next((c for c in REGLAS_RESERVA if c in violaciones), None)
+    if codigo is None:
+        return espacio, None, "Reserva válida"
+    
+    if codigo == 'espacio_inexistente':
+        mensaje = 'El espacio seleccionado no existe'
+    elif codigo == 'espacio_no_disponible':
+        mensaje = f'El espacio "{espacio.nombre}" no está disponible para reservas ({espacio.estado})'
+    elif codigo == 'capacidad':
+        mensaje = f'El espacio "{espacio.nombre}" solo tiene capacidad para {espacio.capacidad} personas'
+    elif codigo == 'duracion':
+        mensaje = mensaje_duracion
+    elif codigo == 'solapamiento':
+        mensaje = mensaje_conflicto(choque_inicio, choque_fin, hora_inicio, hora_fin, antes + despues)
+    elif codigo == 'mantenimiento':
+        mensaje = "El espacio está en mantenimiento en la fecha seleccionada"
+    elif codigo == 'antes_apertura':
+        mensaje = f"El espacio abre a las {apertura.strftime('%H:%M')}"
+    elif codigo == 'despues_cierre':
+        mensaje = f"El espacio cierra a las {cierre.strftime('%H:%M')}"
+    elif codigo == 'anticipacion':
+        mensaje = mensaje_anticipacion
+    else:
+        mensaje = f"Límite de {MAX_RESERVAS_POR_DIA} reservas por día alcanzado"
+    
+    return espacio, codigo, mensaje
+
+# ======== DISPONIBILIDAD POR RANGO ========
+
+# Sin horario registrado el validador acepta cualquier hora del día
+HORA_APERTURA_DEFECTO = time(0, 0)
+HORA_CIERRE_DEFECTO = time(23, 59)
+
+DURACION_MINIMA_MINUTOS = 30
+MAX_DIAS_DISPONIBILIDAD = 31
+
+
+def _minutos(hora):
+    return hora.hour * 60 + hora.minute
+
+
+def cargar_horarios(espacio_ids, hasta):
+    """
+    Carga en una consulta los HorariosDisponibilidad vigentes hasta una fecha
+    
+    Returns:
+        dict: {(espacio_id, dia_semana): [(vigencia, apertura, cierre), ...]} por vigencia
+    """
+    horarios = {}
+    for espacio_id, dia_semana, vigencia, apertura, cierre in HorariosDisponibilidad.objects.filter(
+        id_espacio_id__in=espacio_ids,
+        fecha_inicio_vigencia__lte=hasta
+    ).order_by('fecha_inicio_vigencia', 'id').values_list(
+        'id_espacio_id', 'dia_semana', 'fecha_inicio_vigencia', 'hora_apertura', 'hora_cierre'
+    ):
+        horarios.setdefault((espacio_id, dia_semana), []).append((vigencia, apertura, cierre))
+    return horarios
+
+def horario_vigente(horarios, espacio_id, fecha):
+    """(apertura, cierre) vigente en la fecha según cargar_horarios, o None si no hay horario"""
+    vigente = None
+    for vigencia, apertura, cierre in horarios.get((espacio_id, DIAS_SEMANA_ES[fecha.weekday()]), []):
+        if vigencia > fecha:
+            break
+        vigente = (apertura, cierre)
+    return vigente
+
+def calcular_intervalos_libres(espacio_ids, desde, hasta, margenes=None, horarios=None):
+    """
+    Calcula los intervalos libres de varios espacios para cada día de un rango
+    
+    Usa una consulta por tabla (Reserva, Mantenimiento, HorariosDisponibilidad y
+    los buffers de los espacios) y recorre las reservas ordenadas de cada día, en
+    lugar de llamar a validar_disponibilidad_espacio por espacio y día. Los huecos
+    menores a la duración mínima de reserva se omiten porque no se pueden reservar.
+    
+    Args:
+        espacio_ids: IDs de los espacios a consultar
+        desde: primer día del rango (date)
+        hasta: último día del rango (date, inclusive)
+        margenes: {espacio_id: minutos entre reservas} si ya se conocen
+        horarios: resultado de cargar_horarios(espacio_ids, hasta) si ya se cargó
+    
+    Returns:
+        dict: {espacio_id: {fecha: {'en_mantenimiento', 'apertura', 'cierre', 'libres'}}}
+    """
+    espacio_ids = list(espacio_ids)
+    dias = [desde + timedelta(days=n) for n in range((hasta - desde).days + 1)]
+    
+    # Reservas activas agrupadas por (espacio, día), ya ordenadas por hora de inicio
+    ocupados = {}
+    for espacio_id, fecha, hora_inicio, hora_fin in Reserva.objects.filter(
+        espacio_id__in=espacio_ids,
+        fecha_reserva__gte=desde,
+        fecha_reserva__lte=hasta,
+        estado__in=Reserva.ESTADOS_ACTIVOS
+    ).order_by('espacio_id', 'fecha_reserva', 'hora_inicio').values_list(
+        'espacio_id', 'fecha_reserva', 'hora_inicio', 'hora_fin'
+    ):
+        ocupados.setdefault((espacio_id, fecha), []).append((hora_inicio, hora_fin))
+    
+    # Mismo criterio que el validador: cualquier mantenimiento activo bloquea el día completo
+    en_mantenimiento = set()
+    for espacio_id, fecha_inicio, fecha_fin in Mantenimiento.objects.filter(
+        id_espacio_id__in=espacio_ids,
+        fecha_inicio__lte=hasta,
+        fecha_fin__gte=desde,
+        estado__in=ESTADOS_MANTENIMIENTO_ACTIVOS
+    ).values_list('id_espacio_id', 'fecha_inicio', 'fecha_fin'):
+        fecha = max(fecha_inicio, desde)
+        while fecha <= min(fecha_fin, hasta):
+            en_mantenimiento.add((espacio_id, fecha))
+            fecha += timedelta(days=1)
+    
+    if horarios is None:
+        horarios = cargar_horarios(espacio_ids, hasta)
+    if margenes is None:
+        margenes = margenes_de_espacios(espacio_ids)
+    
+    resultado = {}
+    for espacio_id in espacio_ids:
+        por_dia = resultado.setdefault(espacio_id, {})
+        margen = margenes.get(espacio_id, 0)
+        for fecha in dias:
+            apertura, cierre = horario_vigente(horarios, espacio_id, fecha) or (HORA_APERTURA_DEFECTO, HORA_CIERRE_DEFECTO)
+            
+            libres = []
+            mantenimiento = (espacio_id, fecha) in en_mantenimiento
+            if not mantenimiento:
+                # Cada reserva ocupa además el tiempo entre reservas del espacio a
+                # ambos lados, así los libres sirven tal cual para una reserva nueva
+                cursor = apertura
+                for hora_inicio, hora_fin in [
+                    ampliar_intervalo(hora_inicio, hora_fin, margen)
+                    for hora_inicio, hora_fin in ocupados.get((espacio_id, fecha), [])
+                ] + [(cierre, cierre)]:
+                    inicio_libre, fin_libre = cursor, min(hora_inicio, cierre)
+                    if _minutos(fin_libre) - _minutos(inicio_libre) >= DURACION_MINIMA_MINUTOS:
+                        libres.append((inicio_libre, fin_libre))
+                    cursor = max(cursor, hora_fin)
+                    if cursor >= cierre:
+                        break
+            
+            por_dia[fecha] = {
+                'en_mantenimiento': mantenimiento,
+                'apertura': apertura,
+                'cierre': cierre,
+                'libres': libres,
+            }
+    
+    return resultado
+
+
+# ======== SUGERENCIAS ANTE CONFLICTOS ========
+
+MAX_SUGERENCIAS = 5
+MAX_ESPACIOS_SIMILARES = 20
+ANTICIPACION_MINIMA_MINUTOS = 120  # la misma que exige validar_anticipacion_reserva
+
+
+def _hora_de_minutos(minutos):
+    return time(minutos // 60, minutos % 60)
+
+
+def _inicios_posibles(libres, inicio_pedido, duracion, inicio_minimo, todos=True):
+    """
+    Inicios donde cabe la duración pedida dentro de los intervalos libres, en minutos
+    
+    Por cada intervalo se toma el inicio más cercano al pedido y, si todos=True,
+    además los que se alejan del pedido en pasos de la duración mínima.
+    """
+    inicios = set()
+    for hora_inicio, hora_fin in libres:
+        desde = max(_minutos(hora_inicio), inicio_minimo)
+        hasta = _minutos(hora_fin) - duracion  # último inicio posible
+        if hasta < desde:
+            continue
+        
+        cercano = min(max(inicio_pedido, desde), hasta)
+        if cercano == hasta and cercano % 15 and cercano - cercano % 15 >= desde:
+            cercano -= cercano % 15  # cierres como 23:59 dejan inicios desalineados
+        inicios.add(cercano)
+        
+        if todos:
+            primero = inicio_pedido - ((inicio_pedido - desde) // DURACION_MINIMA_MINUTOS) * DURACION_MINIMA_MINUTOS
+            inicios.update(range(primero, hasta + 1, DURACION_MINIMA_MINUTOS))
+    return inicios
+
+
+def sugerir_horarios(espacio, fecha, hora_inicio, hora_fin, num_asistentes=1, cantidad=MAX_SUGERENCIAS):
+    """
+    Horarios libres más cercanos al pedido, con la misma duración, para el
+    mismo espacio y para espacios similares (mismo tipo y capacidad suficiente)
+    
+    Todo sale de una sola llamada a calcular_intervalos_libres para el día, así
+    que respeta reservas, mantenimientos y horarios de disponibilidad sin
+    volver a validar cada candidato.
+    
+    Returns:
+        dict: {'mismo_espacio': [...], 'espacios_similares': [...]} ordenados por cercanía
+    """
+    sugerencias = {'mismo_espacio': [], 'espacios_similares': []}
+    
+    valido, _ = validar_duracion_reserva(hora_inicio, hora_fin)
+    if not valido:
+        return sugerencias
+    
+    inicio_pedido = _minutos(hora_inicio)
+    duracion = _minutos(hora_fin) - inicio_pedido
+    
+    # Los horarios de hoy que no cumplen la anticipación mínima no sirven
+    inicio_minimo = 0
+    ahora = timezone.localtime()
+    if fecha == ahora.date():
+        inicio_minimo = _minutos(ahora.time()) + ANTICIPACION_MINIMA_MINUTOS
+    elif fecha < ahora.date():
+        return sugerencias
+    
+    similares = list(
+        anotar_buffers(Espacio.objects.filter(
+            tipo=espacio.tipo,
+            capacidad__gte=num_asistentes,
+            estado='Disponible'
+        ).exclude(id=espacio.id)).order_by('capacidad', 'id').values_list(
+            'id', 'nombre', 'capacidad', 'buffer_antes', 'buffer_despues'
+        )[:MAX_ESPACIOS_SIMILARES]
+    )
+    
+    margenes = {e[0]: e[3] + e[4] for e in similares}
+    margenes[espacio.id] = sum(espacio.buffers)
+    intervalos = calcular_intervalos_libres([espacio.id] + [e[0] for e in similares], fecha, fecha, margenes)
+    
+    def sugerencia(espacio_id, nombre, capacidad, inicio):
+        return {
+            'espacio_id': espacio_id,
+            'espacio_nombre': nombre,
+            'capacidad': capacidad,
+            'fecha': fecha.isoformat(),
+            'hora_inicio': _hora_de_minutos(inicio).strftime('%H:%M'),
+            'hora_fin': _hora_de_minutos(inicio + duracion).strftime('%H:%M'),
+        }
+    
+    # Mismo espacio: varios horarios del día, sin repetir el pedido
+    inicios = _inicios_posibles(intervalos[espacio.id][fecha]['libres'], inicio_pedido, duracion, inicio_minimo)
+    inicios.discard(inicio_pedido)
+    for inicio in sorted(inicios, key=lambda i: (abs(i - inicio_pedido), i))[:cantidad]:
+        sugerencias['mismo_espacio'].append(sugerencia(espacio.id, espacio.nombre, espacio.capacidad, inicio))
+    
+    # Espacios similares: el horario más cercano de cada uno
+    candidatos = []
+    for espacio_id, nombre, capacidad, _, _ in similares:
+        inicios = _inicios_posibles(intervalos[espacio_id][fecha]['libres'], inicio_pedido, duracion, inicio_minimo, todos=False)
+        if inicios:
+            inicio = min(inicios, key=lambda i: (abs(i - inicio_pedido), i))
+            candidatos.append((abs(inicio - inicio_pedido), capacidad, espacio_id, nombre, inicio))
+    for _, capacidad, espacio_id, nombre, inicio in sorted(candidatos)[:cantidad]:
+        sugerencias['espacios_similares'].append(sugerencia(espacio_id, nombre, capacidad, inicio))
+    
+    return sugerencias
@@ -16,7 +16,7 @@ from django.utils import timezone
 import json
 from .models import PerfilUsuario, Reserva, Espacio, Notificacion, Incidencia, Area
 from django.contrib.auth.models import User
-from django.db import IntegrityError, transaction
+from django.db import IntegrityError, OperationalError, transaction
 from django.db.models import Q
 import traceback
 from .services import NotificacionService
@@ -34,10 +34,35 @@ from django.urls import reverse
 import string, random
 from .models import OneTimePassword
 from django.contrib.auth.hashers import check_password
-from datetime import timedelta
-from .decorators import es_usuario_normal, es_admin, rol_requerido
+from datetime import timedelta, timezone as dt_timezone
+from django.utils.dateparse import parse_datetime
+from .decorators import es_usuario_normal, es_admin, rol_requerido, limitar_intentos
+from .limites_acceso import metricas as metricas_limites
 from .utils import validar_disponibilidad_espacio, validar_anticipacion_reserva, validar_limite_reservas_usuario, calcular_duracion
-from django.http import HttpResponse
+from .utils import calcular_intervalos_libres, cargar_horarios, MAX_DIAS_DISPONIBILIDAD, es_error_solapamiento
+from .utils import buscar_espacios_libres, validar_duracion_reserva, sugerir_horarios, validar_reserva, REGLAS_DISPONIBILIDAD
+from .series import expandir_fechas, rango_demasiado_largo, crear_serie, cambiar_estado_serie, MAX_OCURRENCIAS_SERIE
+from .models import SerieReserva
+from .asignacion import planificar_asignacion, aplicar_asignacion, PlanDesactualizado
+from .buffers import verificar_buffers_espacio, margenes_de_espacios
+from .ocupacion import version_rango
+from .ocupacion_horaria import mapa_calor, uso_espacios
+from .utils import DIAS_SEMANA_ES
+from .ics import ventana_feed, usuario_por_token, version_feed_espacio, version_feed_usuario
+from .ics import reservas_feed_espacio, reservas_feed_usuario, generar_ics, generar_y_guardar
+from django.core.cache import cache
+from django.utils.http import http_date
+from django.utils.cache import get_conditional_response, patch_cache_control
+import hashlib
+from django.http import HttpResponse, HttpResponseNotAllowed, StreamingHttpResponse
+import asyncio
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from .tiempo_real import broker, canal_de, notificaciones_desde, RESINCRONIZAR
+from .contadores import no_leidas_usuario
+from .lecturas_admin import estado_lectura, no_leidas_admin, filtrar_no_leidas, ids_leidos, marcar_todas_leidas_admin
+from .bandeja_notificaciones import encolar_notificacion, encolar_notificacion_admin
+from .perfiles import perfil_de, rol_de, ROLES_ADMIN
 from reportlab.pdfgen import canvas
 from reportlab.lib.pagesizes import letter, A4
 from reportlab.lib import colors
@@ -65,13 +90,8 @@ def es_administrador(view_func=None):
             if not request.user.is_authenticated:
                 raise PermissionDenied("Debes iniciar sesión")
             
-            try:
-                perfil = PerfilUsuario.objects.get(user=request.user)
-                # Roles de administrador permitidos
-                if perfil.rol in ['Administrativo', 'Investigacion', 'Aprobador', 'SuperAdmin']:
-                    return view_func(request, *args, **kwargs)
-            except PerfilUsuario.DoesNotExist:
-                pass
+            if rol_de(request) in ROLES_ADMIN:
+                return view_func(request, *args, **kwargs)
             
             raise PermissionDenied("No tienes permisos de administrador")
         return wrapper
@@ -382,12 +402,10 @@ def api_disponibilidad_elemento(request, elemento_id):
     
 def is_admin_user(user):
     """Verifica si el usuario tiene permisos de administrador - CORREGIDO"""
-    try:
-        perfil = PerfilUsuario.objects.get(user=user)
-        # CORREGIDO: Usar los mismos nombres que en models.py
-        return perfil.rol in ['Administrativo', 'Investigación', 'Aprobador', 'SuperAdmin']
-    except PerfilUsuario.DoesNotExist:
-        return False
+    # Mismo perfil que ya cargaron los decoradores de la vista (caché del objeto usuario)
+    perfil = perfil_de(user)
+    # CORREGIDO: Usar los mismos nombres que en models.py
+    return perfil is not None and perfil.rol in ['Administrativo', 'Investigación', 'Aprobador', 'SuperAdmin']
 
 @csrf_exempt
 def crear_notificacion_tiempo_real(request):
@@ -428,22 +446,13 @@ def crear_notificacion_tiempo_real(request):
 def notificar_accion_admin(tipo, titulo, mensaje, usuario_admin=None, usuario_relacionado=None, reserva=None, espacio=None, request=None):
     """
     Función MEJORADA para notificaciones administrativas - EVITA DUPLICADOS
+    
+    Devuelve el id del EventoNotificacion encolado (la NotificacionAdmin la crea
+    el worker, que puede descartarla por duplicada) o None si falló.
     """
     try:
         print(f"🚀 CREANDO NOTIFICACIÓN ADMIN: {titulo}")
         
-        # Verificar si ya existe una notificación similar reciente (evitar duplicados)
-        if reserva and tipo in ['reserva_aprobada', 'reserva_rechazada']:
-            notificacion_existente = NotificacionAdmin.objects.filter(
-                tipo=tipo,
-                reserva=reserva,
-                fecha_creacion__gte=timezone.now() - timezone.timedelta(minutes=5)
-            ).exists()
-            
-            if notificacion_existente:
-                print(f"⚠️ Notificación duplicada detectada y evitada: {titulo}")
-                return None
-        
         # Determinar prioridad según el tipo de notificación
         prioridad_map = {
             'reserva_creada': 'alta',
@@ -466,8 +475,9 @@ def notificar_accion_admin(tipo, titulo, mensaje, usuario_admin=None, usuario_re
         
         prioridad = prioridad_map.get(tipo, 'media')
         
-        # CREAR LA NOTIFICACIÓN REAL EN LA BASE DE DATOS
-        notificacion = NotificacionAdmin.objects.create(
+        # Un solo INSERT en la bandeja de salida; el worker crea la NotificacionAdmin
+        # y descarta las aprobaciones o rechazos ya avisados hace poco
+        evento = encolar_notificacion_admin(
             tipo=tipo,
             titulo=titulo,
             mensaje=mensaje,
@@ -475,17 +485,13 @@ def notificar_accion_admin(tipo, titulo, mensaje, usuario_admin=None, usuario_re
             usuario_relacionado=usuario_relacionado,
             reserva=reserva,
             espacio=espacio,
-            leida=False
+            ip_address=get_client_ip(request) if request else None,
+            user_agent=request.META.get('HTTP_USER_AGENT', '') if request else None,
+            evitar_duplicado=bool(reserva) and tipo in ['reserva_aprobada', 'reserva_rechazada']
         )
         
-        # Agregar información de la solicitud si está disponible
-        if request:
-            notificacion.ip_address = get_client_ip(request)
-            notificacion.user_agent = request.META.get('HTTP_USER_AGENT', '')
-            notificacion.save()
-        
-        print(f"✅ NOTIFICACIÓN ADMIN CREADA: ID {notificacion.id} - {titulo}")
-        return notificacion
+        print(f"✅ NOTIFICACIÓN ADMIN ENCOLADA: evento {evento.id} - {titulo}")
+        return evento.id
         
     except Exception as e:
         print(f"❌ ERROR CREANDO NOTIFICACIÓN ADMIN: {str(e)}")
@@ -504,14 +510,8 @@ def get_client_ip(request):
 
 
 # === RECUPERACIÓN DE CONTRASEÑA ===
-def _generate_temp_password(length=12):
-    """Genera una contraseña temporal aleatoria"""
-    import string, random
-    chars = string.ascii_letters + string.digits
-    return ''.join(random.choice(chars) for _ in range(length))
-
-
 @csrf_exempt
+@limitar_intentos('recuperar_password')
 def forgot_password_request_view(request):
     """Muestra formulario para solicitar recuperación - Versión PROYECTO"""
     if request.method == 'GET':
@@ -561,12 +561,8 @@ def forgot_password_request_view(request):
                 except PerfilUsuario.DoesNotExist:
                     print(f"⚠️ Usuario {user.username} no tiene perfil, pero continuamos")
                 
-                # Generar contraseña temporal
-                temp_password = _generate_temp_password(8)
-                print(f"🔑 Contraseña generada: {temp_password}")
-                
-                # Crear OTP
-                otp = OneTimePassword.create_for_user(user, temp_password, ttl_minutes=60)
+                # Crear OTP (invalida los anteriores del usuario)
+                otp, temp_password = OneTimePassword.create_for_user(user, ttl_minutes=60)
                 print(f"📝 OTP creado - ID: {otp.id}, Expira: {otp.expires_at}")
                 
                 # Enlace de reset
@@ -647,6 +643,7 @@ def reset_password_view(request, uidb64, token):
 
 
 @csrf_exempt
+@limitar_intentos('reset_otp')
 def reset_via_otp_view(request):
     """Permite restablecer contraseña usando OTP"""
     print(f"🔄 RESET OTP: Método {request.method}")
@@ -703,37 +700,16 @@ def reset_via_otp_view(request):
                         'message': 'Esta cuenta está desactivada'
                     }, status=400)
                 
-                # Buscar OTPs válidos
-                otp_qs = OneTimePassword.objects.filter(
-                    user=user, 
-                    used=False,
-                    expires_at__gte=timezone.now()
-                ).order_by('-created_at')
+                # Un solo OTP posible: el del selector (primeros caracteres del token)
+                valid_otp = OneTimePassword.verificar(user, temp_password)
                 
-                print(f"🔍 Buscando OTPs válidos. Encontrados: {otp_qs.count()}")
-                
-                if not otp_qs.exists():
-                    print("❌ No hay OTPs válidos")
+                if not valid_otp or not valid_otp.mark_used():
+                    print("❌ OTP inválido, expirado o ya usado")
                     return JsonResponse({
                         'success': False, 
                         'message': 'Contraseña temporal inválida o expirada'
                     }, status=400)
-                
-                # Verificar cada OTP
-                valid_otp = None
-                for otp in otp_qs:
-                    print(f"🔑 Verificando OTP ID {otp.id}...")
-                    if otp.check_token(temp_password):
-                        valid_otp = otp
-                        print(f"✅ OTP válido encontrado: ID {otp.id}")
-                        break
-                
-                if not valid_otp:
-                    print("❌ Ningún OTP coincide")
-                    return JsonResponse({
-                        'success': False, 
-                        'message': 'Contraseña temporal incorrecta'
-                    }, status=400)
+                print(f"✅ OTP válido marcado como usado: ID {valid_otp.id}")
                 
                 print(f"📝 Cambiando contraseña para {user.username}")
                 
@@ -741,11 +717,6 @@ def reset_via_otp_view(request):
                 user.set_password(new_password)
                 user.save()
                 
-                # Marcar OTP como usado
-                valid_otp.used = True
-                valid_otp.save()
-                print(f"✅ OTP marcado como usado: ID {valid_otp.id}")
-                
                 # Crear notificación
                 Notificacion.objects.create(
                     destinatario=user,
@@ -786,12 +757,13 @@ def reset_via_otp_view(request):
 
 # --- Vista de Login Modificada y Corregida ---
 @csrf_exempt
+@limitar_intentos('login')
 def login_view(request):
     if request.method == 'GET':
         if request.user.is_authenticated:
             # Si ya está autenticado, redirigir según su rol
             try:
-                perfil = PerfilUsuario.objects.get(user=request.user)
+                perfil = request.user.perfilusuario
                 if perfil.rol in ['Administrativo', 'Investigacion', 'Aprobador', 'SuperAdmin']:
                     return redirect('admin_dashboard')
                 else:
@@ -820,7 +792,7 @@ def login_view(request):
             
             if user is not None and user.is_active:
                 try:
-                    perfil = PerfilUsuario.objects.get(user=user)
+                    perfil = user.perfilusuario
                     print(f"👤 Perfil encontrado: {perfil.rol}")
                     
                     # 🔑 VERIFICACIÓN CORREGIDA DE ACCESO - ACTUALIZADA
@@ -867,7 +839,7 @@ def login_view(request):
                                 usuario_admin=user,
                                 request=request
                             )
-                            print(f"📢 Notificación admin creada para login de {user.username}")
+                            print(f"📢 Notificación admin encolada para login de {user.username}")
                         except Exception as admin_notif_error:
                             print(f"⚠️ Error en notificación admin login: {admin_notif_error}")
 
@@ -977,7 +949,7 @@ def registrar_usuario_automatico(email, password, rol='Usuario'):
 def dashboard_view(request):
     """Dashboard SOLO para usuarios normales (no administradores)"""
     try:
-        perfil = PerfilUsuario.objects.get(user=request.user)
+        perfil = request.user.perfilusuario
         print(f"🎯 Usuario {request.user.username} accediendo a dashboard. Rol: {perfil.rol}")
         
         # Verificar que NO es administrador (seguridad adicional)
@@ -1043,31 +1015,8 @@ def reservas_view(request):
 @login_required
 @es_usuario_normal() 
 def calendario_view(request):
-    """Vista del calendario con eventos REALES"""
+    """Vista del calendario; los eventos se cargan desde calendario_eventos_api por rango visible"""
     try:
-        # Obtener TODAS las reservas APROBADAS para que todos los usuarios las vean
-        reservas_calendario = Reserva.objects.filter(
-            estado='Aprobada'
-        ).select_related('espacio', 'solicitante')
-        
-        eventos_calendario = []
-        for reserva in reservas_calendario:
-            eventos_calendario.append({
-                'title': f"{reserva.espacio.nombre}",
-                'start': f"{reserva.fecha_reserva}T{reserva.hora_inicio}",
-                'end': f"{reserva.fecha_reserva}T{reserva.hora_fin}",
-                'color': '#10b981',
-                'extendedProps': {
-                    'estado': reserva.estado,
-                    'espacio_id': reserva.espacio.id,
-                    'espacio_nombre': reserva.espacio.nombre,
-                    'solicitante': reserva.solicitante.username,
-                    'proposito': reserva.proposito,
-                    'hora_inicio': reserva.hora_inicio.strftime('%H:%M'),
-                    'hora_fin': reserva.hora_fin.strftime('%H:%M')
-                }
-            })
-        
         # Obtener espacios para el filtro
         espacios = Espacio.objects.filter(estado='Disponible')
         
@@ -1076,7 +1025,6 @@ def calendario_view(request):
         
         context = {
             'user': request.user,
-            'eventos': eventos_calendario,
             'espacios': espacios,
             'current_month': current_month
         }
@@ -1085,11 +1033,169 @@ def calendario_view(request):
     except Exception as e:
         print(f"Error en calendario_view: {e}")
         return render(request, 'reservas/calendario.html', {
-            'eventos': [],
             'espacios': [],
             'current_month': timezone.now().strftime('%Y-%m')
         })
 
+MAX_DIAS_CALENDARIO = 62  # la vista mensual de FullCalendar pide 6 semanas
+
+@login_required
+@es_usuario_normal()
+@require_http_methods(["GET"])
+def calendario_eventos_api(request):
+    """
+    Reservas aprobadas entre start (inclusive) y end (exclusivo) en el formato de
+    eventos de FullCalendar, opcionalmente de un solo espacio.
+    
+    Parámetros GET: start y end (YYYY-MM-DD o fecha ISO con hora, como los envía
+    FullCalendar) y espacio. La respuesta se genera por partes mientras se leen
+    las reservas, sin armar la lista completa en memoria. Soporta If-None-Match
+    con la versión de los días del rango (no lee reservas si no hubo cambios).
+    """
+    try:
+        desde = date.fromisoformat(request.GET.get('start', '')[:10])
+        hasta = date.fromisoformat(request.GET.get('end', '')[:10])
+    except ValueError:
+        return JsonResponse({'success': False, 'error': 'start y end deben ser fechas (YYYY-MM-DD)'}, status=400)
+    
+    if hasta <= desde:
+        return JsonResponse({'success': False, 'error': 'end debe ser posterior a start'}, status=400)
+    if (hasta - desde).days > MAX_DIAS_CALENDARIO:
+        return JsonResponse({'success': False, 'error': f'El rango máximo es de {MAX_DIAS_CALENDARIO} días'}, status=400)
+    
+    reservas = Reserva.objects.filter(
+        estado='Aprobada',
+        fecha_reserva__gte=desde,
+        fecha_reserva__lt=hasta
+    )
+    espacio_id = request.GET.get('espacio', '').strip()
+    if espacio_id:
+        if not espacio_id.isdigit():
+            return JsonResponse({'success': False, 'error': 'espacio debe ser un número'}, status=400)
+        reservas = reservas.filter(espacio_id=int(espacio_id))
+    
+    etag = version_rango(desde, hasta - timedelta(days=1), [int(espacio_id)] if espacio_id else None)
+    response = get_conditional_response(request, etag=etag)
+    if response is not None:
+        response['ETag'] = etag
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
+    
+    reservas = reservas.select_related('espacio', 'solicitante').only(
+        'fecha_reserva', 'hora_inicio', 'hora_fin', 'proposito', 'estado',
+        'espacio__id', 'espacio__nombre', 'solicitante__username'
+    ).order_by('fecha_reserva', 'hora_inicio', 'id')
+    
+    def eventos():
+        yield '['
+        separador = ''
+        for reserva in reservas.iterator(chunk_size=500):
+            yield separador + json.dumps({
+                'title': reserva.espacio.nombre,
+                'start': f"{reserva.fecha_reserva}T{reserva.hora_inicio}",
+                'end': f"{reserva.fecha_reserva}T{reserva.hora_fin}",
+                'color': '#10b981',
+                'extendedProps': {
+                    'estado': reserva.estado,
+                    'espacio_id': reserva.espacio.id,
+                    'espacio_nombre': reserva.espacio.nombre,
+                    'solicitante': reserva.solicitante.username,
+                    'proposito': reserva.proposito,
+                    'hora_inicio': reserva.hora_inicio.strftime('%H:%M'),
+                    'hora_fin': reserva.hora_fin.strftime('%H:%M')
+                }
+            })
+            separador = ','
+        yield ']'
+    
+    response = StreamingHttpResponse(eventos(), content_type='application/json')
+    response['ETag'] = etag
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+def _respuesta_ics(request, etag, ultimo_cambio, generar_partes, nombre_archivo):
+    """
+    Respuesta condicional de un feed iCalendar: 304 si el cliente ya lo tiene,
+    el texto guardado en caché para esta versión, o el feed generado por partes.
+    """
+    ultimo = int(ultimo_cambio.timestamp()) if ultimo_cambio else None
+    response = get_conditional_response(request, etag=etag, last_modified=ultimo)
+    if response is None:
+        clave = 'ics:' + etag.strip('"')
+        guardado = cache.get(clave)
+        if guardado is not None:
+            response = HttpResponse(guardado, content_type='text/calendar; charset=utf-8')
+        else:
+            response = StreamingHttpResponse(
+                generar_y_guardar(generar_partes(), clave),
+                content_type='text/calendar; charset=utf-8'
+            )
+        response['Content-Disposition'] = f'inline; filename="{nombre_archivo}"'
+    response['ETag'] = etag
+    if ultimo:
+        response['Last-Modified'] = http_date(ultimo)
+    patch_cache_control(response, private=True, max_age=300)
+    return response
+
+@require_http_methods(["GET", "HEAD"])
+def ics_espacio(request, espacio_id):
+    """Feed iCalendar con las reservas aprobadas de un espacio (?token= de cualquier usuario activo)."""
+    if usuario_por_token(request.GET.get('token')) is None:
+        return HttpResponse('Token de calendario inválido', status=403, content_type='text/plain; charset=utf-8')
+    espacio = get_object_or_404(Espacio.objects.only('id', 'nombre'), id=espacio_id)
+    
+    desde, hasta = ventana_feed()
+    etag, ultimo_cambio = version_feed_espacio(espacio, desde, hasta)
+    return _respuesta_ics(
+        request, etag, ultimo_cambio,
+        lambda: generar_ics(reservas_feed_espacio(espacio, desde, hasta), f'Reservas {espacio.nombre}', request.get_host()),
+        f'espacio-{espacio.id}.ics'
+    )
+
+@require_http_methods(["GET", "HEAD"])
+def ics_usuario(request, token):
+    """Feed iCalendar con las reservas aprobadas y pendientes del dueño del token."""
+    usuario = usuario_por_token(token)
+    if usuario is None:
+        return HttpResponse('Calendario no encontrado', status=404, content_type='text/plain; charset=utf-8')
+    
+    desde, hasta = ventana_feed()
+    etag, ultimo_cambio = version_feed_usuario(usuario, desde, hasta)
+    return _respuesta_ics(
+        request, etag, ultimo_cambio,
+        lambda: generar_ics(reservas_feed_usuario(usuario, desde, hasta), f'Mis reservas ({usuario.username})', request.get_host()),
+        'mis-reservas.ics'
+    )
+
+@login_required
+@require_http_methods(["GET", "POST"])
+def suscripcion_calendario_api(request):
+    """
+    URLs de suscripción iCalendar del usuario.
+    
+    GET crea el token si aún no existe; POST lo regenera (las URLs anteriores
+    dejan de funcionar). Con ?espacio=<id> incluye también la URL de ese espacio.
+    """
+    try:
+        perfil = request.user.perfilusuario
+    except PerfilUsuario.DoesNotExist:
+        return JsonResponse({'success': False, 'error': 'Usuario sin perfil'}, status=403)
+    
+    token = perfil.token_calendario
+    if request.method == 'POST' or not token:
+        token = perfil.regenerar_token_calendario()
+    
+    data = {
+        'success': True,
+        'url_usuario': request.build_absolute_uri(reverse('ics_usuario', args=[token])),
+    }
+    espacio_id = request.GET.get('espacio', '').strip()
+    if espacio_id.isdigit():
+        data['url_espacio'] = request.build_absolute_uri(
+            reverse('ics_espacio', args=[int(espacio_id)]) + f'?token={token}'
+        )
+    return JsonResponse(data)
+
 # --- Vistas de API ---
 @login_required
 @es_usuario_normal()
@@ -1138,6 +1244,156 @@ def get_espacios_disponibles(request):
         traceback.print_exc()
         return JsonResponse({'success': False, 'error': str(e)})
 
+@login_required
+@require_http_methods(["GET"])
+def disponibilidad_espacios_api(request):
+    """
+    Intervalos libres de varios espacios para cada día de un rango.
+    
+    Parámetros GET: desde, hasta (YYYY-MM-DD) y espacio_ids (lista separada por comas;
+    si se omite se consultan todos los espacios disponibles). Soporta If-None-Match:
+    el ETag combina la versión de los días del rango con los horarios y buffers
+    de los espacios, así un 304 no lee reservas ni mantenimientos.
+    """
+    try:
+        desde = datetime.strptime(request.GET.get('desde') or date.today().isoformat(), '%Y-%m-%d').date()
+        hasta = datetime.strptime(request.GET.get('hasta') or desde.isoformat(), '%Y-%m-%d').date()
+    except ValueError:
+        return JsonResponse({'success': False, 'error': 'Formato de fecha inválido (use YYYY-MM-DD)'}, status=400)
+    
+    if hasta < desde:
+        return JsonResponse({'success': False, 'error': 'La fecha hasta debe ser posterior o igual a desde'}, status=400)
+    if (hasta - desde).days + 1 > MAX_DIAS_DISPONIBILIDAD:
+        return JsonResponse({
+            'success': False,
+            'error': f'El rango máximo es de {MAX_DIAS_DISPONIBILIDAD} días'
+        }, status=400)
+    
+    espacios = Espacio.objects.filter(estado='Disponible')
+    espacio_ids = request.GET.get('espacio_ids', '').strip()
+    if espacio_ids:
+        try:
+            espacios = Espacio.objects.filter(id__in=[int(e) for e in espacio_ids.split(',') if e.strip()])
+        except ValueError:
+            return JsonResponse({'success': False, 'error': 'espacio_ids debe ser una lista de números'}, status=400)
+    
+    try:
+        espacios = list(espacios.order_by('id').values('id', 'nombre'))
+        ids = [e['id'] for e in espacios]
+        horarios = cargar_horarios(ids, hasta)
+        margenes = margenes_de_espacios(ids)
+        
+        # 304 si no cambió nada de lo que usa calcular_intervalos_libres
+        etag = '"%s"' % hashlib.md5(repr((
+            version_rango(desde, hasta, ids),
+            espacios,
+            sorted(margenes.items()),
+            sorted(horarios.items()),
+        )).encode()).hexdigest()
+        response = get_conditional_response(request, etag=etag)
+        if response is not None:
+            response['ETag'] = etag
+            patch_cache_control(response, private=True, no_cache=True)
+            return response
+        
+        intervalos = calcular_intervalos_libres(ids, desde, hasta, margenes, horarios)
+        
+        data = []
+        for espacio in espacios:
+            dias = []
+            for fecha, dia in intervalos[espacio['id']].items():
+                dias.append({
+                    'fecha': fecha.isoformat(),
+                    'en_mantenimiento': dia['en_mantenimiento'],
+                    'apertura': dia['apertura'].strftime('%H:%M'),
+                    'cierre': dia['cierre'].strftime('%H:%M'),
+                    'libres': [
+                        {'inicio': inicio.strftime('%H:%M'), 'fin': fin.strftime('%H:%M')}
+                        for inicio, fin in dia['libres']
+                    ]
+                })
+            data.append({'id': espacio['id'], 'nombre': espacio['nombre'], 'dias': dias})
+        
+        contenido = json.dumps({
+            'success': True,
+            'desde': desde.isoformat(),
+            'hasta': hasta.isoformat(),
+            'espacios': data
+        })
+        response = HttpResponse(contenido, content_type='application/json')
+        response['ETag'] = etag
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
+    except Exception as e:
+        print(f"❌ Error en disponibilidad_espacios_api: {e}")
+        traceback.print_exc()
+        return JsonResponse({'success': False, 'error': str(e)}, status=500)
+
+@login_required
+@require_http_methods(["GET"])
+def buscar_espacios_api(request):
+    """
+    Buscador de espacios libres en una fecha y ventana horaria.
+    
+    Parámetros GET: fecha (YYYY-MM-DD), hora_inicio y hora_fin (HH:MM), y opcionales
+    capacidad, tipo, edificio, piso, equipamiento (tipos separados por comas) y limite.
+    """
+    try:
+        fecha = datetime.strptime(request.GET.get('fecha', ''), '%Y-%m-%d').date()
+    except ValueError:
+        return JsonResponse({'success': False, 'error': 'Formato de fecha inválido (use YYYY-MM-DD)'}, status=400)
+    try:
+        hora_inicio = datetime.strptime(request.GET.get('hora_inicio', ''), '%H:%M').time()
+        hora_fin = datetime.strptime(request.GET.get('hora_fin', ''), '%H:%M').time()
+    except ValueError:
+        return JsonResponse({'success': False, 'error': 'Formato de hora inválido. Use HH:MM (24 horas)'}, status=400)
+    
+    valido, mensaje = validar_duracion_reserva(hora_inicio, hora_fin)
+    if not valido:
+        return JsonResponse({'success': False, 'error': mensaje}, status=400)
+    
+    try:
+        capacidad = int(request.GET['capacidad']) if request.GET.get('capacidad') else None
+        piso = int(request.GET['piso']) if request.GET.get('piso') else None
+        limite = min(int(request.GET.get('limite') or 50), 200)
+    except ValueError:
+        return JsonResponse({'success': False, 'error': 'capacidad, piso y limite deben ser números'}, status=400)
+    
+    tipos_equipo = [t.strip() for t in request.GET.get('equipamiento', '').split(',') if t.strip()]
+    
+    try:
+        espacios = buscar_espacios_libres(
+            fecha, hora_inicio, hora_fin,
+            capacidad_minima=capacidad,
+            tipo=request.GET.get('tipo') or None,
+            edificio=request.GET.get('edificio') or None,
+            piso=piso,
+            tipos_equipo=tipos_equipo
+        )[:limite]
+        
+        data = []
+        for espacio in espacios:
+            data.append({
+                'id': espacio.id,
+                'nombre': espacio.nombre,
+                'tipo': espacio.tipo,
+                'edificio': espacio.edificio,
+                'piso': espacio.piso,
+                'capacidad': espacio.capacidad,
+                'holgura': espacio.holgura,
+                'minutos_antes': espacio.buffer_antes,
+                'minutos_despues': espacio.buffer_despues,
+                'equipamientos': [
+                    {'nombre': e.nombre_equipo, 'tipo': e.tipo_equipo}
+                    for e in espacio.equipamientos.all()
+                ]
+            })
+        return JsonResponse({'success': True, 'total': len(data), 'espacios': data})
+    except Exception as e:
+        print(f"❌ Error en buscar_espacios_api: {e}")
+        traceback.print_exc()
+        return JsonResponse({'success': False, 'error': str(e)}, status=500)
+
 @login_required
 @es_usuario_normal()
 def get_notificaciones(request):
@@ -1187,7 +1443,7 @@ def reportar_incidencia(request):
                     usuario_relacionado=request.user,
                     request=request
                 )
-                print(f"📢 Notificación admin creada para incidencia {incidencia.id}")
+                print(f"📢 Notificación admin encolada para incidencia {incidencia.id}")
             except Exception as admin_notif_error:
                 print(f"⚠️ Error en notificación admin incidencia: {admin_notif_error}")
                 
@@ -1307,7 +1563,7 @@ def registro_usuario(request):
 def editar_usuario_view(request):
     """Vista para editar usuario (template)"""
     try:
-        perfil = PerfilUsuario.objects.get(user=request.user)
+        perfil = request.user.perfilusuario
         if perfil.rol not in ['Administrativo', 'Investigacion', 'Aprobador']:
             return redirect('dashboard')
         
@@ -1319,7 +1575,7 @@ def editar_usuario_view(request):
 @es_admin()
 def get_dashboard_stats(request):
     try:
-        perfil = PerfilUsuario.objects.get(user=request.user)
+        perfil = request.user.perfilusuario
         stats = {}
 
         # ACTUALIZADO: Roles de administración
@@ -1344,10 +1600,7 @@ def get_dashboard_stats(request):
                 solicitante=request.user
             ).count()
 
-        stats['notificaciones_sin_leer'] = Notificacion.objects.filter(
-            destinatario=request.user,
-            leida=False
-        ).count()
+        stats['notificaciones_sin_leer'] = no_leidas_usuario(request.user)
 
         return JsonResponse({'success': True, 'stats': stats})
 
@@ -1364,7 +1617,7 @@ def logout_view(request):
     # 🔔 NOTIFICAR LOGOUT DE ADMINISTRADOR
     if request.user.is_authenticated:
         try:
-            perfil = PerfilUsuario.objects.get(user=request.user)
+            perfil = request.user.perfilusuario
             if perfil.rol in ['Administrativo', 'Investigacion', 'Aprobador']:
                 notificar_accion_admin(
                     tipo='sesion_cerrada',
@@ -1373,7 +1626,7 @@ def logout_view(request):
                     usuario_admin=request.user,
                     request=request
                 )
-                print(f"📢 Notificación admin creada para logout de {request.user.username}")
+                print(f"📢 Notificación admin encolada para logout de {request.user.username}")
         except Exception as admin_notif_error:
             print(f"⚠️ Error en notificación admin logout: {admin_notif_error}")
         except PerfilUsuario.DoesNotExist:
@@ -1526,7 +1779,7 @@ def cancelar_reserva_view(request):
 def admin_dashboard_view(request):
     """Dashboard EXCLUSIVO para administradores"""
     try:
-        perfil = PerfilUsuario.objects.get(user=request.user)
+        perfil = request.user.perfilusuario
         print(f"👑 Admin {request.user.username} accediendo a admin_dashboard. Rol: {perfil.rol}")
         
         # Verificar que ES administrador
@@ -1544,13 +1797,10 @@ def admin_dashboard_view(request):
         reservas_recientes = Reserva.objects.select_related('solicitante', 'espacio').order_by('-fecha_solicitud')[:5]
         
         # Notificaciones sin leer
-        notificaciones_sin_leer = Notificacion.objects.filter(
-            destinatario=request.user,
-            leida=False
-        ).count()
+        notificaciones_sin_leer = no_leidas_usuario(request.user)
         
         # Notificaciones admin sin leer
-        notificaciones_admin_sin_leer = NotificacionAdmin.objects.filter(leida=False).count()
+        notificaciones_admin_sin_leer = no_leidas_admin(request.user)
         
         context = {
             'user': request.user,
@@ -1583,7 +1833,7 @@ def admin_dashboard_view(request):
 def solicitudes_pendientes_view(request):
     """Vista de solicitudes pendientes para administradores - CON DATOS REALES"""
     try:
-        perfil = PerfilUsuario.objects.get(user=request.user)
+        perfil = request.user.perfilusuario
         if perfil.rol not in ['Administrativo', 'Investigacion', 'Aprobador']:
             return redirect('dashboard')
         
@@ -1603,7 +1853,7 @@ def solicitudes_pendientes_view(request):
 def gestion_espacios_view(request):
     """Vista de gestión de espacios para administradores - CON DATOS REALES"""
     try:
-        perfil = PerfilUsuario.objects.get(user=request.user)
+        perfil = request.user.perfilusuario
         if perfil.rol not in ['Administrativo', 'Investigacion', 'Aprobador']:
             return redirect('dashboard')
         
@@ -1623,7 +1873,7 @@ def gestion_espacios_view(request):
 def gestion_usuarios_view(request):
     """Vista de gestión de usuarios para administradores - CON DATOS REALES"""
     try:
-        perfil = PerfilUsuario.objects.get(user=request.user)
+        perfil = request.user.perfilusuario
         if perfil.rol not in ['Administrativo', 'Investigacion', 'Aprobador']:
             return redirect('dashboard')
         
@@ -1644,7 +1894,7 @@ def gestion_usuarios_view(request):
 def crear_usuario_view(request):
     """Vista para que administradores creen usuarios desde una interfaz separada"""
     try:
-        perfil = PerfilUsuario.objects.get(user=request.user)
+        perfil = request.user.perfilusuario
         if perfil.rol not in ['Administrativo', 'Investigacion', 'Aprobador', 'SuperAdmin']:
             return redirect('dashboard')
 
@@ -1677,17 +1927,6 @@ def crear_reserva_api(request):
                         'message': f'El campo {field} es requerido'
                     }, status=400)
 
-            # Verificar que el espacio existe
-            try:
-                espacio = Espacio.objects.get(id=data['espacio_id'])
-                print(f"🏢 Espacio encontrado: {espacio.nombre}")
-            except Espacio.DoesNotExist:
-                print(f"❌ Espacio no encontrado: ID {data['espacio_id']}")
-                return JsonResponse({
-                    'success': False,
-                    'message': 'El espacio seleccionado no existe'
-                }, status=400)
-
             # ======== VALIDACIONES DE FECHA Y HORA ========
             
             # Convertir fecha string a objeto date
@@ -1725,67 +1964,61 @@ def crear_reserva_api(request):
                         'message': 'No se pueden hacer reservas para horas pasadas'
                     }, status=400)
             
-            # ======== VALIDACIONES DE CAPACIDAD ========
-            
-            # Validar número de asistentes vs capacidad
+            # Validar número de asistentes
             if int(data['num_asistentes']) <= 0:
                 return JsonResponse({
                     'success': False,
                     'message': 'El número de asistentes debe ser mayor a 0'
                 }, status=400)
             
-            if int(data['num_asistentes']) > espacio.capacidad:
-                return JsonResponse({
-                    'success': False,
-                    'message': f'El espacio "{espacio.nombre}" solo tiene capacidad para {espacio.capacidad} personas'
-                }, status=400)
+            # ======== REGLAS DE NEGOCIO (UNA SOLA CONSULTA) ========
             
-            # ======== VALIDACIONES USANDO UTILS ========
-            
-            # Validar disponibilidad usando la función CORREGIDA
-            disponible, mensaje = validar_disponibilidad_espacio(
-                espacio_id=data['espacio_id'],
-                fecha=fecha_reserva,
-                hora_inicio=hora_inicio,
-                hora_fin=hora_fin
+            # Espacio, capacidad, solapamiento, mantenimiento, horario, anticipación y límite diario
+            espacio, regla, mensaje = validar_reserva(
+                data['espacio_id'], fecha_reserva, hora_inicio, hora_fin,
+                int(data['num_asistentes']), request.user
             )
             
-            if not disponible:
-                return JsonResponse({
-                    'success': False,
-                    'message': mensaje
-                }, status=400)
+            if regla:
+                print(f"❌ CREAR_RESERVA_API: Regla {regla} - {mensaje}")
+                respuesta = {'success': False, 'message': mensaje}
+                if regla in REGLAS_DISPONIBILIDAD:
+                    respuesta['sugerencias'] = sugerir_horarios(espacio, fecha_reserva, hora_inicio, hora_fin, int(data['num_asistentes']))
+                return JsonResponse(respuesta, status=400)
             
-            # Validar anticipación (mínimo 2 horas)
-            valido_anticipacion, msg_anticipacion = validar_anticipacion_reserva(fecha_reserva, hora_inicio)
-            if not valido_anticipacion:
-                return JsonResponse({
-                    'success': False,
-                    'message': msg_anticipacion
-                }, status=400)
+            # ======== CREACIÓN DE LA RESERVA ========
             
-            # Validar límite de reservas por usuario por día
-            valido_limite, msg_limite = validar_limite_reservas_usuario(request.user, fecha_reserva)
-            if not valido_limite:
+            # Crear la reserva REAL. La restricción de exclusión de la BD resuelve
+            # las solicitudes concurrentes que pasaron la validación al mismo tiempo
+            try:
+                with transaction.atomic():
+                    reserva = Reserva.objects.create(
+                        espacio=espacio,
+                        solicitante=request.user,
+                        fecha_reserva=fecha_reserva,
+                        hora_inicio=hora_inicio,
+                        hora_fin=hora_fin,
+                        proposito=data['proposito'],
+                        num_asistentes=int(data['num_asistentes']),
+                        estado='Pendiente'
+                    )
+            except (IntegrityError, OperationalError) as e:
+                if not es_error_solapamiento(e):
+                    raise
+                print(f"⚠️ CREAR_RESERVA_API: Solapamiento detectado por la BD - {data}")
+                disponible, mensaje = validar_disponibilidad_espacio(
+                    espacio_id=data['espacio_id'],
+                    fecha=fecha_reserva,
+                    hora_inicio=hora_inicio,
+                    hora_fin=hora_fin,
+                    usar_indice=False
+                )
                 return JsonResponse({
                     'success': False,
-                    'message': msg_limite
+                    'message': mensaje if not disponible else 'El horario seleccionado acaba de ser reservado por otro usuario',
+                    'sugerencias': sugerir_horarios(espacio, fecha_reserva, hora_inicio, hora_fin, int(data['num_asistentes']))
                 }, status=400)
             
-            # ======== CREACIÓN DE LA RESERVA ========
-            
-            # Crear la reserva REAL
-            reserva = Reserva.objects.create(
-                espacio=espacio,
-                solicitante=request.user,
-                fecha_reserva=fecha_reserva,
-                hora_inicio=hora_inicio,
-                hora_fin=hora_fin,
-                proposito=data['proposito'],
-                num_asistentes=int(data['num_asistentes']),
-                estado='Pendiente'
-            )
-            
             print(f"🎯 CREAR_RESERVA_API: Reserva REAL creada - ID {reserva.id}")
 
             # 🔔 NOTIFICAR A ADMINISTRADORES - ESTA PARTE DEBE EJECUTARSE
@@ -1805,10 +2038,11 @@ def crear_reserva_api(request):
                 # No fallar la reserva por error en notificación
             
             # NOTIFICAR AL USUARIO
+            evento_id = None
             try:
-                notificacion = NotificacionService.notificar_creacion_reserva(reserva)
-                if notificacion:
-                    print(f"📧 Notificación de creación enviada exitosamente: {notificacion.id}")
+                evento_id = NotificacionService.notificar_creacion_reserva(reserva)
+                if evento_id:
+                    print(f"📧 Notificación de creación encolada: evento {evento_id}")
                 else:
                     print("⚠️ No se pudo crear la notificación de creación")
             except Exception as notif_error:
@@ -1819,7 +2053,7 @@ def crear_reserva_api(request):
                 'success': True,
                 'message': 'Reserva creada exitosamente',
                 'reserva_id': reserva.id,
-                'notificacion_creada': True,
+                'notificacion_encolada': evento_id is not None,
                 'redirect_url': f'/reserva-exitosa/?reserva_id={reserva.id}'
             })
 
@@ -1850,7 +2084,7 @@ def crear_reserva_api(request):
 def cambiar_rango_admin_api(request, user_id):
     """Permite a SuperAdmin cambiar el rol de un admin (cambiar rango)."""
     try:
-        perfil_admin = PerfilUsuario.objects.get(user=request.user)
+        perfil_admin = request.user.perfilusuario
         if perfil_admin.rol != 'SuperAdmin':
             return JsonResponse({'success': False, 'error': 'No autorizado'}, status=403)
 
@@ -1892,7 +2126,7 @@ def crear_usuario_api(request):
     """API para que administradores creen usuarios desde el frontend"""
     try:
         # Verificar permisos de administrador
-        perfil = PerfilUsuario.objects.get(user=request.user)
+        perfil = request.user.perfilusuario
         if perfil.rol not in ['Administrativo', 'Investigación', 'Aprobador', 'SuperAdmin']:
             return JsonResponse({'success': False, 'error': 'No tienes permisos'}, status=403)
 
@@ -1978,7 +2212,7 @@ def crear_usuario_api(request):
 def reportes_view(request):
     """Vista de reportes para administradores - CON DATOS REALES"""
     try:
-        perfil = PerfilUsuario.objects.get(user=request.user)
+        perfil = request.user.perfilusuario
         if perfil.rol not in ['Administrativo', 'Investigacion', 'Aprobador']:
             return redirect('dashboard')
         
@@ -2032,12 +2266,117 @@ def reportes_view(request):
     except PerfilUsuario.DoesNotExist:
         return redirect('login')
 
+MAX_DIAS_REPORTE_USO = 366
+
+def _leer_filtros_uso(request):
+    """
+    desde, hasta (por defecto los últimos 30 días), y los espacios de espacio_ids o tipo.
+    
+    Returns:
+        tuple: (desde, hasta, QuerySet de Espacio, None) o (None, None, None, JsonResponse de error)
+    """
+    try:
+        hasta = datetime.strptime(request.GET.get('hasta') or date.today().isoformat(), '%Y-%m-%d').date()
+        desde = datetime.strptime(request.GET.get('desde') or (hasta - timedelta(days=29)).isoformat(), '%Y-%m-%d').date()
+    except ValueError:
+        return None, None, None, JsonResponse({'success': False, 'error': 'Formato de fecha inválido (use YYYY-MM-DD)'}, status=400)
+    if hasta < desde:
+        return None, None, None, JsonResponse({'success': False, 'error': 'La fecha hasta debe ser posterior o igual a desde'}, status=400)
+    if (hasta - desde).days + 1 > MAX_DIAS_REPORTE_USO:
+        return None, None, None, JsonResponse({'success': False, 'error': f'El rango máximo es de {MAX_DIAS_REPORTE_USO} días'}, status=400)
+    
+    espacios = Espacio.objects.all()
+    espacio_ids = request.GET.get('espacio_ids', '').strip()
+    if espacio_ids:
+        try:
+            espacios = espacios.filter(id__in=[int(e) for e in espacio_ids.split(',') if e.strip()])
+        except ValueError:
+            return None, None, None, JsonResponse({'success': False, 'error': 'espacio_ids debe ser una lista de números'}, status=400)
+    if request.GET.get('tipo'):
+        espacios = espacios.filter(tipo=request.GET['tipo'])
+    return desde, hasta, espacios, None
+
+@login_required
+@es_admin()
+@require_http_methods(["GET"])
+def metricas_limites_acceso_api(request):
+    """Intentos permitidos/rechazados por endpoint (este proceso) y baldes vacíos ahora."""
+    return JsonResponse({'success': True, 'metricas': metricas_limites()})
+
+
+@login_required
+@es_admin()
+@require_http_methods(["GET"])
+def mapa_calor_uso_api(request):
+    """
+    Ocupación por día de la semana y hora de los espacios (reservas aprobadas).
+    
+    Parámetros GET: desde, hasta (YYYY-MM-DD), espacio_ids o tipo. Lee la tabla
+    OcupacionHora ya agregada: 168 celdas sin importar cuántas reservas haya.
+    """
+    desde, hasta, espacios, error = _leer_filtros_uso(request)
+    if error:
+        return error
+    
+    espacio_ids = list(espacios.values_list('id', flat=True))
+    celdas = mapa_calor(espacio_ids, desde, hasta)
+    for celda in celdas:
+        celda['dia_semana'] = DIAS_SEMANA_ES[celda['dia'] - 1]
+    return JsonResponse({
+        'success': True,
+        'desde': desde.isoformat(),
+        'hasta': hasta.isoformat(),
+        'total_espacios': len(espacio_ids),
+        'celdas': celdas
+    })
+
+@login_required
+@es_admin()
+@require_http_methods(["GET"])
+def uso_espacios_api(request):
+    """
+    Horas ocupadas y días con uso de cada espacio, de más a menos usado.
+    
+    Parámetros GET: desde, hasta (YYYY-MM-DD), espacio_ids o tipo, y limite.
+    """
+    desde, hasta, espacios, error = _leer_filtros_uso(request)
+    if error:
+        return error
+    try:
+        limite = int(request.GET.get('limite') or 0)
+    except ValueError:
+        return JsonResponse({'success': False, 'error': 'limite debe ser un número'}, status=400)
+    
+    espacios = list(espacios.values('id', 'nombre', 'tipo', 'capacidad'))
+    uso = uso_espacios([e['id'] for e in espacios], desde, hasta)
+    dias_rango = (hasta - desde).days + 1
+    
+    data = []
+    for espacio in espacios:
+        minutos, dias_ocupados = uso.get(espacio['id'], (0, 0))
+        data.append({
+            **espacio,
+            'horas_ocupadas': round(minutos / 60, 2),
+            'dias_ocupados': dias_ocupados,
+            'horas_promedio_dia': round(minutos / 60 / dias_rango, 2),
+        })
+    data.sort(key=lambda e: (-e['horas_ocupadas'], e['id']))
+    if limite > 0:
+        data = data[:limite]
+    
+    return JsonResponse({
+        'success': True,
+        'desde': desde.isoformat(),
+        'hasta': hasta.isoformat(),
+        'espacios': data
+    })
+
 @login_required
 @es_admin()
 def revisar_solicitud_view(request):
     """Vista para revisar una solicitud específica"""
     try:
-        perfil = PerfilUsuario.objects.get(user=request.user)
+        perfil = request.user.perfilusuario
         # ACTUALIZADO: Roles que pueden acceder
         if perfil.rol not in ['Administrativo', 'Investigacion', 'Aprobador']:
             return redirect('dashboard')
@@ -2071,12 +2410,11 @@ def cancelar_reserva_api(request, reserva_id):
                 reserva.save()
                 
                 # Crear notificación al usuario
-                Notificacion.objects.create(
+                encolar_notificacion(
                     destinatario=request.user,
                     tipo='reserva_cancelada',
                     titulo='Reserva Cancelada',
-                    mensaje=f'Tu reserva para {reserva.espacio.nombre} ha sido cancelada.',
-                    leida=False
+                    mensaje=f'Tu reserva para {reserva.espacio.nombre} ha sido cancelada.'
                 )
                 
                 # 🔔 NOTIFICAR A ADMINISTRADORES SOBRE CANCELACIÓN
@@ -2089,7 +2427,7 @@ def cancelar_reserva_api(request, reserva_id):
                         reserva=reserva,
                         request=request
                     )
-                    print(f"📢 Notificación admin creada para cancelación de reserva {reserva.id}")
+                    print(f"📢 Notificación admin encolada para cancelación de reserva {reserva.id}")
                 except Exception as admin_notif_error:
                     print(f"⚠️ Error en notificación admin cancelación: {admin_notif_error}")
                 
@@ -2165,10 +2503,11 @@ def crear_reserva_api2(request):
                 print(f"❌ CREAR_RESERVA_API2: Error en notificación admin: {admin_notif_error}")
             
             # NOTIFICAR AL USUARIO
+            evento_id = None
             try:
-                notificacion = NotificacionService.notificar_creacion_reserva(reserva)
-                if notificacion:
-                    print(f"📧 Notificación de creación enviada exitosamente: {notificacion.id}")
+                evento_id = NotificacionService.notificar_creacion_reserva(reserva)
+                if evento_id:
+                    print(f"📧 Notificación de creación encolada: evento {evento_id}")
                 else:
                     print("⚠️ No se pudo crear la notificación de creación")
             except Exception as notif_error:
@@ -2179,7 +2518,7 @@ def crear_reserva_api2(request):
                 'success': True,
                 'message': 'Reserva creada exitosamente',
                 'reserva_id': reserva.id,
-                'notificacion_creada': True,
+                'notificacion_encolada': evento_id is not None,
                 'redirect_url': f'/reserva-exitosa/?reserva_id={reserva.id}'
             })
 
@@ -2240,7 +2579,7 @@ def aprobar_reserva_api(request, reserva_id):
     if request.method == 'POST':
         try:
             # Verificar que el usuario es administrador - ACTUALIZADO
-            perfil = PerfilUsuario.objects.get(user=request.user)
+            perfil = request.user.perfilusuario
             if perfil.rol not in ['Administrativo', 'Investigacion', 'Aprobador']:
                 return JsonResponse({
                     'success': False, 
@@ -2261,7 +2600,7 @@ def aprobar_reserva_api(request, reserva_id):
             print(f"✅ Reserva {reserva_id} aprobada por {request.user.username}")
             
             # NOTIFICAR AL USUARIO
-            notificacion = NotificacionService.notificar_aprobacion_reserva(
+            evento_id = NotificacionService.notificar_aprobacion_reserva(
                 reserva, 
                 comentario_admin
             )
@@ -2277,7 +2616,7 @@ def aprobar_reserva_api(request, reserva_id):
                     reserva=reserva,
                     request=request
                 )
-                print(f"📢 Notificación admin creada para aprobación de reserva {reserva.id}")
+                print(f"📢 Notificación admin encolada para aprobación de reserva {reserva.id}")
             except Exception as admin_notif_error:
                 print(f"⚠️ Error en notificación admin aprobación: {admin_notif_error}")
             
@@ -2292,7 +2631,7 @@ def aprobar_reserva_api(request, reserva_id):
             return JsonResponse({
                 'success': True, 
                 'message': 'Reserva aprobada exitosamente',
-                'notificacion_creada': notificacion is not None
+                'notificacion_encolada': evento_id is not None
             })
             
         except Reserva.DoesNotExist:
@@ -2309,7 +2648,7 @@ def rechazar_reserva_api(request, reserva_id):
     if request.method == 'POST':
         try:
             # Verificar que el usuario es administrador - ACTUALIZADO
-            perfil = PerfilUsuario.objects.get(user=request.user)
+            perfil = request.user.perfilusuario
             if perfil.rol not in ['Administrativo', 'Investigacion', 'Aprobador']:
                 return JsonResponse({
                     'success': False, 
@@ -2330,7 +2669,7 @@ def rechazar_reserva_api(request, reserva_id):
             print(f"❌ Reserva {reserva_id} rechazada por {request.user.username}")
             
             # NOTIFICAR AL USUARIO
-            notificacion = NotificacionService.notificar_rechazo_reserva(
+            evento_id = NotificacionService.notificar_rechazo_reserva(
                 reserva, 
                 motivo
             )
@@ -2346,7 +2685,7 @@ def rechazar_reserva_api(request, reserva_id):
                     reserva=reserva,
                     request=request
                 )
-                print(f"📢 Notificación admin creada para rechazo de reserva {reserva.id}")
+                print(f"📢 Notificación admin encolada para rechazo de reserva {reserva.id}")
             except Exception as admin_notif_error:
                 print(f"⚠️ Error en notificación admin rechazo: {admin_notif_error}")
             
@@ -2361,7 +2700,7 @@ def rechazar_reserva_api(request, reserva_id):
             return JsonResponse({
                 'success': True, 
                 'message': 'Reserva rechazada exitosamente',
-                'notificacion_creada': notificacion is not None
+                'notificacion_encolada': evento_id is not None
             })
             
         except Reserva.DoesNotExist:
@@ -2370,6 +2709,447 @@ def rechazar_reserva_api(request, reserva_id):
             print(f"❌ Error en rechazar_reserva_api: {e}")
             return JsonResponse({'success': False, 'error': str(e)})
 
+# ========== RESERVAS RECURRENTES (SERIES) ==========
+
+def serie_a_dict(serie, reservas=None):
+    """Representación JSON de una serie y sus ocurrencias"""
+    data = {
+        'id': serie.id,
+        'espacio_id': serie.espacio_id,
+        'espacio': serie.espacio.nombre,
+        'solicitante': serie.solicitante.username,
+        'fecha_inicio': serie.fecha_inicio.isoformat(),
+        'fecha_fin': serie.fecha_fin.isoformat(),
+        'dias_semana': serie.dias_semana,
+        'intervalo_semanas': serie.intervalo_semanas,
+        'excepciones': serie.excepciones,
+        'hora_inicio': serie.hora_inicio.strftime('%H:%M'),
+        'hora_fin': serie.hora_fin.strftime('%H:%M'),
+        'proposito': serie.proposito,
+        'num_asistentes': serie.num_asistentes,
+        'estado': serie.estado,
+    }
+    if reservas is not None:
+        data['ocurrencias'] = [
+            {'id': r.id, 'fecha': r.fecha_reserva.isoformat(), 'estado': r.estado}
+            for r in reservas
+        ]
+    return data
+
+@login_required
+@csrf_exempt
+@es_usuario_normal()
+@require_http_methods(["POST"])
+def crear_serie_api(request):
+    """
+    Crea una reserva recurrente.
+    
+    JSON: espacio_id, fecha_inicio, fecha_fin, dias_semana (0 = lunes), hora_inicio,
+    hora_fin, proposito, num_asistentes y opcionales intervalo_semanas, excepciones,
+    omitir_conflictos (crear solo las fechas libres) y solo_verificar.
+    """
+    try:
+        data = json.loads(request.body)
+        
+        required_fields = ['espacio_id', 'fecha_inicio', 'fecha_fin', 'dias_semana', 'hora_inicio', 'hora_fin', 'proposito', 'num_asistentes']
+        for field in required_fields:
+            if not data.get(field) and data.get(field) != 0:
+                return JsonResponse({
+                    'success': False,
+                    'message': f'El campo {field} es requerido'
+                }, status=400)
+        
+        try:
+            espacio = Espacio.objects.get(id=data['espacio_id'])
+        except Espacio.DoesNotExist:
+            return JsonResponse({
+                'success': False,
+                'message': 'El espacio seleccionado no existe'
+            }, status=400)
+        
+        try:
+            fecha_inicio = datetime.strptime(data['fecha_inicio'], '%Y-%m-%d').date()
+            fecha_fin = datetime.strptime(data['fecha_fin'], '%Y-%m-%d').date()
+            excepciones = [datetime.strptime(f, '%Y-%m-%d').date() for f in data.get('excepciones') or []]
+        except (ValueError, TypeError):
+            return JsonResponse({
+                'success': False,
+                'message': 'Formato de fecha inválido. Use YYYY-MM-DD'
+            }, status=400)
+        
+        try:
+            hora_inicio = datetime.strptime(data['hora_inicio'], '%H:%M').time()
+            hora_fin = datetime.strptime(data['hora_fin'], '%H:%M').time()
+        except ValueError:
+            return JsonResponse({
+                'success': False,
+                'message': 'Formato de hora inválido. Use HH:MM (24 horas)'
+            }, status=400)
+        
+        try:
+            dias_semana = sorted({int(d) for d in data['dias_semana']})
+            intervalo_semanas = int(data.get('intervalo_semanas') or 1)
+            num_asistentes = int(data['num_asistentes'])
+        except (ValueError, TypeError):
+            return JsonResponse({
+                'success': False,
+                'message': 'dias_semana, intervalo_semanas y num_asistentes deben ser números'
+            }, status=400)
+        
+        if not dias_semana or not all(0 <= d <= 6 for d in dias_semana) or intervalo_semanas < 1:
+            return JsonResponse({
+                'success': False,
+                'message': 'Regla de recurrencia inválida'
+            }, status=400)
+        
+        if fecha_inicio < timezone.now().date():
+            return JsonResponse({
+                'success': False,
+                'message': 'No se pueden hacer reservas para fechas pasadas'
+            }, status=400)
+        
+        if fecha_fin < fecha_inicio:
+            return JsonResponse({
+                'success': False,
+                'message': 'La fecha de término debe ser posterior a la de inicio'
+            }, status=400)
+        
+        valido, mensaje = validar_duracion_reserva(hora_inicio, hora_fin)
+        if not valido:
+            return JsonResponse({'success': False, 'message': mensaje}, status=400)
+        
+        if num_asistentes <= 0:
+            return JsonResponse({
+                'success': False,
+                'message': 'El número de asistentes debe ser mayor a 0'
+            }, status=400)
+        
+        if num_asistentes > espacio.capacidad:
+            return JsonResponse({
+                'success': False,
+                'message': f'El espacio "{espacio.nombre}" solo tiene capacidad para {espacio.capacidad} personas'
+            }, status=400)
+        
+        if rango_demasiado_largo(fecha_inicio, fecha_fin, intervalo_semanas, excepciones):
+            return JsonResponse({
+                'success': False,
+                'message': f'Una serie puede tener como máximo {MAX_OCURRENCIAS_SERIE} ocurrencias'
+            }, status=400)
+        
+        fechas = expandir_fechas(
+            fecha_inicio, fecha_fin, dias_semana, intervalo_semanas, excepciones,
+            limite=MAX_OCURRENCIAS_SERIE + 1
+        )
+        
+        # Si hoy es la primera ocurrencia, no puede haber empezado ya
+        if fechas and fechas[0] == timezone.now().date() and hora_inicio < timezone.now().time():
+            fechas = fechas[1:]
+        
+        if not fechas:
+            return JsonResponse({
+                'success': False,
+                'message': 'La regla de recurrencia no genera ninguna fecha'
+            }, status=400)
+        
+        if len(fechas) > MAX_OCURRENCIAS_SERIE:
+            return JsonResponse({
+                'success': False,
+                'message': f'Una serie puede tener como máximo {MAX_OCURRENCIAS_SERIE} ocurrencias'
+            }, status=400)
+        
+        regla = {
+            'fecha_inicio': fecha_inicio,
+            'fecha_fin': fecha_fin,
+            'dias_semana': dias_semana,
+            'intervalo_semanas': intervalo_semanas,
+            'excepciones': [f.isoformat() for f in excepciones],
+        }
+        
+        try:
+            serie, reporte = crear_serie(
+                request.user, espacio, fechas, hora_inicio, hora_fin,
+                data['proposito'], num_asistentes, regla,
+                omitir_conflictos=bool(data.get('omitir_conflictos')),
+                solo_verificar=bool(data.get('solo_verificar'))
+            )
+        except (IntegrityError, OperationalError) as e:
+            if not es_error_solapamiento(e):
+                raise
+            return JsonResponse({
+                'success': False,
+                'message': 'Otra reserva ocupó uno de los horarios mientras se creaba la serie. Intenta nuevamente.'
+            }, status=400)
+        
+        conflictos = sum(1 for r in reporte if not r['disponible'])
+        
+        if serie is None:
+            if data.get('solo_verificar'):
+                return JsonResponse({
+                    'success': True,
+                    'total': len(reporte),
+                    'conflictos': conflictos,
+                    'reporte': reporte
+                })
+            return JsonResponse({
+                'success': False,
+                'message': f'{conflictos} de {len(reporte)} fechas tienen conflictos',
+                'conflictos': conflictos,
+                'reporte': reporte
+            }, status=400)
+        
+        creadas = len(reporte) - conflictos
+        print(f"🎯 CREAR_SERIE_API: Serie {serie.id} creada con {creadas} reservas")
+        
+        NotificacionService.crear_notificacion(
+            destinatario=request.user,
+            tipo='reserva_creada',
+            titulo='📋 Reserva Recurrente Creada',
+            mensaje=f"Tu solicitud de reserva recurrente para {espacio.nombre} ({creadas} fechas, de {hora_inicio.strftime('%H:%M')} a {hora_fin.strftime('%H:%M')}) ha sido recibida y está pendiente de aprobación."
+        )
+        notificar_accion_admin(
+            tipo='reserva_creada',
+            titulo='📋 Nueva Reserva Recurrente',
+            mensaje=f"El usuario {request.user.username} ha creado la serie #{serie.id} para {espacio.nombre}: {creadas} fechas entre {fechas[0]} y {fechas[-1]} de {hora_inicio.strftime('%H:%M')} a {hora_fin.strftime('%H:%M')}. Propósito: {serie.proposito}",
+            usuario_relacionado=request.user,
+            espacio=espacio,
+            request=request
+        )
+        
+        return JsonResponse({
+            'success': True,
+            'message': 'Reserva recurrente creada exitosamente',
+            'serie_id': serie.id,
+            'creadas': creadas,
+            'conflictos': conflictos,
+            'reporte': reporte
+        })
+    
+    except json.JSONDecodeError:
+        return JsonResponse({
+            'success': False,
+            'message': 'Error en el formato JSON de la solicitud'
+        }, status=400)
+    except Exception as e:
+        print(f"❌ Error creando serie: {e}")
+        traceback.print_exc()
+        return JsonResponse({
+            'success': False,
+            'message': f'Error interno del servidor: {str(e)}'
+        }, status=500)
+
+@login_required
+@require_http_methods(["GET"])
+def obtener_serie_api(request, serie_id):
+    """Detalle de una serie con sus ocurrencias (solicitante o administradores)"""
+    try:
+        serie = SerieReserva.objects.select_related('espacio', 'solicitante').get(id=serie_id)
+        if serie.solicitante_id != request.user.id:
+            perfil = perfil_de(request.user)
+            if not perfil or perfil.rol not in ['Administrativo', 'Investigacion', 'Aprobador', 'SuperAdmin']:
+                return JsonResponse({'success': False, 'error': 'No autorizado'}, status=403)
+        
+        reservas = serie.reservas.order_by('fecha_reserva').only('id', 'fecha_reserva', 'estado')
+        return JsonResponse({'success': True, 'serie': serie_a_dict(serie, reservas)})
+    except SerieReserva.DoesNotExist:
+        return JsonResponse({'success': False, 'error': 'Serie no encontrada'}, status=404)
+    except Exception as e:
+        print(f"❌ Error en obtener_serie_api: {e}")
+        return JsonResponse({'success': False, 'error': str(e)}, status=500)
+
+def _cambiar_estado_serie_api(request, serie_id, estado):
+    try:
+        perfil = request.user.perfilusuario
+        if perfil.rol not in ['Administrativo', 'Investigacion', 'Aprobador', 'SuperAdmin']:
+            return JsonResponse({
+                'success': False,
+                'error': 'No tienes permisos para modificar series de reservas'
+            }, status=403)
+        
+        data = json.loads(request.body) if request.body else {}
+        comentario = data.get('comentario') or data.get('motivo') or ''
+        
+        serie = SerieReserva.objects.select_related('espacio', 'solicitante').get(id=serie_id)
+        modificadas = cambiar_estado_serie(serie, estado, request.user, comentario)
+        
+        accion = 'aprobada' if estado == 'Aprobada' else 'cancelada'
+        print(f"✅ Serie {serie_id} {accion} por {request.user.username} ({modificadas} reservas)")
+        
+        NotificacionService.crear_notificacion(
+            destinatario=serie.solicitante,
+            tipo=f'reserva_{accion}',
+            titulo='✅ Reserva Recurrente Aprobada' if estado == 'Aprobada' else '🚫 Reserva Recurrente Cancelada',
+            mensaje=f"Tu reserva recurrente para {serie.espacio.nombre} ({modificadas} fechas) ha sido {accion}." + (f" Comentario: {comentario}" if comentario else '')
+        )
+        notificar_accion_admin(
+            tipo=f'reserva_{accion}',
+            titulo=f'Serie de Reservas {accion.capitalize()}',
+            mensaje=f"El administrador {request.user.username} ha {'aprobado' if estado == 'Aprobada' else 'cancelado'} la serie #{serie.id} de {serie.solicitante.username} para {serie.espacio.nombre} ({modificadas} reservas)",
+            usuario_admin=request.user,
+            usuario_relacionado=serie.solicitante,
+            espacio=serie.espacio,
+            request=request
+        )
+        
+        return JsonResponse({
+            'success': True,
+            'message': f'Serie {accion} exitosamente',
+            'reservas_modificadas': modificadas
+        })
+    except SerieReserva.DoesNotExist:
+        return JsonResponse({'success': False, 'error': 'Serie no encontrada'}, status=404)
+    except Exception as e:
+        print(f"❌ Error cambiando estado de serie: {e}")
+        return JsonResponse({'success': False, 'error': str(e)})
+
+@login_required
+@es_admin()
+@csrf_exempt
+@require_http_methods(["POST"])
+def aprobar_serie_api(request, serie_id):
+    """Aprueba todas las ocurrencias pendientes de una serie"""
+    return _cambiar_estado_serie_api(request, serie_id, 'Aprobada')
+
+@login_required
+@es_admin()
+@csrf_exempt
+@require_http_methods(["POST"])
+def cancelar_serie_api(request, serie_id):
+    """Cancela todas las ocurrencias activas de una serie"""
+    return _cambiar_estado_serie_api(request, serie_id, 'Cancelada')
+
+MAX_DIAS_ASIGNACION = 62
+
+def _parametros_asignacion(fuente):
+    """Lee desde, hasta, tipo y mismo_tipo de GET o del JSON; retorna (parametros, error)"""
+    try:
+        desde = datetime.strptime(str(fuente.get('desde', '')), '%Y-%m-%d').date()
+        hasta = datetime.strptime(str(fuente.get('hasta', '')), '%Y-%m-%d').date()
+    except ValueError:
+        return None, 'Formato de fecha inválido (use YYYY-MM-DD)'
+    if hasta < desde:
+        return None, 'La fecha hasta debe ser posterior o igual a desde'
+    if (hasta - desde).days >= MAX_DIAS_ASIGNACION:
+        return None, f'El rango máximo es de {MAX_DIAS_ASIGNACION} días'
+    
+    mismo_tipo = fuente.get('mismo_tipo', True)
+    if isinstance(mismo_tipo, str):
+        mismo_tipo = mismo_tipo.lower() not in ('0', 'false', 'no')
+    return {
+        'desde': desde,
+        'hasta': hasta,
+        'tipo': fuente.get('tipo') or None,
+        'mismo_tipo': bool(mismo_tipo),
+    }, None
+
+def _plan_con_nombres(plan, limite=None):
+    """Agrega los nombres de los espacios a las asignaciones del plan para mostrarlo"""
+    asignaciones = plan['asignaciones'] if limite is None else plan['asignaciones'][:limite]
+    ids = {a['espacio_original_id'] for a in asignaciones} | {a['espacio_asignado_id'] for a in asignaciones}
+    nombres = dict(Espacio.objects.filter(id__in=ids).values_list('id', 'nombre'))
+    return {
+        **plan,
+        'asignaciones': [
+            {
+                **a,
+                'espacio_original': nombres.get(a['espacio_original_id']),
+                'espacio_asignado': nombres.get(a['espacio_asignado_id']),
+            }
+            for a in asignaciones
+        ],
+    }
+
+@login_required
+@es_admin()
+@require_http_methods(["GET"])
+def previsualizar_asignacion_api(request):
+    """
+    Vista previa de la asignación automática de salas para las solicitudes
+    pendientes de un rango (parámetros GET: desde, hasta, tipo, mismo_tipo, limite)
+    """
+    parametros, error = _parametros_asignacion(request.GET)
+    if error:
+        return JsonResponse({'success': False, 'error': error}, status=400)
+    
+    try:
+        limite = min(int(request.GET.get('limite') or 500), 5000)
+    except ValueError:
+        return JsonResponse({'success': False, 'error': 'limite debe ser un número'}, status=400)
+    
+    try:
+        plan = planificar_asignacion(**parametros)
+        print(f"🧮 Asignación {parametros['desde']} - {parametros['hasta']}: {plan['resumen']}")
+        return JsonResponse({'success': True, 'plan': _plan_con_nombres(plan, limite)})
+    except Exception as e:
+        print(f"❌ Error en previsualizar_asignacion_api: {e}")
+        return JsonResponse({'success': False, 'error': str(e)}, status=500)
+
+@login_required
+@es_admin()
+@csrf_exempt
+@require_http_methods(["POST"])
+def aplicar_asignacion_api(request):
+    """
+    Aprueba en una transacción las solicitudes con la sala asignada en la vista previa
+    
+    JSON: desde, hasta, tipo, mismo_tipo, firma (la de la vista previa) y comentario
+    """
+    try:
+        perfil = request.user.perfilusuario
+        if perfil.rol not in ['Administrativo', 'Investigacion', 'Aprobador', 'SuperAdmin']:
+            return JsonResponse({
+                'success': False,
+                'error': 'No tienes permisos para aprobar reservas'
+            }, status=403)
+        
+        data = json.loads(request.body) if request.body else {}
+        parametros, error = _parametros_asignacion(data)
+        if error:
+            return JsonResponse({'success': False, 'error': error}, status=400)
+        if not data.get('firma'):
+            return JsonResponse({'success': False, 'error': 'Falta la firma del plan (haz primero la vista previa)'}, status=400)
+        
+        comentario = data.get('comentario') or 'Sala asignada automáticamente'
+        try:
+            plan = aplicar_asignacion(
+                firma=data['firma'],
+                usuario_admin=request.user,
+                comentario=comentario,
+                **parametros
+            )
+        except PlanDesactualizado as e:
+            return JsonResponse({
+                'success': False,
+                'error': str(e),
+                'plan': _plan_con_nombres(e.plan, 500)
+            }, status=409)
+        except IntegrityError as e:
+            if not es_error_solapamiento(e):
+                raise
+            return JsonResponse({
+                'success': False,
+                'error': 'Otra reserva ocupó una de las salas mientras se aplicaba el plan; no se aplicó ningún cambio'
+            }, status=409)
+        
+        resumen = plan['resumen']
+        print(f"✅ Asignación aplicada por {request.user.username}: {resumen}")
+        if plan['asignaciones']:
+            notificar_accion_admin(
+                tipo='reserva_aprobada',
+                titulo='✅ Asignación Automática de Salas',
+                mensaje=f"El administrador {request.user.username} aprobó {resumen['asignadas']} solicitudes entre {parametros['desde']} y {parametros['hasta']} con asignación automática de salas ({resumen['cambios_de_sala']} cambios de sala)",
+                usuario_admin=request.user,
+                request=request
+            )
+        
+        return JsonResponse({
+            'success': True,
+            'message': f"{resumen['asignadas']} solicitudes aprobadas, {resumen['sin_asignar']} siguen pendientes",
+            'resumen': resumen
+        })
+    except Exception as e:
+        print(f"❌ Error en aplicar_asignacion_api: {e}")
+        return JsonResponse({'success': False, 'error': str(e)}, status=500)
+
 def force_logout(request):
     from django.contrib.auth import logout
     logout(request)
@@ -2377,6 +3157,35 @@ def force_logout(request):
 
 # Agregar estas vistas al final del views.py existente
 
+def _leer_cursor_notificaciones(request):
+    """
+    Cursor de las consultas periódicas: since_id (id de la última notificación
+    recibida) o since_ts (fecha de creación, ISO 8601 o timestamp Unix).
+    
+    Returns:
+        tuple: (filtros para .filter() o None si no hay cursor, JsonResponse de error o None)
+    """
+    since_id = request.GET.get('since_id', '').strip()
+    since_ts = request.GET.get('since_ts', '').strip()
+    if since_id:
+        if not since_id.isdigit():
+            return None, JsonResponse({'success': False, 'error': 'since_id debe ser un número'}, status=400)
+        return {'id__gt': int(since_id)}, None
+    if since_ts:
+        try:
+            if since_ts.replace('.', '', 1).isdigit():
+                momento = datetime.fromtimestamp(float(since_ts), tz=dt_timezone.utc)
+            else:
+                momento = parse_datetime(since_ts.replace(' ', '+'))  # el '+' del offset llega como espacio
+                if momento is not None and timezone.is_naive(momento):
+                    momento = timezone.make_aware(momento)
+        except (ValueError, OverflowError, OSError):
+            momento = None
+        if momento is None:
+            return None, JsonResponse({'success': False, 'error': 'since_ts debe ser ISO 8601 o timestamp'}, status=400)
+        return {'fecha_creacion__gt': momento}, None
+    return None, None
+
 @login_required
 @es_usuario_normal()
 @require_http_methods(["GET"])
@@ -2388,13 +3197,28 @@ def get_notificaciones_usuario(request):
         # Obtener parámetros de la solicitud
         no_leidas = request.GET.get('no_leidas', 'false').lower() == 'true'
         limite = int(request.GET.get('limite', 20))
+        cursor, error = _leer_cursor_notificaciones(request)
+        if error:
+            return error
+        
+        # Sin nada nuevo desde el cursor basta una consulta sobre el índice
+        if cursor:
+            nuevas = Notificacion.objects.filter(destinatario=request.user, **cursor)
+            if no_leidas:
+                nuevas = nuevas.filter(leida=False)
+            if not nuevas.exists():
+                return HttpResponse(status=204)
         
         # Obtener notificaciones usando el servicio
-        notificaciones = NotificacionService.obtener_notificaciones_usuario(
+        # Con cursor se pide una de más para saber si quedan páginas (has_more)
+        notificaciones = list(NotificacionService.obtener_notificaciones_usuario(
             usuario=request.user,
             no_leidas=no_leidas,
-            limite=limite
-        )
+            limite=limite + 1 if cursor else limite,
+            cursor=cursor
+        ))
+        has_more = len(notificaciones) > limite
+        notificaciones = notificaciones[:limite]
         
         # Formatear respuesta con más información
         data = []
@@ -2427,7 +3251,9 @@ def get_notificaciones_usuario(request):
             'success': True,
             'notificaciones': data,
             'total_no_leidas': total_no_leidas,
-            'total': len(data)
+            'total': len(data),
+            'ultimo_id': max((notif['id'] for notif in data), default=None),
+            'has_more': has_more
         })
         
     except Exception as e:
@@ -2521,6 +3347,63 @@ def contar_notificaciones_no_leidas(request):
             'error': 'Error al contar notificaciones'
         }, status=500)
 
+SSE_LATIDO_SEGUNDOS = 25
+SSE_DURACION_MAXIMA = 15 * 60  # el navegador reconecta solo (con Last-Event-ID)
+SSE_REINTENTO_MS = 3000
+
+def _mensaje_sse(datos, evento, id_evento=None):
+    lineas = f'id: {id_evento}\n' if id_evento is not None else ''
+    return f'{lineas}event: {evento}\ndata: {json.dumps(datos)}\n\n'
+
+async def eventos_notificaciones(request):
+    """
+    Canal SSE con las notificaciones nuevas del usuario (o las administrativas
+    si es admin). Reemplaza la consulta periódica de las páginas de
+    notificaciones; solo funciona servido por project_core/asgi.py.
+    """
+    # Los decoradores de Django 4.2 (login_required, require_http_methods) no admiten vistas async
+    if request.method != 'GET':
+        return HttpResponseNotAllowed(['GET'])
+    if not isinstance(request, ASGIRequest):
+        # Bajo WSGI la respuesta ocuparía un worker completo: 204 hace que
+        # EventSource no reintente y la página pase a consultar periódicamente
+        return HttpResponse(status=204)
+
+    canal = await sync_to_async(canal_de)(request.user)
+    if canal is None:
+        return JsonResponse({'success': False, 'error': 'No autenticado'}, status=401)
+    ultimo_id = request.headers.get('Last-Event-ID', '')
+
+    async def eventos():
+        cola = broker.suscribir(canal)
+        try:
+            yield f'retry: {SSE_REINTENTO_MS}\n\n'
+            # Lo creado mientras el cliente estaba desconectado (se lee después de
+            # suscribir para no perder nada; lo repetido en la cola se omite)
+            pendientes = await sync_to_async(notificaciones_desde)(canal, int(ultimo_id)) if ultimo_id.isdigit() else []
+            enviados = {evento['id'] for evento in pendientes}
+            for evento in pendientes:
+                yield _mensaje_sse(evento, 'notificacion', evento['id'])
+
+            fin = asyncio.get_running_loop().time() + SSE_DURACION_MAXIMA
+            while asyncio.get_running_loop().time() < fin:
+                try:
+                    evento = await asyncio.wait_for(cola.get(), SSE_LATIDO_SEGUNDOS)
+                except asyncio.TimeoutError:
+                    yield ': latido\n\n'
+                    continue
+                if evento is RESINCRONIZAR:
+                    yield _mensaje_sse({}, 'resincronizar')
+                elif evento['id'] not in enviados:
+                    yield _mensaje_sse(evento, 'notificacion', evento['id'])
+        finally:
+            broker.desuscribir(canal, cola)
+
+    response = StreamingHttpResponse(eventos(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # que nginx no acumule el stream
+    return response
+
 # === VISTAS PARA GESTIÓN DE ESPACIOS ===
 
 @login_required
@@ -2528,7 +3411,7 @@ def contar_notificaciones_no_leidas(request):
 def crear_espacio_view(request):
     """Vista para crear espacio (template)"""
     try:
-        perfil = PerfilUsuario.objects.get(user=request.user)
+        perfil = request.user.perfilusuario
         if perfil.rol not in ['Administrativo', 'Investigacion', 'Aprobador']:
             return redirect('dashboard')
         
@@ -2541,7 +3424,7 @@ def crear_espacio_view(request):
 def editar_espacio_view(request):
     """Vista para editar espacio (template)"""
     try:
-        perfil = PerfilUsuario.objects.get(user=request.user)
+        perfil = request.user.perfilusuario
         if perfil.rol not in ['Administrativo', 'Investigacion', 'Aprobador']:
             return redirect('dashboard')
         
@@ -2566,6 +3449,23 @@ def editar_espacio_view(request):
         return redirect('login')
 
 # APIs para gestión de espacios
+def _leer_buffers(data):
+    """minutos_antes/minutos_despues del JSON; vacío = usar los del tipo de espacio"""
+    valores = []
+    for campo in ('minutos_antes', 'minutos_despues'):
+        valor = data.get(campo)
+        if valor is None or str(valor).strip() == '':
+            valores.append(None)
+            continue
+        try:
+            valor = int(valor)
+        except (TypeError, ValueError):
+            raise ValueError(f'{campo} debe ser un número de minutos')
+        if not 0 <= valor <= Espacio.MAX_MINUTOS_BUFFER:
+            raise ValueError(f'{campo} debe estar entre 0 y {Espacio.MAX_MINUTOS_BUFFER} minutos')
+        valores.append(valor)
+    return tuple(valores)
+
 @login_required
 @es_admin()
 @csrf_exempt
@@ -2576,7 +3476,7 @@ def crear_espacio_api(request):
     
     try:
         # Verificar permisos de administrador
-        perfil = PerfilUsuario.objects.get(user=request.user)
+        perfil = request.user.perfilusuario
         if perfil.rol not in ['Administrativo', 'Investigacion', 'Aprobador']:
             print("❌ Usuario sin permisos de administrador")
             return JsonResponse({
@@ -2611,6 +3511,11 @@ def crear_espacio_api(request):
                 'error': 'La capacidad debe ser un número válido'
             }, status=400)
         
+        try:
+            minutos_antes, minutos_despues = _leer_buffers(data)
+        except ValueError as e:
+            return JsonResponse({'success': False, 'error': str(e)}, status=400)
+        
         # Crear espacio REAL
         espacio = Espacio.objects.create(
             nombre=data['nombre'].strip(),
@@ -2619,7 +3524,9 @@ def crear_espacio_api(request):
             edificio=data.get('edificio', '').strip() or None,
             piso=data.get('piso'),
             descripcion=data.get('descripcion', '').strip() or None,
-            estado=data.get('estado', 'Disponible')
+            estado=data.get('estado', 'Disponible'),
+            minutos_antes=minutos_antes,
+            minutos_despues=minutos_despues
         )
         
         print(f"🎯 CREAR_ESPACIO_API: Espacio REAL creado: ID {espacio.id} - {espacio.nombre}")
@@ -2663,7 +3570,7 @@ def obtener_espacio_api(request, espacio_id):
         print(f"🔍 Buscando espacio ID: {espacio_id}")
         
         # Verificar permisos
-        perfil = PerfilUsuario.objects.get(user=request.user)
+        perfil = request.user.perfilusuario
         if perfil.rol not in ['Administrativo', 'Investigacion', 'Aprobador']:
             return JsonResponse({
                 'success': False, 
@@ -2683,7 +3590,9 @@ def obtener_espacio_api(request, espacio_id):
                 'piso': espacio.piso,
                 'capacidad': espacio.capacidad,
                 'descripcion': espacio.descripcion or '',
-                'estado': espacio.estado
+                'estado': espacio.estado,
+                'minutos_antes': espacio.minutos_antes,
+                'minutos_despues': espacio.minutos_despues
             }
         })
     except Espacio.DoesNotExist:
@@ -2712,7 +3621,7 @@ def actualizar_espacio_api(request, espacio_id):
     
     try:
         # Verificar permisos
-        perfil = PerfilUsuario.objects.get(user=request.user)
+        perfil = request.user.perfilusuario
         if perfil.rol not in ['Administrativo', 'Investigacion', 'Aprobador']:
             return JsonResponse({'success': False, 'error': 'No tienes permisos de administrador'})
         
@@ -2739,9 +3648,23 @@ def actualizar_espacio_api(request, espacio_id):
             espacio.descripcion = data['descripcion'].strip() or None
         if 'estado' in data:
             espacio.estado = data['estado']
+        if 'minutos_antes' in data or 'minutos_despues' in data:
+            try:
+                espacio.minutos_antes, espacio.minutos_despues = _leer_buffers({
+                    'minutos_antes': data.get('minutos_antes', espacio.minutos_antes),
+                    'minutos_despues': data.get('minutos_despues', espacio.minutos_despues),
+                })
+            except ValueError as e:
+                return JsonResponse({'success': False, 'error': str(e)}, status=400)
         
-        # Guardar cambios
-        espacio.save()
+        # Un tiempo entre reservas mayor no puede dejar reservas futuras demasiado juntas
+        conflicto = verificar_buffers_espacio(espacio.id, espacio.tipo, espacio.minutos_antes, espacio.minutos_despues)
+        if conflicto:
+            return JsonResponse({'success': False, 'error': conflicto}, status=400)
+        
+        # Guardar cambios (signals.py recalcula los rangos si cambiaron los buffers)
+        with transaction.atomic():
+            espacio.save()
         
         print(f"🎯 ACTUALIZAR_ESPACIO_API: Espacio actualizado: {espacio.id} - {espacio.nombre}")
         
@@ -2783,7 +3706,7 @@ def eliminar_espacio_api(request, espacio_id):
     """API para eliminar un espacio"""
     try:
         # Verificar permisos de administrador
-        perfil = PerfilUsuario.objects.get(user=request.user)
+        perfil = request.user.perfilusuario
         if perfil.rol not in ['Administrativo', 'Investigacion', 'Aprobador']:
             return JsonResponse({'success': False, 'error': 'No tienes permisos'}, status=403)
         
@@ -2800,7 +3723,7 @@ def eliminar_espacio_api(request, espacio_id):
                 usuario_admin=request.user,
                 request=request
             )
-            print(f"📢 Notificación admin creada para eliminación de espacio {espacio_id}")
+            print(f"📢 Notificación admin encolada para eliminación de espacio {espacio_id}")
         except Exception as admin_notif_error:
             print(f"⚠️ Error en notificación admin eliminación espacio: {admin_notif_error}")
         
@@ -2823,7 +3746,7 @@ def filtrar_usuarios_api(request):
     """API para filtrar usuarios con múltiples criterios"""
     try:
         # Verificar permisos de administrador
-        perfil = PerfilUsuario.objects.get(user=request.user)
+        perfil = request.user.perfilusuario
         if perfil.rol not in ['Administrativo', 'Investigacion', 'Aprobador']:
             return JsonResponse({'success': False, 'error': 'No tienes permisos'}, status=403)
         
@@ -2908,7 +3831,7 @@ def obtener_usuario_api(request, user_id):
     """API para obtener datos de un usuario específico - MEJORADA"""
     try:
         # Verificar permisos de administrador
-        perfil = PerfilUsuario.objects.get(user=request.user)
+        perfil = request.user.perfilusuario
         if perfil.rol not in ['Administrativo', 'Investigacion', 'Aprobador']:
             return JsonResponse({'success': False, 'error': 'No tienes permisos'}, status=403)
         
@@ -2947,7 +3870,7 @@ def actualizar_usuario_api(request, user_id):
     
     try:
         # Verificar permisos de administrador
-        perfil = PerfilUsuario.objects.get(user=request.user)
+        perfil = request.user.perfilusuario
         if perfil.rol not in ['Administrativo', 'Investigacion', 'Aprobador']:
             return JsonResponse({'success': False, 'error': 'No tienes permisos para editar usuarios'}, status=403)
         
@@ -3063,7 +3986,7 @@ def actualizar_usuario_api(request, user_id):
                 usuario_relacionado=usuario,
                 request=request
             )
-            print(f"📢 Notificación admin creada para actualización de usuario {usuario.id}")
+            print(f"📢 Notificación admin encolada para actualización de usuario {usuario.id}")
         except Exception as admin_notif_error:
             print(f"⚠️ Error en notificación admin actualización usuario: {admin_notif_error}")
         
@@ -3090,7 +4013,7 @@ def cambiar_estado_usuario_api(request, user_id):
     """API para activar/desactivar usuario"""
     try:
         # Verificar permisos de administrador
-        perfil = PerfilUsuario.objects.get(user=request.user)
+        perfil = request.user.perfilusuario
         if perfil.rol not in ['Administrativo', 'Investigacion', 'Aprobador']:
             return JsonResponse({'success': False, 'error': 'No tienes permisos'}, status=403)
         
@@ -3121,7 +4044,7 @@ def cambiar_estado_usuario_api(request, user_id):
                 usuario_relacionado=usuario,
                 request=request
             )
-            print(f"📢 Notificación admin creada para {accion} de usuario {usuario.id}")
+            print(f"📢 Notificación admin encolada para {accion} de usuario {usuario.id}")
         except Exception as admin_notif_error:
             print(f"⚠️ Error en notificación admin estado usuario: {admin_notif_error}")
         
@@ -3140,7 +4063,7 @@ def obtener_perfiles_usuario_api(request):
     """API para obtener perfiles de usuario"""
     try:
         # Verificar permisos de administrador
-        perfil = PerfilUsuario.objects.get(user=request.user)
+        perfil = request.user.perfilusuario
         if perfil.rol not in ['Administrativo', 'Investigacion', 'Aprobador']:
             return JsonResponse({'success': False, 'error': 'No tienes permisos'}, status=403)
         
@@ -3174,7 +4097,7 @@ def obtener_perfiles_usuario_api(request):
 def notificaciones_admin_view(request):
     """Vista de notificaciones para administradores"""
     try:
-        perfil = PerfilUsuario.objects.get(user=request.user)
+        perfil = request.user.perfilusuario
         if perfil.rol not in ['Administrativo', 'Investigacion', 'Aprobador']:
             return redirect('dashboard')
         
@@ -3188,7 +4111,7 @@ def get_notificaciones_admin_api(request):
     """API para obtener notificaciones de administradores"""
     try:
         # Verificar que el usuario es administrador
-        perfil = PerfilUsuario.objects.get(user=request.user)
+        perfil = request.user.perfilusuario
         if perfil.rol not in ['Administrativo', 'Investigacion', 'Aprobador']:
             return JsonResponse({'success': False, 'error': 'No autorizado'}, status=403)
         
@@ -3196,21 +4119,36 @@ def get_notificaciones_admin_api(request):
         no_leidas = request.GET.get('no_leidas', 'false').lower() == 'true'
         limite = int(request.GET.get('limite', 50))
         tipo_filtro = request.GET.get('tipo', '')
+        cursor, error = _leer_cursor_notificaciones(request)
+        if error:
+            return error
         
-        # Consulta base
+        # Consulta base; lo leído depende de la marca de este administrador
         notificaciones = NotificacionAdmin.objects.all()
+        marca, total_no_leidas = estado_lectura(request.user)
         
         # Aplicar filtros
         if no_leidas:
-            notificaciones = notificaciones.filter(leida=False)
+            notificaciones = filtrar_no_leidas(notificaciones, request.user, marca)
         
         if tipo_filtro:
             notificaciones = notificaciones.filter(tipo=tipo_filtro)
         
-        # Ordenar y limitar
+        # Sin nada nuevo desde el cursor basta una consulta sobre el índice
+        if cursor:
+            notificaciones = notificaciones.filter(**cursor)
+            if not notificaciones.exists():
+                return HttpResponse(status=204)
+        
+        # Ordenar y limitar. Con cursor, de la más antigua a la más nueva y una de
+        # más para saber si quedan páginas (has_more): así no se salta ninguna
         notificaciones = notificaciones.select_related(
             'usuario_relacionado', 'reserva', 'reserva__espacio', 'espacio'
-        ).order_by('-fecha_creacion')[:limite]
+        ).order_by('id' if cursor else '-fecha_creacion')
+        notificaciones = list(notificaciones[:limite + 1 if cursor else limite])
+        has_more = len(notificaciones) > limite
+        notificaciones = notificaciones[:limite]
+        leidas = set() if no_leidas else ids_leidos(request.user, marca, [notif.id for notif in notificaciones])
         
         # Formatear respuesta
         data = []
@@ -3221,7 +4159,7 @@ def get_notificaciones_admin_api(request):
                 'titulo': notif.titulo,
                 'mensaje': notif.mensaje,
                 'prioridad': notif.prioridad,
-                'leida': notif.leida,
+                'leida': notif.id in leidas,
                 'fecha_creacion': notif.fecha_creacion.strftime('%d/%m/%Y %H:%M:%S'),
                 'fecha_creacion_timestamp': notif.fecha_creacion.timestamp(),
                 'usuario_relacionado': None,
@@ -3255,14 +4193,13 @@ def get_notificaciones_admin_api(request):
             
             data.append(notif_data)
         
-        # Contar no leídas
-        total_no_leidas = NotificacionAdmin.objects.filter(leida=False).count()
-        
         return JsonResponse({
             'success': True,
             'notificaciones': data,
             'total_no_leidas': total_no_leidas,
-            'total': len(data)
+            'total': len(data),
+            'ultimo_id': max((notif['id'] for notif in data), default=None),
+            'has_more': has_more
         })
         
     except Exception as e:
@@ -3281,11 +4218,11 @@ def contar_notificaciones_admin_no_leidas(request):
     """API para contar notificaciones de admin no leídas"""
     try:
         # Verificar que el usuario es administrador
-        perfil = PerfilUsuario.objects.get(user=request.user)
+        perfil = request.user.perfilusuario
         if perfil.rol not in ['Administrativo', 'Investigacion', 'Aprobador']:
             return JsonResponse({'success': False, 'error': 'No autorizado'}, status=403)
         
-        count = NotificacionAdmin.objects.filter(leida=False).count()
+        count = no_leidas_admin(request.user)
         
         return JsonResponse({
             'success': True,
@@ -3307,13 +4244,12 @@ def marcar_todas_notificaciones_admin_leidas(request):
     """API para marcar todas las notificaciones de admin como leídas"""
     try:
         # Verificar que el usuario es administrador
-        perfil = PerfilUsuario.objects.get(user=request.user)
+        perfil = request.user.perfilusuario
         if perfil.rol not in ['Administrativo', 'Investigacion', 'Aprobador']:
             return JsonResponse({'success': False, 'error': 'No autorizado'}, status=403)
         
-        notificaciones = NotificacionAdmin.objects.filter(leida=False)
-        count = notificaciones.count()
-        notificaciones.update(leida=True, fecha_lectura=timezone.now())
+        # Solo para este administrador: se mueve su marca, las notificaciones no se tocan
+        count = marcar_todas_leidas_admin(request.user)
         
         print(f"📭 Marcadas {count} notificaciones admin como leídas")
         
@@ -3338,12 +4274,12 @@ def marcar_notificacion_admin_leida(request, notificacion_id):
     """API para marcar una notificación de admin como leída"""
     try:
         # Verificar que el usuario es administrador
-        perfil = PerfilUsuario.objects.get(user=request.user)
+        perfil = request.user.perfilusuario
         if perfil.rol not in ['Administrativo', 'Investigacion', 'Aprobador']:
             return JsonResponse({'success': False, 'error': 'No autorizado'}, status=403)
         
-        notificacion = NotificacionAdmin.objects.get(id=notificacion_id)
-        notificacion.marcar_como_leida()
+        notificacion = NotificacionAdmin.objects.only('id').get(id=notificacion_id)
+        notificacion.marcar_como_leida(request.user)
         
         return JsonResponse({
             'success': True,
@@ -3422,7 +4358,7 @@ class AreaViewSet(viewsets.ModelViewSet):
 def generar_reporte_pdf(request, tipo_reporte):
     """Genera reportes en PDF basados en datos reales de la BD"""
     try:
-        perfil = PerfilUsuario.objects.get(user=request.user)
+        perfil = request.user.perfilusuario
         if perfil.rol not in ['Administrativo', 'Investigacion', 'Aprobador']:
             return JsonResponse({'success': False, 'error': 'No autorizado'})
         
@@ -3782,7 +4718,7 @@ def test_notificaciones_reales(request):
         
         resultados = []
         for test_case in test_cases:
-            notif = notificar_accion_admin(
+            evento_id = notificar_accion_admin(
                 tipo=test_case['tipo'],
                 titulo=test_case['titulo'],
                 mensaje=test_case['mensaje'],
@@ -3794,14 +4730,15 @@ def test_notificaciones_reales(request):
             )
             resultados.append({
                 'tipo': test_case['tipo'],
-                'creada': notif is not None,
-                'id': notif.id if notif else None,
+                # Encolada: el worker crea la notificación después y puede descartarla por duplicada
+                'encolada': evento_id is not None,
+                'evento_id': evento_id,
                 'titulo': test_case['titulo']
             })
         
         # Contar notificaciones totales
         total_notificaciones = NotificacionAdmin.objects.count()
-        no_leidas = NotificacionAdmin.objects.filter(leida=False).count()
+        no_leidas = no_leidas_admin(request.user)
         
         return JsonResponse({
             'success': True,